@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+# Serve the hot notes endpoints with the async views (see notes.async_views).
+os.environ.setdefault("NOTES_ASYNC_API", "true")
 
 application = get_asgi_application()
@@ -45,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "notes.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -89,6 +90,97 @@ DATABASES = {
     }
 }
 
+# Django's psycopg 3 connection pool (needs psycopg[pool]); pooled
+# connections replace CONN_MAX_AGE, which must stay 0.
+if (
+    os.getenv('DB_POOL', 'False').lower() == 'true'
+    and DATABASES["default"]["ENGINE"] == "django.db.backends.postgresql"
+):
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+            "max_size": int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+            "timeout": float(os.getenv('DB_POOL_TIMEOUT', '10')),
+        },
+    }
+
+# Opt-in SQLite profile for serving traffic from the database file:
+# write-ahead logging so readers never block the writer, BEGIN IMMEDIATE so
+# concurrent autosaves queue on the busy timeout instead of failing with
+# "database is locked" when a read transaction upgrades to a write, larger
+# page and mmap caches, and persistent, health-checked connections.
+SQLITE_PRODUCTION_OPTIONS = {
+    "transaction_mode": "IMMEDIATE",
+    "timeout": float(os.getenv('SQLITE_BUSY_TIMEOUT', '20')),
+    "init_command": ";".join([
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))}",
+        f"PRAGMA cache_size=-{int(os.getenv('SQLITE_CACHE_KB', '65536'))}",
+        "PRAGMA temp_store=MEMORY",
+    ]),
+}
+if (
+    os.getenv('SQLITE_PRODUCTION', 'False').lower() == 'true'
+    and DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3"
+):
+    DATABASES["default"].update({
+        "OPTIONS": SQLITE_PRODUCTION_OPTIONS,
+        "CONN_MAX_AGE": int(os.getenv('DB_CONN_MAX_AGE', '600')),
+        "CONN_HEALTH_CHECKS": True,
+    })
+
+# Read replicas for the notes read endpoints, as a comma-separated list of
+# hosts (host or host:port) sharing the primary's other DB_* settings, or of
+# database files for SQLite. Needs NOTES_CACHE_BACKEND to be shared between
+# workers, such as Redis. See notes.routers.
+DATABASE_ROUTERS = ["notes.routers.ReplicaRouter"]
+NOTES_READ_REPLICAS = []
+for index, replica in enumerate(filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1):
+    alias = f"replica{index}"
+    DATABASES[alias] = {**DATABASES["default"], "TEST": {"MIRROR": "default"}}
+    if DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3":
+        DATABASES[alias]["NAME"] = replica.strip()
+    else:
+        host, _, port = replica.strip().partition(':')
+        DATABASES[alias].update({"HOST": host, "PORT": port or DATABASES["default"]["PORT"]})
+    NOTES_READ_REPLICAS.append(alias)
+# How long a user's reads stay on the primary after they write.
+NOTES_REPLICA_PIN_SECONDS = float(os.getenv('NOTES_REPLICA_PIN_SECONDS', '5'))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# NOTES_CACHE_BACKEND can point at the file-based or Redis backends in production.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "notes": {
+        "BACKEND": os.getenv('NOTES_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        "LOCATION": os.getenv('NOTES_CACHE_LOCATION', 'notes'),
+        "TIMEOUT": int(os.getenv('NOTES_CACHE_TTL', '300')),
+        "KEY_PREFIX": "notes",
+    },
+}
+if 'redis' not in CACHES["notes"]["BACKEND"]:
+    # Redis bounds itself through maxmemory; the local backends need a cap.
+    CACHES["notes"]["OPTIONS"] = {
+        "MAX_ENTRIES": int(os.getenv('NOTES_CACHE_MAX_ENTRIES', '10000')),
+    }
+
+# Request metrics are only shared between workers on a shared backend.
+CACHES["metrics"] = {
+    "BACKEND": os.getenv('NOTES_METRICS_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+    "LOCATION": os.getenv('NOTES_METRICS_CACHE_LOCATION', 'metrics'),
+    "TIMEOUT": None,
+    "KEY_PREFIX": "notes",
+}
+if 'redis' not in CACHES["metrics"]["BACKEND"]:
+    # Never cull counters to make room.
+    CACHES["metrics"]["OPTIONS"] = {"MAX_ENTRIES": 1_000_000}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -108,6 +200,22 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+AUTHENTICATION_BACKENDS = [
+    "notes.backends.EmailBackend",
+    "django.contrib.auth.backends.ModelBackend",
+]
+
+# The first hasher is used for new passwords; the others still verify older
+# hashes, which are rehashed with the preferred one on the next login.
+PASSWORD_HASHERS = list(dict.fromkeys([
+    os.getenv('PASSWORD_HASHER', 'notes.hashers.TunablePBKDF2PasswordHasher'),
+    "notes.hashers.TunablePBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -131,9 +239,16 @@ STATIC_URL = "static/"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Trust the access token's claims instead of loading the user on every request;
+# deactivations then take up to NOTES_AUTH_STATE_TTL seconds to apply.
+NOTES_STATELESS_AUTH = os.getenv('NOTES_STATELESS_AUTH', 'False').lower() == 'true'
+NOTES_AUTH_STATE_TTL = float(os.getenv('NOTES_AUTH_STATE_TTL', '30'))
+
 # REST Framework settings
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
+        "notes.authentication.StatelessJWTAuthentication"
+        if NOTES_STATELESS_AUTH else
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
@@ -141,7 +256,42 @@ REST_FRAMEWORK = {
     ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 10,
+    "DEFAULT_THROTTLE_RATES": {
+        "login": os.getenv('LOGIN_THROTTLE_RATE', '30/min'),
+        "login_account": os.getenv('LOGIN_ACCOUNT_THROTTLE_RATE', '10/min'),
+    },
 }
+# Worker processes serving the API; gunicorn and uvicorn read the same
+# variable. With more than one, the login throttles need NOTES_CACHE_BACKEND
+# to be shared between them. See notes.throttling.
+NOTES_SERVER_WORKERS = int(os.getenv('WEB_CONCURRENCY', '1'))
+
+# Notes settings
+NOTES_PREVIEW_CHARS = int(os.getenv('NOTES_PREVIEW_CHARS', '200'))
+NOTES_MAX_PAGE_SIZE = int(os.getenv('NOTES_MAX_PAGE_SIZE', '500'))
+# How list pages total the collection by default: exact, estimate or none.
+NOTES_PAGE_COUNT = os.getenv('NOTES_PAGE_COUNT', 'exact')
+NOTES_CACHE_ALIAS = 'notes'
+NOTES_BULK_MAX_OPERATIONS = int(os.getenv('NOTES_BULK_MAX_OPERATIONS', '10000'))
+NOTES_EXPORT_CHUNK_SIZE = int(os.getenv('NOTES_EXPORT_CHUNK_SIZE', '2000'))
+NOTES_IMPORT_BATCH_SIZE = int(os.getenv('NOTES_IMPORT_BATCH_SIZE', '1000'))
+NOTES_EVENT_BROKER = os.getenv('NOTES_EVENT_BROKER', 'notes.events.LocalBroker')
+NOTES_EVENTS_HEARTBEAT = float(os.getenv('NOTES_EVENTS_HEARTBEAT', '15'))
+NOTES_ASYNC_API = os.getenv('NOTES_ASYNC_API', 'False').lower() == 'true'
+NOTES_METRICS_CACHE_ALIAS = 'metrics'
+NOTES_METRICS_SAMPLE_RATE = float(os.getenv('NOTES_METRICS_SAMPLE_RATE', '0'))
+NOTES_METRICS_TOKEN = os.getenv('NOTES_METRICS_TOKEN', '')
+# Store content of at least NOTES_COMPRESS_MIN_CHARS characters compressed
+# with 'zlib' or 'zstd' (needs zstandard); empty leaves content uncompressed.
+NOTES_CONTENT_COMPRESSION = os.getenv('NOTES_CONTENT_COMPRESSION', '')
+NOTES_COMPRESS_MIN_CHARS = int(os.getenv('NOTES_COMPRESS_MIN_CHARS', '8192'))
+NOTES_COMPRESSED_HEAD_CHARS = int(os.getenv('NOTES_COMPRESSED_HEAD_CHARS', '1024'))
+# Saves within this many seconds of a revision's first save are folded into it.
+NOTES_REVISION_WINDOW_SECONDS = float(os.getenv('NOTES_REVISION_WINDOW_SECONDS', '60'))
+NOTES_REVISION_SNAPSHOT_EVERY = int(os.getenv('NOTES_REVISION_SNAPSHOT_EVERY', '20'))
+# Deleted notes stay restorable for this long before purge_notes removes them.
+NOTES_TRASH_DAYS = float(os.getenv('NOTES_TRASH_DAYS', '30'))
+NOTES_PBKDF2_ITERATIONS = int(os.getenv('NOTES_PBKDF2_ITERATIONS', '0')) or None
 
 # CORS settings
 CORS_ALLOWED_ORIGINS = (
@@ -169,11 +319,18 @@ CORS_ALLOW_HEADERS = [
     "authorization",
     "content-type",
     "dnt",
+    "if-modified-since",
+    "if-none-match",
     "origin",
     "user-agent",
     "x-csrftoken",
     "x-requested-with",
 ]
+CORS_EXPOSE_HEADERS = [
+    "etag",
+    "last-modified",
+    "x-cache",
+]
 
 # JWT Settings
 SIMPLE_JWT = {
@@ -1,8 +1,9 @@
 
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 
 urlpatterns = [
     path("admin/", admin.site.urls),
-    path("", include("notes.urls")),
+    path("", include("notes.async_urls" if settings.NOTES_ASYNC_API else "notes.urls")),
 ]
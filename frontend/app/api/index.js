@@ -19,9 +19,15 @@ function removeToken() {
   if (typeof window !== 'undefined') {
     localStorage.removeItem('access_token')
   }
+  responseCache.clear()
 }
 
 
+// Last validated response per GET URL, so repeat loads can be answered
+// with 304 Not Modified instead of re-downloading the body.
+const responseCache = new Map()
+
+
 function getAuthHeaders(includeContentType = true, includeAuth = true) {
   const token = getToken()
   const headers = {}
@@ -53,17 +59,35 @@ async function apiRequest(endpoint, options = {}) {
   
   delete config.includeAuth
 
+  const cacheKey = method === 'GET' ? `${getToken()}:${url}` : null
+  const cached = cacheKey ? responseCache.get(cacheKey) : null
+  if (cached) {
+    config.headers['If-None-Match'] = cached.etag
+  }
+
   try {
     const response = await fetch(url, config)
     
+    if (response.status === 304 && cached) {
+      return cached.data
+    }
+
     if (response.status === 204 || response.status === 404) {
       return null
     }
     
     const data = await response.json()
 
+    const etag = response.headers.get('ETag')
+    if (cacheKey && response.ok && etag) {
+      responseCache.set(cacheKey, { etag, data })
+    }
+
     if (!response.ok) {
-      throw new Error(data.error || data.detail || 'An error occurred')
+      const error = new Error(data.error || data.detail || 'An error occurred')
+      error.status = response.status
+      error.data = data
+      throw error
     }
 
     return data
@@ -141,6 +165,13 @@ export const notesAPI = {
     })
   },
 
+  applyDelta: async (id, version, edits, fields = {}) => {
+    return apiRequest(`/notes/${id}/delta/`, {
+      method: 'PATCH',
+      body: JSON.stringify({ version, edits, ...fields }),
+    })
+  },
+
   delete: async (id) => {
     const response = await apiRequest(`/notes/${id}/`, {
       method: 'DELETE',
@@ -65,7 +65,7 @@ export default function DashboardPage() {
           category: category,
           categoryColor: categoryColor,
           title: note.title,
-          content: note.content,
+          content: note.preview,
           backgroundColor: `${categoryColor}7f`,
           borderColor: categoryColor,
           created_at: note.created_at,
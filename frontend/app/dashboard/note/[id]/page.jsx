@@ -5,6 +5,22 @@ import {useRouter, useParams, usePathname} from "next/navigation";
 import {notesAPI, getToken} from "@/api";
 import Dropdown from "@/components/ui/Dropdown";
 
+// Single range edit turning `previous` into `next`, in JS string indices.
+function computeEdit(previous, next) {
+    if (previous === next) return null;
+    let start = 0;
+    while (start < previous.length && start < next.length && previous[start] === next[start]) {
+        start++;
+    }
+    let previousEnd = previous.length;
+    let nextEnd = next.length;
+    while (previousEnd > start && nextEnd > start && previous[previousEnd - 1] === next[nextEnd - 1]) {
+        previousEnd--;
+        nextEnd--;
+    }
+    return {start, end: previousEnd, text: next.slice(start, nextEnd)};
+}
+
 export default function NoteEditor() {
     const router = useRouter();
     const params = useParams();
@@ -22,10 +38,13 @@ export default function NoteEditor() {
     const [isSaving, setIsSaving] = useState(false);
     const [isLoading, setIsLoading] = useState(true);
     const [error, setError] = useState("");
+    const [conflict, setConflict] = useState(null);
     const noteIdRef = useRef(null);
     const saveTimeoutRef = useRef(null);
     const isCreatingRef = useRef(false);
     const previousIdRef = useRef(null);
+    const savedRef = useRef(null);
+    const conflictRef = useRef(null);
 
     useEffect(() => {
         async function loadCategories() {
@@ -55,6 +74,9 @@ export default function NoteEditor() {
             setError("");
             setIsSaving(false);
             noteIdRef.current = null;
+            savedRef.current = null;
+            conflictRef.current = null;
+            setConflict(null);
         }
         previousIdRef.current = id;
     }, [id]);
@@ -119,6 +141,7 @@ export default function NoteEditor() {
                 if (abortController.signal.aborted || !isMounted) return;
 
                 noteIdRef.current = data.id;
+                savedRef.current = data;
                 const defaultCategory =
                     categoriesData[0]?.name || "Random Thoughts";
                 setNote({
@@ -159,6 +182,38 @@ export default function NoteEditor() {
         };
     }, [id, router]);
 
+    // Send only the changed range when the server copy is known; category
+    // changes go through a full PATCH. When the note was changed elsewhere
+    // the delta is refused: fetch the latest copy and let the user choose
+    // instead of overwriting it.
+    const saveChanges = async (saveId, updated) => {
+        const base = savedRef.current;
+        if (base?.version && base.category === updated.category) {
+            const edit = computeEdit(base.content || "", updated.content);
+            const fields = updated.title !== base.title ? {title: updated.title} : {};
+            try {
+                const saved = await notesAPI.applyDelta(
+                    saveId,
+                    base.version,
+                    edit ? [edit] : [],
+                    fields
+                );
+                savedRef.current = {...base, ...updated, version: saved.version};
+                return saved;
+            } catch (err) {
+                if (err.status !== 409) throw err;
+                const latest = await notesAPI.getById(saveId);
+                savedRef.current = latest;
+                conflictRef.current = latest;
+                setConflict(latest);
+                return null;
+            }
+        }
+        const saved = await notesAPI.patch(saveId, updated);
+        savedRef.current = saved;
+        return saved;
+    };
+
     const autoSave = async (updatedFields) => {
         const currentId = noteIdRef.current || id;
         if (!currentId || currentId === "new") return;
@@ -173,23 +228,43 @@ export default function NoteEditor() {
 
         saveTimeoutRef.current = setTimeout(async () => {
             const saveId = noteIdRef.current || id;
-            if (!saveId || saveId === "new") {
+            if (!saveId || saveId === "new" || conflictRef.current) {
                 setIsSaving(false);
                 return;
             }
-
-            try {
-                setIsSaving(true);
-                const saved = await notesAPI.patch(saveId, updated);
-                setLastEdited(saved.updated_at || saved.created_at);
-            } catch (err) {
-                setError(err.message || "Failed to save note");
-            } finally {
-                setIsSaving(false);
-            }
+            await save(saveId, updated);
         }, 350);
     };
 
+    const save = async (saveId, updated) => {
+        try {
+            setIsSaving(true);
+            const saved = await saveChanges(saveId, updated);
+            if (saved) setLastEdited(saved.updated_at || saved.created_at);
+        } catch (err) {
+            setError(err.message || "Failed to save note");
+        } finally {
+            setIsSaving(false);
+        }
+    };
+
+    const resolveConflict = async (keepMine) => {
+        const latest = conflictRef.current;
+        conflictRef.current = null;
+        setConflict(null);
+        if (keepMine) {
+            // Applied as a delta against the version just fetched.
+            await save(noteIdRef.current || id, note);
+            return;
+        }
+        setNote({
+            title: latest.title || "",
+            content: latest.content || "",
+            category: latest.category || note.category,
+        });
+        setLastEdited(latest.updated_at || latest.created_at);
+    };
+
     const formatLastEdited = (dateString) => {
         if (!dateString) return "";
         const date = new Date(dateString);
@@ -297,6 +372,25 @@ export default function NoteEditor() {
                         }}
                     />
 
+                    {conflict && (
+                        <div className="w-full mt-4 p-3 bg-yellow-100 border border-yellow-400 text-yellow-800 rounded text-sm flex flex-wrap items-center gap-3">
+                            <span>
+                                This note was changed somewhere else. Your
+                                latest edits have not been saved.
+                            </span>
+                            <button
+                                onClick={() => resolveConflict(false)}
+                                className="underline hover:opacity-70">
+                                Load latest
+                            </button>
+                            <button
+                                onClick={() => resolveConflict(true)}
+                                className="underline hover:opacity-70">
+                                Keep mine
+                            </button>
+                        </div>
+                    )}
+
                     {error && (
                         <div className="w-full mt-4 p-3 bg-red-100 border border-red-400 text-red-700 rounded text-sm">
                             {error}
@@ -4,3 +4,18 @@ from django.apps import AppConfig
 class NotesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "notes"
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        # Connects the signal handlers that expire cached account states.
+        from . import authentication  # noqa: F401
+        from .metrics import install_db_wrapper
+        from .routers import check_pin_cache
+        from .search import install_sqlite_functions
+        from .throttling import check_throttle_cache
+
+        connection_created.connect(install_db_wrapper)
+        connection_created.connect(install_sqlite_functions)
+        check_pin_cache()
+        check_throttle_cache()
@@ -0,0 +1,17 @@
+from django.urls import path
+
+from . import async_views
+from .urls import urlpatterns as sync_urlpatterns
+
+# Async views for the hot endpoints, in front of the DRF router. They share
+# the router's URL names so per-route metrics line up in both modes. The
+# event stream is only served here: under WSGI it would hold a worker for
+# as long as the client stays connected.
+urlpatterns = [
+    path('api/notes/events/', async_views.note_events, name='note-events'),
+    path('api/notes/', async_views.note_list, name='note-list'),
+    path('api/notes/categories/', async_views.note_categories, name='note-categories'),
+    path('api/notes/<int:pk>/', async_views.note_detail, name='note-detail'),
+    path('api/auth/login/', async_views.auth_login, name='auth-login'),
+    *sync_urlpatterns,
+]
@@ -0,0 +1,352 @@
+"""
+ASGI-native versions of the hot notes endpoints.
+
+DRF views are synchronous, so under ``config.asgi`` every request would be
+handed to a worker thread. These views answer the reads and JSON logins
+with Django's async ORM, building the same payloads as
+``NoteViewSet``/``AuthViewSet`` from the helpers those use. Writes, whose
+bookkeeping runs in ``Note.save`` transactions anyway, and any other method
+are delegated to the DRF view. ``notes.async_urls`` mounts them in front of
+the router.
+"""
+import json
+from functools import wraps
+from math import ceil
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import aauthenticate
+from django.contrib.auth.models import User
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .authentication import StatelessJWTAuthentication
+from .cache import arecord, notes_cache, response_key
+from .conditional import categories_etag, list_etag, version_etag
+from .events import event_stream
+from .models import CategoryCount, ChangeSequence, Note
+from .pagination import NotePagination
+from .renderers import FastJSONRenderer
+from .routers import areplica_read
+from .serializers import NOTE_LIST_FIELDS, NoteSerializer, note_list_rows
+from .throttling import login_wait
+from .views import AuthViewSet, NoteViewSet, auth_payload, category_summary, with_preview
+
+
+def render(data, status=status.HTTP_200_OK):
+    return HttpResponse(FastJSONRenderer().render(data), status=status, content_type='application/json')
+
+
+async def authenticated_user(request, allow_query_token=False):
+    """Resolve the simplejwt access token on ``request`` to an active user, or ``None``"""
+    stateless = settings.NOTES_STATELESS_AUTH
+    authenticator = StatelessJWTAuthentication() if stateless else JWTAuthentication()
+    raw_token = request.GET.get('token') if allow_query_token else None
+    if not raw_token:
+        header = authenticator.get_header(request)
+        raw_token = authenticator.get_raw_token(header) if header else None
+    if not raw_token:
+        return None
+    try:
+        token = authenticator.get_validated_token(raw_token)
+        if stateless:
+            return await authenticator.aget_user(token)
+        user_id = token[jwt_settings.USER_ID_CLAIM]
+    except (InvalidToken, TokenError, AuthenticationFailed, KeyError):
+        return None
+    return await User.objects.filter(pk=user_id, is_active=True).afirst()
+
+
+def authenticated(handler):
+    @wraps(handler)
+    async def wrapper(request, *args, **kwargs):
+        user = await authenticated_user(request)
+        if user is None:
+            response = render(
+                {'detail': 'Authentication credentials were not provided.'},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+            response['WWW-Authenticate'] = 'Bearer realm="api"'
+            return response
+        request.user = user
+        return await handler(request, *args, **kwargs)
+    return wrapper
+
+
+def dispatch(handlers, fallback):
+    """An async view serving ``handlers`` by method and delegating the rest to ``fallback``"""
+    fallback = sync_to_async(fallback)
+
+    @csrf_exempt
+    async def view(request, *args, **kwargs):
+        handler = handlers.get(request.method)
+        if handler is None:
+            return await fallback(request, *args, **kwargs)
+        return await handler(request, *args, **kwargs)
+    return view
+
+
+async def load_change_state(request):
+    """Prime ``conditional.change_state`` so the sync ETag helpers need no query"""
+    request._note_change_state = (
+        await ChangeSequence.objects
+        .filter(user_id=request.user.id)
+        .values_list('value', 'changed_at')
+        .afirst()
+        or (0, None)
+    )
+    return request._note_change_state
+
+
+def not_modified(request, etag, last_modified):
+    """A 304 when the request's validators match, else ``None``"""
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return get_conditional_response(request, etag=quote_etag(etag), last_modified=timestamp)
+
+
+def with_validators(response, etag, last_modified):
+    if response.status_code == status.HTTP_200_OK:
+        response['ETag'] = quote_etag(etag)
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+async def cached_payload(kind, request, build):
+    """Return the cached payload for ``request`` or build, store and return it"""
+    cache = notes_cache()
+    key = response_key(kind, request)
+    data = await cache.aget(key)
+    if data is not None:
+        await arecord('hits')
+        return data, 'HIT'
+    await arecord('misses')
+    data = await build()
+    if data is not None:
+        await cache.aset(key, data)
+    return data, 'MISS'
+
+
+async def paginate(request, queryset, estimate=None):
+    """
+    Page-number or keyset pagination of note cards matching ``NotePagination``'s
+    payloads and errors; ``estimate`` is awaited for the total under
+    ``?count=estimate``.
+    """
+    page_size = NotePagination.page_size_for(request.GET)
+    count_mode = NotePagination.count_mode_for(request.GET)
+    url = request.build_absolute_uri()
+    queryset = queryset.values(*NOTE_LIST_FIELDS)
+
+    if NotePagination.cursor_query_param in request.GET:
+        encoded = request.GET.get(NotePagination.cursor_query_param)
+        try:
+            position = NotePagination.parse_cursor(encoded) if encoded else None
+        except ValueError:
+            raise NotFound(NotePagination.invalid_cursor_message)
+        rows = [row async for row in NotePagination.after(queryset, position)[:page_size + 1]]
+        next_url = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_url = NotePagination.cursor_link(url, rows[-1])
+        return {
+            'next': next_url,
+            'previous': None,
+            'results': note_list_rows(rows),
+        }
+
+    count = None
+    page = request.GET.get(NotePagination.page_query_param) or 1
+    if count_mode != 'none':
+        if count_mode == 'estimate' and estimate is not None:
+            count = await estimate()
+        else:
+            count = await queryset.acount()
+        num_pages = max(1, ceil(count / page_size))
+        if page in NotePagination.last_page_strings:
+            page = num_pages
+    try:
+        page = int(page)
+    except (TypeError, ValueError):
+        raise NotFound(NotePagination.invalid_page_message)
+    if page < 1 or (count is not None and page > num_pages):
+        raise NotFound(NotePagination.invalid_page_message)
+
+    offset = (page - 1) * page_size
+    # Without a total, one extra row tells whether there is a next page.
+    limit = page_size + 1 if count is None else page_size
+    rows = [row async for row in queryset[offset:offset + limit]]
+    if count is None:
+        if not rows and page > 1:
+            raise NotFound(NotePagination.invalid_page_message)
+        has_next = len(rows) > page_size
+    else:
+        has_next = page < num_pages
+    rows = rows[:page_size]
+    next_url, previous_url = NotePagination.number_links(url, page, has_next)
+    return {
+        'count': count,
+        'next': next_url,
+        'previous': previous_url,
+        'results': note_list_rows(rows),
+    }
+
+
+@authenticated
+@areplica_read
+async def list_notes(request):
+    sequence, changed = await load_change_state(request)
+    etag = list_etag(request)
+    response = not_modified(request, etag, changed)
+    if response is not None:
+        return with_validators(response, etag, changed)
+
+    async def build():
+        queryset = Note.objects.filter(user=request.user)
+        category = request.GET.get('category')
+        if category:
+            queryset = queryset.filter(category=category)
+        return await paginate(
+            request,
+            with_preview(queryset),
+            estimate=lambda: CategoryCount.objects.atotal(request.user.id, category),
+        )
+
+    try:
+        data, outcome = await cached_payload('notes', request, build)
+    except NotFound as exc:
+        response = render({'detail': exc.detail}, status=exc.status_code)
+    else:
+        response = render(data)
+        response['X-Cache'] = outcome
+    return with_validators(response, etag, changed)
+
+
+@authenticated
+@areplica_read
+async def retrieve_note(request, pk):
+    state = await (
+        Note.objects
+        .filter(pk=pk, user=request.user)
+        .values_list('version', 'updated_at')
+        .afirst()
+    )
+    if state is None:
+        return render({'detail': 'No Note matches the given query.'}, status=status.HTTP_404_NOT_FOUND)
+    etag = version_etag(pk, state[0])
+    response = not_modified(request, etag, state[1])
+    if response is None:
+        note = await Note.objects.filter(pk=pk, user=request.user).afirst()
+        if note is None:
+            return render({'detail': 'No Note matches the given query.'}, status=status.HTTP_404_NOT_FOUND)
+        response = render(NoteSerializer(note).data)
+    return with_validators(response, etag, state[1])
+
+
+@authenticated
+@areplica_read
+async def categories(request):
+    sequence, changed = await load_change_state(request)
+    etag = categories_etag(request)
+    response = not_modified(request, etag, changed)
+    if response is not None:
+        return with_validators(response, etag, changed)
+
+    async def build():
+        counts = {
+            category: count
+            async for category, count in (
+                CategoryCount.objects.filter(user=request.user).values_list('category', 'count')
+            )
+        }
+        return category_summary(counts)
+
+    data, outcome = await cached_payload('categories', request, build)
+    response = render(data)
+    response['X-Cache'] = outcome
+    return with_validators(response, etag, changed)
+
+
+async def login(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError as exc:
+        return render({'detail': f'JSON parse error - {exc}'}, status=status.HTTP_400_BAD_REQUEST)
+    if not isinstance(data, dict):
+        data = {}
+    email = data.get('email')
+    password = data.get('password')
+
+    if not email or not password:
+        return render(
+            {'error': 'Email and password are required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    wait = await sync_to_async(login_wait)(Request(request, parsers=[JSONParser()]))
+    if wait is not None:
+        response = render(
+            {'detail': f'Request was throttled. Expected available in {ceil(wait)} seconds.'},
+            status=status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        response['Retry-After'] = str(ceil(wait))
+        return response
+
+    user = await aauthenticate(request, email=email, password=password)
+    if user is None:
+        return render(
+            {'error': 'Invalid credentials'},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+
+    return render(auth_payload(user))
+
+
+def json_only(handler, fallback):
+    """Serve JSON bodies asynchronously and leave form and multipart bodies to DRF"""
+    @wraps(handler)
+    async def wrapper(request, *args, **kwargs):
+        if request.content_type != 'application/json':
+            return await sync_to_async(fallback)(request, *args, **kwargs)
+        return await handler(request, *args, **kwargs)
+    return wrapper
+
+
+note_list_view = NoteViewSet.as_view({'get': 'list', 'post': 'create'})
+note_detail_view = NoteViewSet.as_view({
+    'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy',
+})
+categories_view = NoteViewSet.as_view({'get': 'categories'})
+login_view = AuthViewSet.as_view({'post': 'login'})
+
+note_list = dispatch({'GET': list_notes}, note_list_view)
+note_detail = dispatch({'GET': retrieve_note}, note_detail_view)
+note_categories = dispatch({'GET': categories}, categories_view)
+auth_login = dispatch({'POST': json_only(login, login_view)}, login_view)
+
+
+async def note_events(request):
+    """
+    Server-sent events for writes to the user's notes; serve under ASGI.
+
+    ``EventSource`` cannot send headers, so the access token may also be
+    passed as ``?token=``.
+    """
+    user = await authenticated_user(request, allow_query_token=True)
+    if user is None:
+        return render({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
+
+    response = StreamingHttpResponse(event_stream(user.id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
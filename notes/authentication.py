@@ -0,0 +1,108 @@
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+class NoteRefreshToken(RefreshToken):
+    """A refresh token whose access tokens also carry the user's email and active flag"""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token['email'] = user.email
+        token['is_active'] = user.is_active
+        return token
+
+
+class ActiveStates:
+    """
+    Per-process cache of whether a user may still authenticate.
+
+    Entries live for ``NOTES_AUTH_STATE_TTL`` seconds, so deactivating or
+    deleting a user takes effect within that window on every process, and
+    immediately on the process that made the change.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states = {}
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._states.get(user_id)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        return entry[0]
+
+    def set(self, user_id, active):
+        expires = time.monotonic() + settings.NOTES_AUTH_STATE_TTL
+        with self._lock:
+            self._states[user_id] = (active, expires)
+
+    def forget(self, user_id):
+        with self._lock:
+            self._states.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._states.clear()
+
+
+active_states = ActiveStates()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_active_state(sender, instance, **kwargs):
+    active_states.forget(instance.pk)
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    simplejwt authentication without the per-request ``User`` query.
+
+    ``request.user`` is an unsaved ``User`` built from the token claims with
+    only ``id``, ``email`` and ``is_active`` set: enough for filtering and
+    assigning notes, but it must never be saved. Whether the account is still
+    active is checked against ``active_states`` and only read from the
+    database when that entry has expired.
+    """
+
+    def get_user(self, validated_token):
+        user_id = self.user_id(validated_token)
+        active = active_states.get(user_id)
+        if active is None:
+            active = User.objects.filter(pk=user_id, is_active=True).exists()
+            active_states.set(user_id, active)
+        return self.claims_user(validated_token, user_id, active)
+
+    async def aget_user(self, validated_token):
+        user_id = self.user_id(validated_token)
+        active = active_states.get(user_id)
+        if active is None:
+            active = await User.objects.filter(pk=user_id, is_active=True).aexists()
+            active_states.set(user_id, active)
+        return self.claims_user(validated_token, user_id, active)
+
+    @staticmethod
+    def user_id(validated_token):
+        try:
+            return int(validated_token[jwt_settings.USER_ID_CLAIM])
+        except (KeyError, TypeError, ValueError):
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+    @staticmethod
+    def claims_user(validated_token, user_id, active):
+        if not active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        email = validated_token.get('email', '')
+        return User(id=user_id, username=email, email=email, is_active=True)
@@ -0,0 +1,53 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import verify_password
+
+UserModel = get_user_model()
+
+
+def off_loop(func):
+    # Hashing is deliberately slow CPU work; keep it off the event loop and
+    # out of the single thread that serves sync_to_async ORM calls.
+    return sync_to_async(func, thread_sensitive=False)
+
+
+class EmailBackend(ModelBackend):
+    """
+    Authenticate ``email``/``password`` credentials with one indexed lookup,
+    instead of resolving the email to a username and loading the user again.
+    """
+
+    def authenticate(self, request, email=None, password=None, **kwargs):
+        if email is None or password is None:
+            return None
+        user = self.users(email).first()
+        if user is None:
+            # Run the default password hasher once to reduce the timing
+            # difference between an existing and a nonexistent user.
+            UserModel().set_password(password)
+        elif user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    async def aauthenticate(self, request, email=None, password=None, **kwargs):
+        if email is None or password is None:
+            return None
+        user = await self.users(email).afirst()
+        if user is None:
+            await off_loop(UserModel().set_password)(password)
+            return None
+        # User.acheck_password() verifies on the event loop, so do its work here.
+        is_correct, must_update = await off_loop(verify_password)(password, user.password)
+        if is_correct and must_update:
+            await off_loop(user.set_password)(password)
+            user._password = None
+            await user.asave(update_fields=['password'])
+        if is_correct and self.user_can_authenticate(user):
+            return user
+        return None
+
+    @staticmethod
+    def users(email):
+        # auth_user.email is not unique; match the oldest account like the old lookup did.
+        return UserModel._default_manager.filter(email=email).order_by('pk')
@@ -0,0 +1,172 @@
+"""
+Seeded datasets, a concurrent load generator and micro-benchmarks for the
+notes API, used by ``manage.py bench_notes``.
+"""
+import json
+import platform
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client, override_settings
+from rest_framework.renderers import JSONRenderer
+
+from .models import CategoryCount, Note
+from .renderers import FastJSONRenderer
+from .serializers import NOTE_LIST_FIELDS, NoteListSerializer, NoteSerializer, note_list_rows
+from .views import CATEGORY_COLORS, with_preview
+
+BENCH_PASSWORD = 'bench-password'
+WORDS = (
+    'lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor '
+    'incididunt ut labore et dolore magna aliqua'
+).split()
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(latencies, elapsed, errors=0):
+    """Throughput and latency percentiles, in milliseconds, for one scenario"""
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def text(rng, size):
+    words = []
+    length = 0
+    while length <= size:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return ' '.join(words)[:size]
+
+
+def seed_dataset(users, notes_per_user, content_sizes, seed=0):
+    """
+    Create ``users`` users owning ``notes_per_user`` notes each.
+
+    Content lengths cycle through ``content_sizes`` and the text is drawn from
+    a generator seeded with ``seed``, so the same arguments always produce
+    the same notes. Returns the created users; every one of them has the
+    password ``BENCH_PASSWORD``.
+    """
+    rng = random.Random(seed)
+    run = uuid.uuid4().hex[:8]
+    password = make_password(BENCH_PASSWORD)
+    created = User.objects.bulk_create(
+        User(username=f'bench-{run}-{i}@example.com', email=f'bench-{run}-{i}@example.com', password=password)
+        for i in range(users)
+    )
+    if connection.features.can_return_rows_from_bulk_insert:
+        owners = created
+    else:
+        owners = list(User.objects.filter(username__startswith=f'bench-{run}-').order_by('id'))
+
+    categories = list(CATEGORY_COLORS)
+    Note.objects.bulk_create(
+        (
+            Note(
+                user=owner,
+                title=text(rng, 40),
+                content=text(rng, content_sizes[i % len(content_sizes)]),
+                category=categories[i % len(categories)],
+            )
+            for owner in owners
+            for i in range(notes_per_user)
+        ),
+        batch_size=settings.NOTES_IMPORT_BATCH_SIZE,
+    )
+    # bulk_create skips Note.save, so bring the counters in line once.
+    CategoryCount.objects.rebuild(user_ids=[owner.id for owner in owners])
+    return owners
+
+
+def drop_dataset(users):
+    # Deleting users leaves their notes behind, so remove those first.
+    Note.all_objects.filter(user__in=users).delete()
+    User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+
+def run_load(requests, concurrency):
+    """
+    Send ``requests`` — ``(method, path, kwargs)`` tuples — through Django's
+    test client with ``concurrency`` in flight and summarize the run.
+    """
+    def send(request):
+        method, path, kwargs = request
+        started = time.perf_counter()
+        response = getattr(Client(), method)(path, **kwargs)
+        return time.perf_counter() - started, response.status_code >= 400
+
+    started = time.perf_counter()
+    # The test clients send Host: testserver.
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        if concurrency == 1:
+            outcomes = [send(request) for request in requests]
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                outcomes = list(pool.map(send, requests))
+    elapsed = time.perf_counter() - started
+    return summarize([latency for latency, _ in outcomes], elapsed, sum(failed for _, failed in outcomes))
+
+
+def micro(function, rounds):
+    """Time ``rounds`` calls of ``function``, pytest-benchmark style"""
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return {
+        'rounds': rounds,
+        'min_ms': round(min(timings) * 1000, 3),
+        'median_ms': round(percentile(timings, 0.50) * 1000, 3),
+        'max_ms': round(max(timings) * 1000, 3),
+    }
+
+
+def micro_benchmarks(users, rounds):
+    """In-process costs below the HTTP stack for the seeded users' notes"""
+    queryset = with_preview(Note.objects.filter(user__in=users))
+    results = {}
+    for size in (100, 1000):
+        # Query, serialize and render one list page both ways.
+        results[f'list_page_{size}_serializer'] = micro(
+            lambda: JSONRenderer().render(NoteListSerializer(list(queryset[:size]), many=True).data), rounds,
+        )
+        results[f'list_page_{size}_rows'] = micro(
+            lambda: FastJSONRenderer().render(note_list_rows(queryset.values(*NOTE_LIST_FIELDS)[:size])), rounds,
+        )
+    full = list(Note.objects.filter(user__in=users)[:100])
+    results['note_serializer_100'] = micro(lambda: NoteSerializer(full, many=True).data, rounds)
+    return results
+
+
+def environment():
+    return {
+        'database': connection.vendor,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+    }
+
+
+def write_results(path, results):
+    # Stable key order keeps the diff between two runs down to the numbers.
+    with open(path, 'w') as handle:
+        json.dump(results, handle, indent=2, sort_keys=True)
+        handle.write('\n')
@@ -0,0 +1,137 @@
+from collections import Counter
+
+from django.db import transaction
+from django.utils import timezone
+
+from .events import publish_on_commit
+from .models import CategoryCount, ChangeSequence, Note, NoteRevision, Tombstone
+from .search import index_notes
+from .serializers import NoteSerializer
+
+BATCH_SIZE = 500
+
+
+class BulkValidationError(Exception):
+    """Raised with per-operation results when any operation in a batch is invalid"""
+
+    def __init__(self, results):
+        super().__init__('Bulk operations are invalid')
+        self.results = results
+
+
+def apply_operations(user, operations):
+    """
+    Apply validated ``{'op', 'id', 'data'}`` operations for ``user`` in one transaction.
+
+    Creates go through ``bulk_create``, together with their first revisions,
+    updates and recategorizations through a single ``bulk_update`` and deletes
+    through one update that moves the notes to the trash, so the cost is a
+    handful of queries regardless of batch size, plus the revision bookkeeping
+    of updated notes whose title or content changed. Category counters
+    and the change sequence are adjusted once for the whole batch, and every
+    note it touches is stamped with that one sequence value. Nothing is
+    written unless every operation is valid; otherwise ``BulkValidationError``
+    carries the per-operation errors.
+    """
+    results = [{'op': operation['op']} for operation in operations]
+    creates = [i for i, operation in enumerate(operations) if operation['op'] == 'create']
+    updates = [i for i, operation in enumerate(operations) if operation['op'] in ('update', 'recategorize')]
+    deletes = [i for i, operation in enumerate(operations) if operation['op'] == 'delete']
+
+    create_serializer = NoteSerializer(data=[operations[i]['data'] for i in creates], many=True)
+    update_serializer = NoteSerializer(
+        data=[operations[i]['data'] for i in updates], many=True, partial=True
+    )
+    failed = False
+    for indexes, serializer in ((creates, create_serializer), (updates, update_serializer)):
+        if not serializer.is_valid():
+            for i, errors in zip(indexes, serializer.errors):
+                if errors:
+                    results[i]['errors'] = errors
+                    failed = True
+
+    if not operations:
+        return results
+    now = timezone.now()
+    with transaction.atomic():
+        # Lock the sequence row before any note, in the order Note.save,
+        # apply_delta and delete use, so a racing PATCH cannot deadlock us.
+        # A validation error below rolls the advance back.
+        sequence = ChangeSequence.objects.advance(user.id)
+        targets = Note.objects.select_for_update().filter(
+            user=user, pk__in=[operations[i]['id'] for i in updates + deletes]
+        ).in_bulk()
+        seen = set()
+        for i in updates + deletes:
+            pk = operations[i]['id']
+            if pk not in targets:
+                results[i]['errors'] = {'id': ['Not found.']}
+                failed = True
+            elif pk in seen:
+                results[i]['errors'] = {'id': ['Note appears in more than one operation.']}
+                failed = True
+            seen.add(pk)
+        if failed:
+            raise BulkValidationError(results)
+
+        categories = Counter()
+        new_notes = [
+            Note(user=user, sequence=sequence, **data)
+            for data in create_serializer.validated_data
+        ]
+        Note.objects.bulk_create(new_notes, batch_size=BATCH_SIZE)
+        NoteRevision.objects.record_created(new_notes, batch_size=BATCH_SIZE)
+        index_notes(Note.objects.db, new_notes)
+        for i, note in zip(creates, new_notes):
+            categories[note.category] += 1
+            results[i].update(id=note.id, version=note.version)
+
+        changed_fields = {'updated_at', 'version', 'sequence'}
+        changed_notes = []
+        revised_notes = []
+        for i, data in zip(updates, update_serializer.validated_data):
+            note = targets[operations[i]['id']]
+            categories[note.category] -= 1
+            for name, value in data.items():
+                setattr(note, name, value)
+            categories[note.category] += 1
+            note.updated_at = now
+            note.version += 1
+            note.sequence = sequence
+            changed_fields.update(data)
+            changed_notes.append(note)
+            if 'title' in data or 'content' in data:
+                revised_notes.append(note)
+            results[i].update(id=note.id, version=note.version)
+        was_compressed = {note.pk for note in changed_notes if note.content_compressed is not None}
+        if 'content' in changed_fields:
+            # bulk_update writes attributes as they are, skipping pre_save.
+            changed_fields.add('content_compressed')
+            contents = [note.content for note in changed_notes]
+            for note in changed_notes:
+                note.content = note.pack_content()
+        Note.objects.bulk_update(changed_notes, sorted(changed_fields), batch_size=BATCH_SIZE)
+        if 'content' in changed_fields:
+            for note, content in zip(changed_notes, contents):
+                note.content = content
+        for note in revised_notes:
+            NoteRevision.objects.record(note, now=now)
+        if {'title', 'content'} & changed_fields:
+            # bulk_update writes these columns for every note in the batch.
+            index_notes(Note.objects.db, changed_notes, was_compressed)
+
+        deleted_ids = [operations[i]['id'] for i in deletes]
+        for i in deletes:
+            categories[targets[operations[i]['id']].category] -= 1
+            results[i]['id'] = operations[i]['id']
+        Note.objects.filter(user=user, pk__in=deleted_ids).update(deleted_at=now, sequence=sequence)
+        Tombstone.objects.bulk_create(
+            [Tombstone(user=user, note_id=pk, sequence=sequence) for pk in deleted_ids],
+            batch_size=BATCH_SIZE,
+        )
+
+        for category, delta in categories.items():
+            if delta:
+                CategoryCount.objects.adjust(user.id, category, delta)
+        publish_on_commit(user.id, {'type': 'batch', 'count': len(operations), 'sequence': sequence})
+    return results
@@ -0,0 +1,78 @@
+from functools import wraps
+from hashlib import sha1
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+from .conditional import change_state
+from .metrics import increment, metrics_cache
+
+# Kept with the request metrics: the response cache may be local to each
+# worker and culls entries, so it cannot hold counters.
+STATS_KEYS = {'hits': 'notes-cache-hits', 'misses': 'notes-cache-misses'}
+
+
+def notes_cache():
+    return caches[settings.NOTES_CACHE_ALIAS]
+
+
+def response_key(kind, request):
+    """
+    Key a cached response by user, change sequence and full request URL.
+
+    Every write advances the user's change sequence, so a create, update or
+    delete makes all of that user's earlier entries unreachable at once and
+    they simply age out of the bounded cache.
+    """
+    sequence, changed = change_state(request)
+    stamp = changed.isoformat() if changed else ''
+    url = sha1(request.build_absolute_uri().encode('utf-8')).hexdigest()
+    return f'{kind}-{request.user.id}-{sequence}-{stamp}-{url}'
+
+
+def cached_response(kind):
+    """Serve a view's serialized ``200`` payload from the notes cache"""
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            cache = notes_cache()
+            key = response_key(kind, request)
+            data = cache.get(key)
+            if data is not None:
+                record('hits')
+                return Response(data, headers={'X-Cache': 'HIT'})
+
+            record('misses')
+            response = method(self, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                cache.set(key, response.data)
+                response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+def record(outcome):
+    increment(metrics_cache(), STATS_KEYS[outcome], 1)
+
+
+async def arecord(outcome):
+    cache = metrics_cache()
+    key = STATS_KEYS[outcome]
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        if not await cache.aadd(key, 1, timeout=None):
+            await cache.aincr(key)
+
+
+def stats():
+    """Return ``{'hits', 'misses'}`` counted since the last reset"""
+    values = metrics_cache().get_many(STATS_KEYS.values())
+    return {outcome: values.get(key, 0) for outcome, key in STATS_KEYS.items()}
+
+
+def reset_stats():
+    metrics_cache().delete_many(STATS_KEYS.values())
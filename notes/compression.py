@@ -0,0 +1,133 @@
+"""
+Opt-in compressed storage for large note content.
+
+With ``NOTES_CONTENT_COMPRESSION`` set, content of at least
+``NOTES_COMPRESS_MIN_CHARS`` characters is stored compressed in
+``Note.content_compressed``, and the ``content`` column keeps only its first
+``NOTES_COMPRESSED_HEAD_CHARS`` characters. Previews read that column, so
+they never decompress anything; search indexes the full text separately,
+see ``notes.search``. Model instances see the full text: ``Note.from_db``
+decompresses it.
+
+Blobs start with a one-byte marker naming their codec, so rows stay
+readable after the codec is changed or compression is switched off.
+"""
+import zlib
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import Length
+
+from .metrics import record_compression
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard is optional
+    zstandard = None
+
+ZLIB = b'z'
+ZSTD = b's'
+CODEC_MARKERS = {'zlib': ZLIB, 'zstd': ZSTD}
+
+
+def compress_bytes(raw, codec):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('NOTES_CONTENT_COMPRESSION=zstd needs the zstandard package')
+        return ZSTD + zstandard.ZstdCompressor().compress(raw)
+    if codec == 'zlib':
+        return ZLIB + zlib.compress(raw)
+    raise ValueError(f'Unknown content compression codec {codec!r}')
+
+
+def decompress(blob):
+    """The text stored in a ``content_compressed`` blob"""
+    blob = bytes(blob)
+    marker, payload = blob[:1], blob[1:]
+    if marker == ZLIB:
+        return zlib.decompress(payload).decode('utf-8')
+    if marker == ZSTD and zstandard is not None:
+        return zstandard.ZstdDecompressor().decompress(payload).decode('utf-8')
+    raise ValueError(f'Unreadable compressed content marker {marker!r}')
+
+
+def head(text):
+    # Never shorter than what with_preview reads, so previews stay exact.
+    return text[:max(settings.NOTES_COMPRESSED_HEAD_CHARS, settings.NOTES_PREVIEW_CHARS + 1)]
+
+
+def compress_text(text, codec=None):
+    """
+    Return ``(column, blob)`` for storing ``text``.
+
+    ``blob`` is ``None`` and ``column`` the text itself when compression is
+    off, the text is below the threshold or compressing would not save space.
+    """
+    codec = settings.NOTES_CONTENT_COMPRESSION if codec is None else codec
+    if not codec or len(text) < settings.NOTES_COMPRESS_MIN_CHARS:
+        return text, None
+    raw = text.encode('utf-8')
+    blob = compress_bytes(raw, codec)
+    if len(blob) >= len(raw):
+        return text, None
+    return head(text), blob
+
+
+def pack(text):
+    """``compress_text`` for writes, counting the compression ratio in the metrics"""
+    column, blob = compress_text(text)
+    if blob is not None:
+        record_compression(len(text.encode('utf-8')), len(blob))
+    return column, blob
+
+
+def repack_notes(model, using, inflate=False, batch_size=200):
+    """
+    Bring stored content in line with ``NOTES_CONTENT_COMPRESSION``, or
+    decompress everything with ``inflate``, ``batch_size`` rows per
+    transaction. Trashed notes are included.
+
+    Rows are rewritten only if their version has not moved since they were
+    read, so concurrent edits are never overwritten. Returns
+    ``(rows, original_bytes, stored_bytes)`` for the rewritten rows.
+    """
+    from .search import index_full_text
+
+    notes = model._base_manager.using(using)
+    if inflate:
+        candidates = notes.filter(content_compressed__isnull=False)
+    elif settings.NOTES_CONTENT_COMPRESSION:
+        candidates = notes.alias(length=Length('content')).filter(
+            content_compressed__isnull=True, length__gte=settings.NOTES_COMPRESS_MIN_CHARS,
+        )
+    else:
+        return 0, 0, 0
+
+    rows = original = stored = 0
+    last = 0
+    while True:
+        with transaction.atomic(using=using):
+            batch = list(
+                candidates.filter(pk__gt=last).order_by('pk')
+                .values_list('pk', 'version', 'title', 'content', 'content_compressed')[:batch_size]
+            )
+            if not batch:
+                break
+            last = batch[-1][0]
+            compressed, inflated = [], []
+            for pk, version, title, column, blob in batch:
+                text = decompress(blob) if blob is not None else column
+                new_column, new_blob = (text, None) if inflate else compress_text(text)
+                if new_blob is None and blob is None:
+                    continue
+                if notes.filter(pk=pk, version=version).update(content=new_column, content_compressed=new_blob):
+                    size = len(text.encode('utf-8'))
+                    rows += 1
+                    original += size
+                    stored += size if new_blob is None else len(new_blob)
+                    if new_blob is not None:
+                        compressed.append((pk, title, text))
+                    else:
+                        inflated.append(pk)
+            index_full_text(using, compressed, inflated)
+    return rows, original, stored
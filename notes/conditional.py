@@ -0,0 +1,78 @@
+from functools import wraps
+
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from .models import ChangeSequence, Note
+
+
+def conditional(etag_func, last_modified_func):
+    """
+    Answer ``If-None-Match``/``If-Modified-Since`` with 304 before the view
+    runs, and mark responses private so clients always revalidate.
+    """
+    def decorator(method):
+        validated = method_decorator(
+            condition(etag_func=etag_func, last_modified_func=last_modified_func)
+        )(method)
+
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            response = validated(self, request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def change_state(request):
+    """The user's ``(sequence, changed_at)``, read once per request"""
+    if not hasattr(request, '_note_change_state'):
+        request._note_change_state = ChangeSequence.objects.current(request.user.id)
+    return request._note_change_state
+
+
+def list_etag(request, *args, **kwargs):
+    return f'notes-{request.user.id}-{change_state(request)[0]}'
+
+
+def categories_etag(request, *args, **kwargs):
+    return f'categories-{request.user.id}-{change_state(request)[0]}'
+
+
+def changes_etag(request, *args, **kwargs):
+    return f'changes-{request.user.id}-{change_state(request)[0]}'
+
+
+def changed_at(request, *args, **kwargs):
+    return change_state(request)[1]
+
+
+def note_state(request, pk=None, **kwargs):
+    """The note's ``(version, updated_at)`` without loading its content"""
+    if not hasattr(request, '_note_state'):
+        try:
+            request._note_state = (
+                Note.objects
+                .filter(pk=pk, user_id=request.user.id)
+                .values_list('version', 'updated_at')
+                .first()
+            )
+        except (TypeError, ValueError):
+            request._note_state = None
+    return request._note_state
+
+
+def version_etag(pk, version):
+    return f'note-{pk}-{version}'
+
+
+def note_etag(request, pk=None, **kwargs):
+    state = note_state(request, pk)
+    return version_etag(pk, state[0]) if state else None
+
+
+def note_updated_at(request, pk=None, **kwargs):
+    state = note_state(request, pk)
+    return state[1] if state else None
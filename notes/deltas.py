@@ -0,0 +1,86 @@
+from difflib import SequenceMatcher
+
+
+def apply_text_edits(text, edits):
+    """
+    Apply a sequence of ``{'start', 'end', 'text'}`` range edits to ``text``.
+
+    Each edit replaces ``[start, end)`` of the text left by the previous edit.
+    Offsets count UTF-16 code units so they match JavaScript string indices
+    sent by the editor. Raises ``ValueError`` for out-of-range edits or edits
+    that would split a surrogate pair.
+    """
+    buffer = text.encode('utf-16-le')
+    for edit in edits:
+        start, end = edit['start'] * 2, edit['end'] * 2
+        if start > end or end > len(buffer):
+            raise ValueError(f"Edit range {edit['start']}-{edit['end']} is out of bounds")
+        buffer = buffer[:start] + edit.get('text', '').encode('utf-16-le') + buffer[end:]
+    try:
+        return buffer.decode('utf-16-le')
+    except UnicodeDecodeError:
+        raise ValueError('Edit splits a surrogate pair')
+
+
+# Changed regions up to this many characters get a character diff; longer
+# ones are diffed line by line, which stays fast on large notes.
+DETAIL_CHARS = 4096
+
+
+def common_prefix(a, b):
+    # Binary search with slice comparisons, which run in C.
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def line_starts(lines):
+    starts = [0]
+    for line in lines:
+        starts.append(starts[-1] + len(line))
+    return starts
+
+
+def utf16_offset(text, index):
+    return index if text.isascii() else len(text[:index].encode('utf-16-le')) // 2
+
+
+def text_edits(old, new):
+    """
+    The range edits that turn ``old`` into ``new`` under ``apply_text_edits``.
+
+    Edits come last-first so each one's offsets hold for ``old`` as well.
+    Edits cover only the changed text, so their size follows the size of
+    the change rather than the size of the note.
+    """
+    prefix = common_prefix(old, new)
+    room = min(len(old), len(new)) - prefix
+    suffix = common_prefix(old[::-1][:room], new[::-1][:room])
+    old_end, new_end = len(old) - suffix, len(new) - suffix
+    if prefix == old_end and prefix == new_end:
+        return []
+
+    a, b = old[prefix:old_end], new[prefix:new_end]
+    if len(a) + len(b) <= DETAIL_CHARS:
+        matcher = SequenceMatcher(None, a, b, autojunk=False)
+        changes = [
+            (prefix + i1, prefix + i2, b[j1:j2])
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != 'equal'
+        ]
+    else:
+        a_lines, b_lines = a.splitlines(keepends=True), b.splitlines(keepends=True)
+        a_starts, b_starts = line_starts(a_lines), line_starts(b_lines)
+        matcher = SequenceMatcher(None, a_lines, b_lines, autojunk=False)
+        changes = [
+            (prefix + a_starts[i1], prefix + a_starts[i2], b[b_starts[j1]:b_starts[j2]])
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != 'equal'
+        ]
+    return [
+        {'start': utf16_offset(old, start), 'end': utf16_offset(old, end), 'text': text}
+        for start, end, text in reversed(changes)
+    ]
@@ -0,0 +1,86 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+class LocalBroker:
+    """
+    In-process pub/sub for note events.
+
+    ``publish`` may be called from any thread; events are handed to each
+    subscriber's event loop. Subscribers only see events published in the
+    same process, so multi-process deployments need a shared backend with the
+    same ``publish``/``subscribe`` interface.
+    """
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def publish(self, user_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, event)
+            except RuntimeError:
+                # The subscriber's loop has shut down; it will unsubscribe itself.
+                pass
+
+    @staticmethod
+    def _offer(queue, event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A stalled client misses events; it can catch up from /changes/.
+            pass
+
+    @asynccontextmanager
+    async def subscribe(self, user_id):
+        """Yield an ``asyncio.Queue`` receiving the user's events until exit"""
+        entry = (asyncio.get_running_loop(), asyncio.Queue(maxsize=self.queue_size))
+        with self._lock:
+            self._subscribers[user_id].add(entry)
+        try:
+            yield entry[1]
+        finally:
+            with self._lock:
+                self._subscribers[user_id].discard(entry)
+                if not self._subscribers[user_id]:
+                    del self._subscribers[user_id]
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(settings.NOTES_EVENT_BROKER)()
+
+
+def publish_on_commit(user_id, event):
+    """Publish ``event`` to the user's subscribers once the current transaction commits"""
+    transaction.on_commit(lambda: get_broker().publish(user_id, event), robust=True)
+
+
+def format_event(event):
+    """Encode an event as a server-sent event frame"""
+    return f"id: {event['sequence']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def event_stream(user_id):
+    """Yield SSE frames for the user's events, with a comment line as keep-alive"""
+    async with get_broker().subscribe(user_id) as queue:
+        yield ': connected\n\n'
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), settings.NOTES_EVENTS_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            yield format_event(event)
@@ -0,0 +1,58 @@
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .compression import decompress
+
+EXPORT_FIELDS = ['id', 'title', 'content', 'category', 'created_at', 'updated_at', 'version']
+FLUSH_BYTES = 64 * 1024
+
+
+def ndjson_lines(queryset, chunk_size):
+    """Yield one JSON document per note, reading the queryset through a server-side cursor"""
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    rows = queryset.order_by('id').values(*EXPORT_FIELDS, 'content_compressed').iterator(chunk_size=chunk_size)
+    for row in rows:
+        compressed = row.pop('content_compressed')
+        if compressed is not None:
+            row['content'] = decompress(compressed)
+        yield (encoder.encode(row) + '\n').encode('utf-8')
+
+
+def buffered(chunks):
+    """Join small chunks so the server writes ``FLUSH_BYTES``-sized blocks"""
+    buffer, size = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= FLUSH_BYTES:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def gzipped(chunks):
+    """Gzip a byte stream on the fly, emitting a block for every chunk it is given"""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+async def streamed(chunks):
+    """
+    Serve a sync chunk iterator to an ASGI server one chunk at a time.
+
+    Django collects a sync iterator into a list before sending it under
+    ASGI. Each chunk is produced in the request's sync thread instead, which
+    also owns the connection the export cursor was opened on.
+    """
+    chunks = iter(chunks)
+    advance = sync_to_async(next)
+    try:
+        while (chunk := await advance(chunks, None)) is not None:
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close)()
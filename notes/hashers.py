@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2 with the work factor taken from ``NOTES_PBKDF2_ITERATIONS``.
+
+    It keeps the ``pbkdf2_sha256`` algorithm name, so existing hashes verify
+    unchanged and are transparently rehashed at the new cost on next login.
+    """
+
+    @property
+    def iterations(self):
+        return settings.NOTES_PBKDF2_ITERATIONS or PBKDF2PasswordHasher.iterations
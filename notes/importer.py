@@ -0,0 +1,187 @@
+import json
+import re
+import time
+from collections import Counter
+
+from django.db import DatabaseError, transaction
+
+from .events import publish_on_commit
+from .models import CategoryCount, ChangeSequence, Note, NoteRevision
+from .search import index_notes
+from .serializers import NoteSerializer
+
+READ_CHARS = 64 * 1024
+ERROR_DETAIL_LIMIT = 1000
+WHITESPACE = re.compile(r'\s*')
+
+
+class ImportReport:
+    """Running totals for an import, with details for the first rejected rows"""
+
+    def __init__(self):
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+
+    def reject(self, row, errors):
+        self.failed += 1
+        if len(self.errors) < ERROR_DETAIL_LIMIT:
+            self.errors.append({'row': row, 'errors': errors})
+
+    def finish(self):
+        self.elapsed = time.monotonic() - self.started
+        return self
+
+    @property
+    def rows_per_second(self):
+        rows = self.created + self.failed
+        return rows / self.elapsed if self.elapsed else float(rows)
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'failed': self.failed,
+            'errors': self.errors,
+            'seconds': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+        }
+
+
+def read_rows(stream):
+    """
+    Yield ``(row number, value)`` pairs from a text stream holding either a
+    JSON array or NDJSON, reading ``READ_CHARS`` at a time. A line of NDJSON
+    that fails to parse is yielded as a ``ValueError``; a malformed JSON
+    array cannot be resynchronised, so it raises ``ValueError`` instead.
+    """
+    buffer = ''
+    while not buffer.strip():
+        chunk = stream.read(READ_CHARS)
+        if not chunk:
+            return
+        buffer += chunk
+    buffer = buffer.lstrip()
+    if buffer.startswith('['):
+        yield from _array_rows(stream, buffer[1:])
+    else:
+        yield from _ndjson_rows(stream, buffer)
+
+
+def _ndjson_rows(stream, buffer):
+    number = 0
+    while True:
+        chunk = stream.read(READ_CHARS)
+        buffer += chunk
+        lines = buffer.split('\n')
+        buffer = lines.pop() if chunk else ''
+        for line in lines:
+            number += 1
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except ValueError as exc:
+                yield number, ValueError(f'Invalid JSON: {exc}')
+        if not chunk:
+            return
+
+
+def _array_rows(stream, buffer):
+    decoder = json.JSONDecoder()
+    number = pos = 0
+    need_comma = eof = False
+    while True:
+        pos = WHITESPACE.match(buffer, pos).end()
+        if not eof and len(buffer) - pos < READ_CHARS:
+            chunk = stream.read(READ_CHARS)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        if pos == len(buffer):
+            raise ValueError('Unexpected end of JSON array')
+        if buffer[pos] == ']':
+            return
+        if need_comma:
+            if buffer[pos] != ',':
+                raise ValueError(f'Expected "," after row {number}')
+            pos += 1
+            need_comma = False
+            continue
+        try:
+            value, pos = decoder.raw_decode(buffer, pos)
+        except ValueError as exc:
+            if eof:
+                raise ValueError(f'Invalid JSON in row {number + 1}: {exc}')
+            # The row is larger than the buffer; read on and retry.
+            chunk = stream.read(READ_CHARS)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        number += 1
+        yield number, value
+        need_comma = True
+
+
+def import_notes(user, rows, batch_size):
+    """
+    Validate ``(row number, value)`` pairs against ``NoteSerializer`` and
+    insert the valid ones for ``user`` with ``bulk_create``, ``batch_size``
+    rows at a time.
+
+    Each batch runs in its own savepoint, so a batch the database rejects is
+    reported row by row and the import carries on with the next one.
+    """
+    report = ImportReport()
+    batch = []
+    rows = iter(rows)
+    while True:
+        try:
+            number, value = next(rows)
+        except StopIteration:
+            break
+        except ValueError as exc:
+            report.reject(None, {'non_field_errors': [str(exc)]})
+            break
+        if isinstance(value, ValueError):
+            report.reject(number, {'non_field_errors': [str(value)]})
+            continue
+        batch.append((number, value))
+        if len(batch) >= batch_size:
+            _import_batch(user, batch, report)
+            batch = []
+    if batch:
+        _import_batch(user, batch, report)
+    return report.finish()
+
+
+def _import_batch(user, batch, report):
+    notes = []
+    numbers = []
+    for number, value in batch:
+        serializer = NoteSerializer(data=value)
+        if serializer.is_valid():
+            notes.append(Note(user=user, **serializer.validated_data))
+            numbers.append(number)
+        else:
+            report.reject(number, serializer.errors)
+    if not notes:
+        return
+
+    try:
+        with transaction.atomic():
+            sequence = ChangeSequence.objects.advance(user.id)
+            for note in notes:
+                note.sequence = sequence
+            Note.objects.bulk_create(notes)
+            NoteRevision.objects.record_created(notes)
+            index_notes(Note.objects.db, notes)
+            for category, count in Counter(note.category for note in notes).items():
+                CategoryCount.objects.adjust(user.id, category, count)
+            publish_on_commit(user.id, {'type': 'batch', 'count': len(notes), 'sequence': sequence})
+    except DatabaseError as exc:
+        for number in numbers:
+            report.reject(number, {'non_field_errors': [str(exc)]})
+    else:
+        report.created += len(notes)
@@ -0,0 +1,144 @@
+import importlib.util
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from notes.benchmarks import percentile
+from notes.models import Note
+
+HOST = '127.0.0.1'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare requests/sec and latency of the sync (WSGI) and async (ASGI) '
+        'notes views under concurrent load, each behind a local server'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per mode')
+        parser.add_argument('--concurrency', type=int, default=32, help='Requests in flight')
+        parser.add_argument('--notes', type=int, default=200, help='Notes owned by the benchmark user')
+
+    def handle(self, *args, **options):
+        if min(options['requests'], options['concurrency'], options['notes']) < 1:
+            raise CommandError('--requests, --concurrency and --notes must be positive')
+        if importlib.util.find_spec('uvicorn') is None:
+            raise CommandError('bench_async serves the ASGI application with uvicorn; install it first')
+        if connection.vendor == 'sqlite' and connection.settings_dict['NAME'] in ('', ':memory:'):
+            raise CommandError('The servers need a database they can share; use a file or a server database')
+
+        email = f'bench-{uuid.uuid4().hex}@example.com'
+        user = User.objects.create_user(username=email, email=email, password=uuid.uuid4().hex)
+        try:
+            Note.objects.bulk_create(
+                Note(user=user, title=f'Bench {i}', content='x' * 500, category='School')
+                for i in range(options['notes'])
+            )
+            note_id = Note.objects.filter(user=user).values_list('id', flat=True).first()
+            token = str(RefreshToken.for_user(user).access_token)
+            paths = ['/api/notes/', f'/api/notes/{note_id}/', '/api/notes/categories/', '/api/notes/?page=2']
+            plan = [paths[i % len(paths)] for i in range(options['requests'])]
+
+            for mode in ('wsgi', 'asgi'):
+                port = free_port()
+                with self.server(mode, port):
+                    elapsed, latencies = self.run_load(port, plan, token, options['concurrency'])
+                self.stdout.write(
+                    f'{mode}: {len(plan) / elapsed:.0f} req/s, '
+                    f'p50 {percentile(latencies, 0.50) * 1000:.1f}ms, '
+                    f'p99 {percentile(latencies, 0.99) * 1000:.1f}ms'
+                )
+        finally:
+            Note.all_objects.filter(user=user).delete()
+            user.delete()
+
+    def server(self, mode, port):
+        """Start Django's threaded WSGI server or uvicorn on ``port`` with the matching URLconf"""
+        hosts = ','.join(filter(None, [os.getenv('ALLOWED_HOSTS'), HOST]))
+        env = {**os.environ, 'ALLOWED_HOSTS': hosts, 'NOTES_ASYNC_API': 'true' if mode == 'asgi' else 'false'}
+        if mode == 'wsgi':
+            command = [
+                sys.executable, str(settings.BASE_DIR / 'manage.py'), 'runserver',
+                '--noreload', '--skip-checks', f'{HOST}:{port}',
+            ]
+        else:
+            command = [
+                sys.executable, '-m', 'uvicorn', 'config.asgi:application',
+                '--host', HOST, '--port', str(port), '--log-level', 'warning', '--no-access-log',
+            ]
+        return RunningServer(
+            subprocess.Popen(
+                command, cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            ),
+            port,
+        )
+
+    def run_load(self, port, plan, token, concurrency):
+        headers = {'Authorization': f'Bearer {token}'}
+
+        def fetch(path):
+            started = time.perf_counter()
+            client = HTTPConnection(HOST, port, timeout=30)
+            try:
+                client.request('GET', path, headers=headers)
+                response = client.getresponse()
+                response.read()
+            finally:
+                client.close()
+            latency = time.perf_counter() - started
+            if response.status != 200:
+                raise CommandError(f'{path} returned {response.status}')
+            return latency
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(fetch, plan))
+        return time.perf_counter() - started, latencies
+
+
+class RunningServer:
+    """Context manager waiting for a server process to listen and stopping it afterwards"""
+
+    def __init__(self, process, port, timeout=30):
+        self.process = process
+        self.port = port
+        self.timeout = timeout
+
+    def __enter__(self):
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise CommandError(f'The server exited with status {self.process.returncode}')
+            try:
+                socket.create_connection((HOST, self.port), timeout=1).close()
+                return self
+            except OSError:
+                time.sleep(0.1)
+        self.__exit__()
+        raise CommandError(f'The server did not listen on port {self.port}')
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
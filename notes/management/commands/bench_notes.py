@@ -0,0 +1,125 @@
+import random
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.urls import reverse
+
+from notes import benchmarks
+from notes.authentication import NoteRefreshToken
+from notes.models import Note
+
+SCENARIOS = ('list', 'retrieve', 'patch', 'categories', 'login')
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a reproducible dataset, load the notes API and write throughput, '
+        'latency percentiles and micro-benchmarks as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='Users to seed')
+        parser.add_argument('--notes', type=int, default=200, help='Notes per user')
+        parser.add_argument(
+            '--content-sizes', default='200,2000,20000',
+            help='Comma-separated note content lengths, cycled through',
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the dataset and request plan')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per scenario')
+        parser.add_argument('--concurrency', type=int, default=8, help='Requests in flight')
+        parser.add_argument('--rounds', type=int, default=50, help='Rounds per micro-benchmark')
+        parser.add_argument(
+            '--scenario', action='append', dest='scenarios', choices=SCENARIOS,
+            help='Only run the given scenario (can be repeated)',
+        )
+        parser.add_argument(
+            '--output',
+            help='Results file (default: benchmarks/<database vendor>.json in the project)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            content_sizes = [int(size) for size in options['content_sizes'].split(',')]
+        except ValueError:
+            raise CommandError('--content-sizes must be comma-separated integers')
+        if min(options['users'], options['notes'], options['requests'],
+               options['concurrency'], options['rounds'], *content_sizes) < 1:
+            raise CommandError('Counts and content sizes must be positive')
+
+        users = benchmarks.seed_dataset(options['users'], options['notes'], content_sizes, options['seed'])
+        try:
+            results = {
+                'environment': benchmarks.environment(),
+                'dataset': {
+                    'users': options['users'],
+                    'notes_per_user': options['notes'],
+                    'content_sizes': content_sizes,
+                    'seed': options['seed'],
+                },
+                'load': {
+                    'requests': options['requests'],
+                    'concurrency': options['concurrency'],
+                    'response_cache': False,
+                },
+                'scenarios': {},
+                'micro': benchmarks.micro_benchmarks(users, options['rounds']),
+            }
+            rng = random.Random(options['seed'])
+            plans = self.plans(users, rng, options['requests'])
+            # Login throttles would reject the load itself. The response cache
+            # is swapped for a dummy so repeated requests measure the database
+            # path, and the configured (possibly shared) cache is left alone.
+            rates = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}}
+            caches = {
+                **settings.CACHES,
+                settings.NOTES_CACHE_ALIAS: {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+            }
+            for name in options['scenarios'] or SCENARIOS:
+                with override_settings(REST_FRAMEWORK=rates, CACHES=caches):
+                    summary = benchmarks.run_load(plans[name], options['concurrency'])
+                results['scenarios'][name] = summary
+                self.stdout.write(
+                    f"{name:10} {summary['rps']:>8} req/s  p50 {summary['p50_ms']}ms  "
+                    f"p95 {summary['p95_ms']}ms  p99 {summary['p99_ms']}ms  {summary['errors']} error(s)"
+                )
+        finally:
+            benchmarks.drop_dataset(users)
+
+        output = Path(options['output'] or settings.BASE_DIR / 'benchmarks' / f'{results["environment"]["database"]}.json')
+        output.parent.mkdir(parents=True, exist_ok=True)
+        benchmarks.write_results(output, results)
+        self.stdout.write(self.style.SUCCESS(f'Results written to {output}'))
+
+    def plans(self, users, rng, count):
+        """The request sequence of every scenario, drawn from ``rng``"""
+        headers = {user.id: f'Bearer {NoteRefreshToken.for_user(user).access_token}' for user in users}
+        note_ids = {}
+        for user_id, note_id in Note.objects.filter(user__in=users).values_list('user_id', 'id'):
+            note_ids.setdefault(user_id, []).append(note_id)
+
+        def authed(method, path, **kwargs):
+            user = rng.choice(users)
+            return method, path(user), {'HTTP_AUTHORIZATION': headers[user.id], **kwargs}
+
+        def detail(user):
+            return reverse('note-detail', kwargs={'pk': rng.choice(note_ids[user.id])})
+
+        plans = {
+            'list': lambda: authed('get', lambda user: reverse('note-list')),
+            'retrieve': lambda: authed('get', detail),
+            'patch': lambda: authed(
+                'patch', detail, data={'title': f'Edited {rng.random():.6f}'}, content_type='application/json',
+            ),
+            'categories': lambda: authed('get', lambda user: reverse('note-categories')),
+            'login': lambda: self.login_request(rng.choice(users)),
+        }
+        return {name: [build() for _ in range(count)] for name, build in plans.items()}
+
+    @staticmethod
+    def login_request(user):
+        return 'post', reverse('auth-login'), {
+            'data': {'email': user.email, 'password': benchmarks.BENCH_PASSWORD},
+            'content_type': 'application/json',
+        }
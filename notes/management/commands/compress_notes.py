@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from notes.compression import repack_notes
+from notes.models import Note
+
+
+class Command(BaseCommand):
+    help = 'Compress stored note content to match NOTES_CONTENT_COMPRESSION, in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--inflate',
+            action='store_true',
+            help='Decompress every compressed note instead, e.g. before turning compression off',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Notes rewritten per transaction',
+        )
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            help='Database to rewrite',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+        rows, original, stored = repack_notes(
+            Note, using=options['database'], inflate=options['inflate'], batch_size=options['batch_size'],
+        )
+        if options['inflate']:
+            self.stdout.write(self.style.SUCCESS(f'{rows} note(s) decompressed'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'{rows} note(s) compressed: {original} -> {stored} bytes'
+                f' (ratio {original / (stored or 1):.1f}x)'
+            ))
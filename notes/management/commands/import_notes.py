@@ -0,0 +1,47 @@
+import sys
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.importer import import_notes, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Import notes for a user from a JSON array or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='Owner of the imported notes')
+        parser.add_argument('path', help='File to read, or - for standard input')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.NOTES_IMPORT_BATCH_SIZE,
+            help='Rows inserted per bulk_create batch',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        user = User.objects.filter(email=options['email']).first()
+        if user is None:
+            raise CommandError('No matching user found')
+
+        if options['path'] == '-':
+            report = import_notes(user, read_rows(sys.stdin), options['batch_size'])
+        else:
+            try:
+                with open(options['path'], encoding='utf-8-sig', errors='replace') as stream:
+                    report = import_notes(user, read_rows(stream), options['batch_size'])
+            except OSError as exc:
+                raise CommandError(str(exc))
+
+        for error in report.errors:
+            row = error['row'] if error['row'] is not None else '-'
+            self.stderr.write(f"row {row}: {error['errors']}")
+        if report.failed > len(report.errors):
+            self.stderr.write(f'... {report.failed - len(report.errors)} more rejected row(s)')
+        self.stdout.write(self.style.SUCCESS(
+            f'{report.created} note(s) imported, {report.failed} row(s) rejected '
+            f'in {report.elapsed:.2f}s ({report.rows_per_second:.0f} rows/sec)'
+        ))
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.cache import reset_stats, stats
+from notes.routers import PROCESS_LOCAL_CACHES
+
+
+class Command(BaseCommand):
+    help = 'Report the notes response cache hit rate'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Zero the hit and miss counters after reporting them',
+        )
+
+    def handle(self, *args, **options):
+        backend = settings.CACHES[settings.NOTES_METRICS_CACHE_ALIAS]['BACKEND']
+        if backend in PROCESS_LOCAL_CACHES:
+            # This process never served a request, so it would always report zero.
+            raise CommandError(
+                f'The {settings.NOTES_METRICS_CACHE_ALIAS!r} cache uses {backend}, which workers do not share; '
+                f'set NOTES_METRICS_CACHE_BACKEND to read their counters'
+            )
+        counts = stats()
+        total = counts['hits'] + counts['misses']
+        rate = counts['hits'] / total if total else 0.0
+        self.stdout.write(f"{counts['hits']} hit(s), {counts['misses']} miss(es), {rate:.1%} hit rate")
+        if options['reset']:
+            reset_stats()
+            self.stdout.write(self.style.SUCCESS('Counters reset'))
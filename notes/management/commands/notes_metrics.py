@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+
+from notes.metrics import BUCKETS, compression_stats, reset_stats, stats
+
+
+def percentile(buckets, fraction):
+    """Upper bound of the histogram bucket holding the given fraction of requests"""
+    total = sum(buckets)
+    seen = 0
+    for bound, count in zip((*BUCKETS, float('inf')), buckets):
+        seen += count
+        if seen >= total * fraction:
+            return bound
+    return float('inf')
+
+
+def milliseconds(seconds):
+    return '>%gms' % (BUCKETS[-1] * 1000) if seconds == float('inf') else '%gms' % (seconds * 1000)
+
+
+class Command(BaseCommand):
+    help = 'Report sampled per-route request counts, latency, SQL and serializer time, and content compression'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Zero the counters after reporting them',
+        )
+
+    def handle(self, *args, **options):
+        series = stats()
+        if not series:
+            self.stdout.write('No sampled requests (is NOTES_METRICS_SAMPLE_RATE set?)')
+        for (route, method), entry in sorted(series.items()):
+            requests = entry['requests'] or 1
+            self.stdout.write(
+                f"{method:6} {route:24} {entry['requests']:>8} req  "
+                f"avg {entry['latency_us'] / requests / 1000:.1f}ms  "
+                f"p50 <={milliseconds(percentile(entry['buckets'], 0.50))}  "
+                f"p99 <={milliseconds(percentile(entry['buckets'], 0.99))}  "
+                f"{entry['queries'] / requests:.1f} queries  "
+                f"db {entry['db_us'] / requests / 1000:.1f}ms  "
+                f"serialize {entry['serialize_us'] / requests / 1000:.1f}ms"
+            )
+        compression = compression_stats()
+        if compression['notes']:
+            self.stdout.write(
+                f"Compressed {compression['notes']} note writes: "
+                f"{compression['original_bytes']} -> {compression['stored_bytes']} bytes "
+                f"(ratio {compression['original_bytes'] / (compression['stored_bytes'] or 1):.1f}x)"
+            )
+        if options['reset']:
+            reset_stats()
+            self.stdout.write(self.style.SUCCESS('Counters reset'))
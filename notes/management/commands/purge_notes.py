@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from notes.trash import purge_expired, purge_orphans
+
+
+class Command(BaseCommand):
+    help = 'Permanently delete notes trashed long enough ago and the notes of deleted users, in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=float,
+            default=None,
+            help='Keep trashed notes this many days (default NOTES_TRASH_DAYS)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Notes deleted per transaction',
+        )
+
+    def handle(self, *args, **options):
+        days = settings.NOTES_TRASH_DAYS if options['days'] is None else options['days']
+        if days < 0 or options['batch_size'] < 1:
+            raise CommandError('--days must not be negative and --batch-size must be positive')
+
+        expired = purge_expired(timezone.now() - timedelta(days=days), options['batch_size'])
+        orphaned = purge_orphans(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{expired} expired and {orphaned} orphaned note(s) purged'
+        ))
@@ -0,0 +1,37 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.models import CategoryCount
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-user category counters from the notes table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            action='append',
+            dest='emails',
+            metavar='EMAIL',
+            help='Only reconcile the given user (can be repeated)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report how many counters are out of date without changing them',
+        )
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options['emails']:
+            user_ids = list(
+                User.objects.filter(email__in=options['emails']).values_list('id', flat=True)
+            )
+            if not user_ids:
+                raise CommandError('No matching users found')
+
+        fixed = CategoryCount.objects.rebuild(user_ids=user_ids, dry_run=options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(f'{fixed} category counter(s) out of date')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{fixed} category counter(s) rebuilt'))
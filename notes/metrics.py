@@ -0,0 +1,312 @@
+"""
+Sampled per-route request metrics.
+
+``MetricsMiddleware`` samples ``NOTES_METRICS_SAMPLE_RATE`` of requests. For
+each sampled request it measures wall time, the SQL issued on any connection
+and time spent in serializer ``to_representation``, adds them to counters in
+the ``NOTES_METRICS_CACHE_ALIAS`` cache keyed by URL name and method, and
+reports the request's own numbers in a ``Server-Timing`` header. Unsampled
+requests only pay for one random number; the database and serializer hooks
+check a context variable and return straight away.
+
+Point the metrics cache at a shared backend so that every worker, the
+``/api/metrics/`` endpoint and ``manage.py notes_metrics`` see the same
+counters.
+"""
+import hmac
+import random
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseForbidden, HttpResponseNotFound
+
+# Upper bounds, in seconds, of the latency histogram buckets; the last
+# bucket counts everything slower.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+COUNTERS = ('requests', 'latency_us', 'queries', 'db_us', 'serialize_us')
+SERIES_COUNT_KEY = 'metrics-series-count'
+COMPRESSION_KEYS = {
+    'notes': 'metrics-compression-notes',
+    'original_bytes': 'metrics-compression-original-bytes',
+    'stored_bytes': 'metrics-compression-stored-bytes',
+}
+
+_sample = ContextVar('notes_metrics_sample', default=None)
+
+
+class Sample:
+    """Running totals for one sampled request"""
+    __slots__ = ('started', 'queries', 'db', 'serialize', 'serializing')
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+        self.serializing = False
+
+    def time_serializer(self, method, instance):
+        # Nested and per-item representations are counted once, by the outermost call.
+        if self.serializing:
+            return method(instance)
+        self.serializing = True
+        started = perf_counter()
+        try:
+            return method(instance)
+        finally:
+            self.serialize += perf_counter() - started
+            self.serializing = False
+
+
+def active_sample():
+    return _sample.get()
+
+
+def metrics_cache():
+    return caches[settings.NOTES_METRICS_CACHE_ALIAS]
+
+
+def db_wrapper(execute, sql, params, many, context):
+    sample = _sample.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        sample.queries += 1
+        sample.db += perf_counter() - started
+
+
+def install_db_wrapper(sender, connection, **kwargs):
+    """``connection_created`` receiver hooking every new connection"""
+    if db_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, db_wrapper)
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    return match.url_name or match.view_name
+
+
+def bucket_index(latency):
+    for index, bound in enumerate(BUCKETS):
+        if latency <= bound:
+            return index
+    return len(BUCKETS)
+
+
+def series_keys(series):
+    keys = {name: f'metrics-{series}-{name}' for name in COUNTERS}
+    keys.update({f'bucket_{i}': f'metrics-{series}-bucket-{i}' for i in range(len(BUCKETS) + 1)})
+    return keys
+
+
+def increment(cache, key, delta):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if not cache.add(key, delta, timeout=None):
+            cache.incr(key, delta)
+
+
+def series_slot(slot):
+    return f'metrics-series-{slot}'
+
+
+def register_series(cache, series):
+    # Only the first request on a route/method pair reaches the index. Each
+    # series gets a slot of its own from an atomic counter, so workers
+    # registering at the same time never overwrite each other's entry.
+    if cache.add(f'metrics-{series}-seen', 1, timeout=None):
+        try:
+            slot = cache.incr(SERIES_COUNT_KEY)
+        except ValueError:
+            slot = 1 if cache.add(SERIES_COUNT_KEY, 1, timeout=None) else cache.incr(SERIES_COUNT_KEY)
+        cache.set(series_slot(slot), series, timeout=None)
+
+
+def series_slots(cache):
+    return [series_slot(slot) for slot in range(1, (cache.get(SERIES_COUNT_KEY) or 0) + 1)]
+
+
+def known_series(cache):
+    return list(dict.fromkeys(cache.get_many(series_slots(cache)).values()))
+
+
+def record(route, method, sample, latency):
+    cache = metrics_cache()
+    series = f'{route}|{method}'
+    register_series(cache, series)
+    keys = series_keys(series)
+    increment(cache, keys['requests'], 1)
+    increment(cache, keys['latency_us'], int(latency * 1_000_000))
+    increment(cache, keys[f'bucket_{bucket_index(latency)}'], 1)
+    if sample.queries:
+        increment(cache, keys['queries'], sample.queries)
+        increment(cache, keys['db_us'], int(sample.db * 1_000_000))
+    if sample.serialize:
+        increment(cache, keys['serialize_us'], int(sample.serialize * 1_000_000))
+
+
+def record_compression(original, stored):
+    """Count one note written compressed, with its raw and compressed sizes"""
+    cache = metrics_cache()
+    increment(cache, COMPRESSION_KEYS['notes'], 1)
+    increment(cache, COMPRESSION_KEYS['original_bytes'], original)
+    increment(cache, COMPRESSION_KEYS['stored_bytes'], stored)
+
+
+def compression_stats():
+    values = metrics_cache().get_many(COMPRESSION_KEYS.values())
+    return {name: values.get(key, 0) for name, key in COMPRESSION_KEYS.items()}
+
+
+def stats():
+    """Return ``{(route, method): {counter: value, 'buckets': [...]}}`` for every recorded series"""
+    cache = metrics_cache()
+    result = {}
+    for series in known_series(cache):
+        keys = series_keys(series)
+        values = cache.get_many(keys.values())
+        entry = {name: values.get(key, 0) for name, key in keys.items() if not name.startswith('bucket_')}
+        entry['buckets'] = [values.get(keys[f'bucket_{i}'], 0) for i in range(len(BUCKETS) + 1)]
+        route, method = series.split('|', 1)
+        result[(route, method)] = entry
+    return result
+
+
+def reset_stats():
+    cache = metrics_cache()
+    slots = series_slots(cache)
+    series = set(cache.get_many(slots).values())
+    keys = [key for name in series for key in series_keys(name).values()]
+    keys += [f'metrics-{name}-seen' for name in series]
+    keys += slots
+    cache.delete_many([*keys, SERIES_COUNT_KEY, *COMPRESSION_KEYS.values()])
+
+
+def server_timing(sample, latency):
+    parts = [f'app;dur={latency * 1000:.1f}']
+    if sample.queries:
+        parts.append(f'db;dur={sample.db * 1000:.1f};desc="{sample.queries} queries"')
+    if sample.serialize:
+        parts.append(f'serialize;dur={sample.serialize * 1000:.1f}')
+    return ', '.join(parts)
+
+
+class MetricsMiddleware:
+    """Record sampled requests against their resolved route; see the module docstring"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def sampled():
+        rate = settings.NOTES_METRICS_SAMPLE_RATE
+        return rate > 0 and (rate >= 1 or random.random() < rate)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+        sample = Sample()
+        token = _sample.set(sample)
+        try:
+            response = self.get_response(request)
+        finally:
+            _sample.reset(token)
+        latency = perf_counter() - sample.started
+        route = route_name(request)
+        if route is not None:
+            record(route, request.method, sample, latency)
+        response['Server-Timing'] = server_timing(sample, latency)
+        return response
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        sample = Sample()
+        token = _sample.set(sample)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _sample.reset(token)
+        latency = perf_counter() - sample.started
+        route = route_name(request)
+        if route is not None:
+            await sync_to_async(record)(route, request.method, sample, latency)
+        response['Server-Timing'] = server_timing(sample, latency)
+        return response
+
+
+def prometheus_text(series, compression=None):
+    """Render ``stats()`` and ``compression_stats()`` in the Prometheus text exposition format"""
+    lines = []
+
+    def family(name, kind, help_text):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    def labels(route, method, **extra):
+        pairs = {'route': route, 'method': method, **extra}
+        return '{' + ','.join(f'{key}="{value}"' for key, value in pairs.items()) + '}'
+
+    family('notes_http_request_duration_seconds', 'histogram', 'Latency of sampled requests.')
+    for (route, method), entry in sorted(series.items()):
+        cumulative = 0
+        for bound, count in zip((*BUCKETS, '+Inf'), entry['buckets']):
+            cumulative += count
+            lines.append(
+                f'notes_http_request_duration_seconds_bucket{labels(route, method, le=bound)} {cumulative}'
+            )
+        lines.append(f"notes_http_request_duration_seconds_sum{labels(route, method)} {entry['latency_us'] / 1e6}")
+        lines.append(f"notes_http_request_duration_seconds_count{labels(route, method)} {entry['requests']}")
+
+    for name, counter, scale, help_text in (
+        ('notes_db_queries_total', 'queries', 1, 'SQL queries issued by sampled requests.'),
+        ('notes_db_query_seconds_total', 'db_us', 1e6, 'Time spent in SQL by sampled requests.'),
+        ('notes_serializer_seconds_total', 'serialize_us', 1e6, 'Time spent serializing by sampled requests.'),
+    ):
+        family(name, 'counter', help_text)
+        for (route, method), entry in sorted(series.items()):
+            value = entry[counter] / scale if scale != 1 else entry[counter]
+            lines.append(f'{name}{labels(route, method)} {value}')
+
+    if compression is not None:
+        family('notes_content_compressed_total', 'counter', 'Note writes stored compressed.')
+        lines.append(f"notes_content_compressed_total {compression['notes']}")
+        family('notes_content_compression_bytes_total', 'counter', 'Raw and stored size of compressed note writes.')
+        lines.append(f'notes_content_compression_bytes_total{{kind="original"}} {compression["original_bytes"]}')
+        lines.append(f'notes_content_compression_bytes_total{{kind="stored"}} {compression["stored_bytes"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint.
+
+    Disabled unless ``NOTES_METRICS_TOKEN`` is set; scrapers send it as a
+    bearer token.
+    """
+    expected = settings.NOTES_METRICS_TOKEN
+    if not expected:
+        return HttpResponseNotFound()
+    header = request.headers.get('Authorization', '')
+    scheme, _, supplied = header.partition(' ')
+    if scheme.lower() != 'bearer' or not hmac.compare_digest(supplied.encode(), expected.encode()):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        prometheus_text(stats(), compression_stats()), content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
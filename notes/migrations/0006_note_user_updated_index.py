@@ -0,0 +1,29 @@
+# Generated by Django 5.2.9 on 2026-10-17 15:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+from notes.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("notes", "0005_add_drama_category"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="note",
+            options={"ordering": ["-updated_at", "-id"]},
+        ),
+        AddIndexConcurrently(
+            model_name="note",
+            index=models.Index(
+                fields=["user", "-updated_at", "-id"], name="notes_user_updated_idx"
+            ),
+        ),
+    ]
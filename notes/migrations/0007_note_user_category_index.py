@@ -0,0 +1,26 @@
+# Generated by Django 5.2.9 on 2026-10-17 15:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+from notes.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("notes", "0006_note_user_updated_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="note",
+            index=models.Index(
+                fields=["user", "category", "-updated_at", "-id"],
+                name="notes_user_category_idx",
+            ),
+        ),
+    ]
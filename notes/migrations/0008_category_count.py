@@ -0,0 +1,62 @@
+# Generated by Django 5.2.9 on 2026-10-17 15:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_category_counts(apps, schema_editor):
+    Note = apps.get_model("notes", "Note")
+    CategoryCount = apps.get_model("notes", "CategoryCount")
+    rows = Note.objects.values("user_id", "category").annotate(count=Count("id"))
+    CategoryCount.objects.bulk_create(
+        CategoryCount(
+            user_id=row["user_id"], category=row["category"], count=row["count"]
+        )
+        for row in rows.order_by()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0007_note_user_category_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CategoryCount",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("category", models.CharField(max_length=50)),
+                ("count", models.IntegerField(default=0)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="category_counts",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "category"),
+                        name="notes_categorycount_user_category_uniq",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(populate_category_counts, migrations.RunPython.noop),
+    ]
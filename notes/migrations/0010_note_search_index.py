@@ -0,0 +1,85 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.utils import OperationalError
+
+# Frozen: later migrations replace these, so they must not follow notes.search.
+SQLITE_FTS_SQL = [
+    """
+    CREATE VIRTUAL TABLE notes_note_fts USING fts5(
+        title, content,
+        content='notes_note', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER notes_note_fts_ai AFTER INSERT ON notes_note BEGIN
+        INSERT INTO notes_note_fts(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER notes_note_fts_ad AFTER DELETE ON notes_note BEGIN
+        INSERT INTO notes_note_fts(notes_note_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER notes_note_fts_au AFTER UPDATE OF title, content ON notes_note BEGIN
+        INSERT INTO notes_note_fts(notes_note_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO notes_note_fts(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+    "INSERT INTO notes_note_fts(notes_note_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DROP_FTS_SQL = [
+    "DROP TRIGGER IF EXISTS notes_note_fts_ai",
+    "DROP TRIGGER IF EXISTS notes_note_fts_ad",
+    "DROP TRIGGER IF EXISTS notes_note_fts_au",
+    "DROP TABLE IF EXISTS notes_note_fts",
+]
+
+
+def search_index():
+    return GinIndex(SearchVector("title", "content", config="english"), name="notes_note_search_idx")
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "postgresql":
+        Note = apps.get_model("notes", "Note")
+        schema_editor.add_index(Note, search_index(), concurrently=True)
+    elif connection.vendor == "sqlite":
+        try:
+            for statement in SQLITE_FTS_SQL:
+                schema_editor.execute(statement)
+        except OperationalError:
+            # SQLite built without FTS5; search falls back to LIKE queries.
+            for statement in SQLITE_DROP_FTS_SQL:
+                schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "postgresql":
+        Note = apps.get_model("notes", "Note")
+        schema_editor.remove_index(Note, search_index(), concurrently=True)
+    elif connection.vendor == "sqlite":
+        for statement in SQLITE_DROP_FTS_SQL:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("notes", "0009_note_version"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
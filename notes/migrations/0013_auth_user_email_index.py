@@ -0,0 +1,30 @@
+from django.db import migrations
+
+INDEX_NAME = "notes_auth_user_email_idx"
+
+
+def create_email_index(apps, schema_editor):
+    # auth.User belongs to another app, so the index is managed here by name.
+    concurrently = "CONCURRENTLY " if schema_editor.connection.vendor == "postgresql" else ""
+    schema_editor.execute(
+        f"CREATE INDEX {concurrently}IF NOT EXISTS {INDEX_NAME} ON auth_user (email)"
+    )
+
+
+def drop_email_index(apps, schema_editor):
+    concurrently = "CONCURRENTLY " if schema_editor.connection.vendor == "postgresql" else ""
+    schema_editor.execute(f"DROP INDEX {concurrently}IF EXISTS {INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("notes", "0012_note_sequence_tombstone"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_email_index, drop_email_index),
+    ]
@@ -0,0 +1,141 @@
+# Generated by Django 5.2.9 on 2026-10-17 18:03
+
+import zlib
+
+from django.conf import settings
+from django.db import migrations, models, transaction
+from django.db.models.functions import Length
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Frozen copy of the 0010 triggers, which SQLite drops along with the old
+# table when it rebuilds notes_note; the FTS table itself survives.
+SQLITE_FTS_TRIGGERS_SQL = [
+    "DROP TRIGGER IF EXISTS notes_note_fts_ai",
+    "DROP TRIGGER IF EXISTS notes_note_fts_ad",
+    "DROP TRIGGER IF EXISTS notes_note_fts_au",
+    """
+    CREATE TRIGGER notes_note_fts_ai AFTER INSERT ON notes_note BEGIN
+        INSERT INTO notes_note_fts(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER notes_note_fts_ad AFTER DELETE ON notes_note BEGIN
+        INSERT INTO notes_note_fts(notes_note_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER notes_note_fts_au AFTER UPDATE OF title, content ON notes_note BEGIN
+        INSERT INTO notes_note_fts(notes_note_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO notes_note_fts(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+]
+
+
+def reinstall_sqlite_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'notes_note_fts'")
+        if cursor.fetchone() is None:
+            return
+    for statement in SQLITE_FTS_TRIGGERS_SQL:
+        schema_editor.execute(statement)
+
+
+
+# Frozen copy of the storage format in notes.compression: a one-byte codec
+# marker, then the zlib or zstd stream; the column keeps the text's head.
+def compress(text):
+    codec = settings.NOTES_CONTENT_COMPRESSION
+    if len(text) < settings.NOTES_COMPRESS_MIN_CHARS:
+        return text, None
+    raw = text.encode("utf-8")
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("NOTES_CONTENT_COMPRESSION=zstd needs the zstandard package")
+        blob = b"s" + zstandard.ZstdCompressor().compress(raw)
+    elif codec == "zlib":
+        blob = b"z" + zlib.compress(raw)
+    else:
+        raise ValueError(f"Unknown content compression codec {codec!r}")
+    if len(blob) >= len(raw):
+        return text, None
+    return text[:max(settings.NOTES_COMPRESSED_HEAD_CHARS, settings.NOTES_PREVIEW_CHARS + 1)], blob
+
+
+def decompress(blob):
+    blob = bytes(blob)
+    if blob[:1] == b"s" and zstandard is not None:
+        return zstandard.ZstdDecompressor().decompress(blob[1:]).decode("utf-8")
+    if blob[:1] == b"z":
+        return zlib.decompress(blob[1:]).decode("utf-8")
+    raise ValueError(f"Unreadable compressed content marker {blob[:1]!r}")
+
+
+def repack(apps, schema_editor, inflate, batch_size=200):
+    using = schema_editor.connection.alias
+    notes = apps.get_model("notes", "Note")._base_manager.using(using)
+    if inflate:
+        candidates = notes.filter(content_compressed__isnull=False)
+    elif settings.NOTES_CONTENT_COMPRESSION:
+        candidates = notes.alias(length=Length("content")).filter(
+            content_compressed__isnull=True, length__gte=settings.NOTES_COMPRESS_MIN_CHARS,
+        )
+    else:
+        return
+    last = 0
+    while True:
+        with transaction.atomic(using=using):
+            batch = list(
+                candidates.filter(pk__gt=last).order_by("pk")
+                .values_list("pk", "version", "content", "content_compressed")[:batch_size]
+            )
+            if not batch:
+                return
+            last = batch[-1][0]
+            for pk, version, column, blob in batch:
+                text = decompress(blob) if blob is not None else column
+                new_column, new_blob = (text, None) if inflate else compress(text)
+                if new_blob is not None or blob is not None:
+                    notes.filter(pk=pk, version=version).update(content=new_column, content_compressed=new_blob)
+
+
+def compress_existing(apps, schema_editor):
+    # A no-op unless NOTES_CONTENT_COMPRESSION is set when migrating. The
+    # full text is indexed for search by 0017.
+    repack(apps, schema_editor, inflate=False)
+
+
+def inflate_existing(apps, schema_editor):
+    repack(apps, schema_editor, inflate=True)
+
+
+class Migration(migrations.Migration):
+
+    # Each batch of rewritten rows commits on its own.
+    atomic = False
+
+    dependencies = [
+        ("notes", "0013_auth_user_email_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, reinstall_sqlite_fts),
+        migrations.AddField(
+            model_name="note",
+            name="content_compressed",
+            field=models.BinaryField(editable=False, null=True),
+        ),
+        migrations.RunPython(reinstall_sqlite_fts, migrations.RunPython.noop),
+        migrations.RunPython(compress_existing, inflate_existing),
+    ]
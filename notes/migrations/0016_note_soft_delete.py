@@ -0,0 +1,118 @@
+# Generated by Django 5.2.9 on 2026-10-17 18:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from notes.operations import AddIndexConcurrently, RemoveIndexConcurrently
+
+
+# Frozen copy of the 0010 triggers, which SQLite drops along with the old
+# table when it rebuilds notes_note; the FTS table itself survives.
+SQLITE_FTS_TRIGGERS_SQL = [
+    "DROP TRIGGER IF EXISTS notes_note_fts_ai",
+    "DROP TRIGGER IF EXISTS notes_note_fts_ad",
+    "DROP TRIGGER IF EXISTS notes_note_fts_au",
+    """
+    CREATE TRIGGER notes_note_fts_ai AFTER INSERT ON notes_note BEGIN
+        INSERT INTO notes_note_fts(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER notes_note_fts_ad AFTER DELETE ON notes_note BEGIN
+        INSERT INTO notes_note_fts(notes_note_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER notes_note_fts_au AFTER UPDATE OF title, content ON notes_note BEGIN
+        INSERT INTO notes_note_fts(notes_note_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO notes_note_fts(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+]
+
+
+def reinstall_sqlite_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'notes_note_fts'")
+        if cursor.fetchone() is None:
+            return
+    for statement in SQLITE_FTS_TRIGGERS_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("notes", "0015_note_revision"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, reinstall_sqlite_fts),
+        migrations.AddField(
+            model_name="note",
+            name="deleted_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name="note",
+            name="user",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="notes",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.RunPython(reinstall_sqlite_fts, migrations.RunPython.noop),
+        # Build the partial indexes before dropping the full ones they replace.
+        AddIndexConcurrently(
+            model_name="note",
+            index=models.Index(
+                condition=models.Q(("deleted_at__isnull", True)),
+                fields=["user", "-updated_at", "-id"],
+                name="notes_live_updated_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="note",
+            index=models.Index(
+                condition=models.Q(("deleted_at__isnull", True)),
+                fields=["user", "category", "-updated_at", "-id"],
+                name="notes_live_category_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="note",
+            index=models.Index(
+                condition=models.Q(("deleted_at__isnull", False)),
+                fields=["user", "-deleted_at", "-id"],
+                name="notes_user_trash_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="note",
+            index=models.Index(
+                condition=models.Q(("deleted_at__isnull", False)),
+                fields=["deleted_at"],
+                name="notes_trash_expiry_idx",
+            ),
+        ),
+        RemoveIndexConcurrently(
+            model_name="note",
+            name="notes_user_updated_idx",
+        ),
+        RemoveIndexConcurrently(
+            model_name="note",
+            name="notes_user_category_idx",
+        ),
+    ]
@@ -0,0 +1,176 @@
+# Generated by Django 5.2.9 on 2026-10-17 18:36
+
+import zlib
+
+import django.contrib.postgres.search
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Frozen copies of the 0010 SQLite DDL, which indexes only the head that
+# the content column holds for compressed notes; reversing restores it.
+HEAD_FTS_TABLE_SQL = """
+    CREATE VIRTUAL TABLE notes_note_fts USING fts5(
+        title, content,
+        content='notes_note', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+"""
+
+HEAD_FTS_TRIGGERS_SQL = [
+    """
+    CREATE TRIGGER notes_note_fts_ai AFTER INSERT ON notes_note BEGIN
+        INSERT INTO notes_note_fts(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER notes_note_fts_ad AFTER DELETE ON notes_note BEGIN
+        INSERT INTO notes_note_fts(notes_note_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER notes_note_fts_au AFTER UPDATE OF title, content ON notes_note BEGIN
+        INSERT INTO notes_note_fts(notes_note_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO notes_note_fts(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+]
+
+# The same external-content table, fed the full text by the triggers
+# through notes_inflate(), which notes.search registers on every connection.
+# A migration that makes SQLite rebuild notes_note must recreate these.
+FULL_TEXT_FTS_TRIGGERS_SQL = [
+    """
+    CREATE TRIGGER notes_note_fts_ai AFTER INSERT ON notes_note BEGIN
+        INSERT INTO notes_note_fts(rowid, title, content)
+        VALUES (new.id, new.title, notes_inflate(new.content, new.content_compressed));
+    END
+    """,
+    """
+    CREATE TRIGGER notes_note_fts_ad AFTER DELETE ON notes_note BEGIN
+        INSERT INTO notes_note_fts(notes_note_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, notes_inflate(old.content, old.content_compressed));
+    END
+    """,
+    """
+    CREATE TRIGGER notes_note_fts_au AFTER UPDATE OF title, content, content_compressed ON notes_note BEGIN
+        INSERT INTO notes_note_fts(notes_note_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, notes_inflate(old.content, old.content_compressed));
+        INSERT INTO notes_note_fts(rowid, title, content)
+        VALUES (new.id, new.title, notes_inflate(new.content, new.content_compressed));
+    END
+    """,
+]
+
+DROP_FTS_SQL = [
+    "DROP TRIGGER IF EXISTS notes_note_fts_ai",
+    "DROP TRIGGER IF EXISTS notes_note_fts_ad",
+    "DROP TRIGGER IF EXISTS notes_note_fts_au",
+    "DROP TABLE IF EXISTS notes_note_fts",
+]
+
+
+def decompress(blob):
+    blob = bytes(blob)
+    if blob[:1] == b"s" and zstandard is not None:
+        return zstandard.ZstdDecompressor().decompress(blob[1:]).decode("utf-8")
+    if blob[:1] == b"z":
+        return zlib.decompress(blob[1:]).decode("utf-8")
+    raise ValueError(f"Unreadable compressed content marker {blob[:1]!r}")
+
+
+def inflate(content, blob):
+    return content if blob is None else decompress(blob)
+
+
+def has_fts_table(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'notes_note_fts'")
+        return cursor.fetchone() is not None
+
+
+def reinstall_head_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite" and has_fts_table(schema_editor.connection):
+        for statement in DROP_FTS_SQL[:3] + HEAD_FTS_TRIGGERS_SQL:
+            schema_editor.execute(statement)
+
+
+def search_index():
+    return GinIndex(SearchVector("title", "content", config="english"), name="notes_note_search_idx")
+
+
+def document_index():
+    return GinIndex(
+        Coalesce(F("search_vector"), SearchVector("title", "content", config="english")),
+        name="notes_note_document_idx",
+    )
+
+
+def index_documents(apps, schema_editor):
+    connection = schema_editor.connection
+    Note = apps.get_model("notes", "Note")
+    if connection.vendor == "postgresql":
+        schema_editor.add_index(Note, document_index(), concurrently=True)
+        schema_editor.remove_index(Note, search_index(), concurrently=True)
+        notes = Note._base_manager.using(connection.alias)
+        last = 0
+        while batch := list(
+            notes.filter(content_compressed__isnull=False, pk__gt=last).order_by("pk")
+            .values_list("pk", "title", "content_compressed")[:200]
+        ):
+            last = batch[-1][0]
+            for pk, title, blob in batch:
+                notes.filter(pk=pk).update(
+                    search_vector=SearchVector(Value(title), Value(decompress(blob)), config="english"),
+                )
+    elif connection.vendor == "sqlite" and has_fts_table(connection):
+        connection.ensure_connection()
+        connection.connection.create_function("notes_inflate", 2, inflate, deterministic=True)
+        for statement in DROP_FTS_SQL + [HEAD_FTS_TABLE_SQL] + FULL_TEXT_FTS_TRIGGERS_SQL:
+            schema_editor.execute(statement)
+        schema_editor.execute(
+            "INSERT INTO notes_note_fts(rowid, title, content) "
+            "SELECT id, title, notes_inflate(content, content_compressed) FROM notes_note"
+        )
+
+
+def unindex_documents(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "postgresql":
+        Note = apps.get_model("notes", "Note")
+        schema_editor.add_index(Note, search_index(), concurrently=True)
+        schema_editor.remove_index(Note, document_index(), concurrently=True)
+    elif connection.vendor == "sqlite" and has_fts_table(connection):
+        for statement in DROP_FTS_SQL + [HEAD_FTS_TABLE_SQL] + HEAD_FTS_TRIGGERS_SQL:
+            schema_editor.execute(statement)
+        schema_editor.execute("INSERT INTO notes_note_fts(notes_note_fts) VALUES ('rebuild')")
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("notes", "0016_note_soft_delete"),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, reinstall_head_triggers),
+        migrations.AddField(
+            model_name="note",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(index_documents, unindex_documents),
+    ]
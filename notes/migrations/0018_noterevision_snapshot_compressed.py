@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-17 19:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0017_note_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='noterevision',
+            name='snapshot_compressed',
+            field=models.BinaryField(null=True),
+        ),
+    ]
@@ -1,5 +1,47 @@
-from django.db import models
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction, IntegrityError
+from django.db.models import Count, Exists, F, OuterRef, Q, Sum
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .compression import compress_text, decompress, pack
+from .deltas import apply_text_edits, text_edits
+from .events import publish_on_commit
+from .routers import pin_to_primary
+
+
+class VersionConflict(Exception):
+    """Raised when a note was changed since the version a client edited"""
+
+    def __init__(self, current_version):
+        super().__init__(f'Note is at version {current_version}')
+        self.current_version = current_version
+
+
+class NoteContentField(models.TextField):
+    """
+    Text column that only holds the head of compressed content; see
+    ``notes.compression``. The model's ``pack_content()`` fills in its
+    blob column.
+    """
+
+    def pre_save(self, model_instance, add):
+        return model_instance.pack_content()
+
+    def deconstruct(self):
+        # The column is a plain text column; keep migrations free of this class.
+        name, _, args, kwargs = super().deconstruct()
+        return name, 'django.db.models.TextField', args, kwargs
+
+
+class LiveNoteManager(models.Manager):
+    """Notes that are not in the trash"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
 
 
 class Note(models.Model):
@@ -10,15 +52,463 @@ class Note(models.Model):
         ('Drama', 'Drama'),
     ]
     
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notes')
+    # Deleting a user leaves their notes for purge_notes to remove in batches.
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='notes')
     title = models.CharField(max_length=200)
-    content = models.TextField(blank=True)
+    content = NoteContentField(blank=True)
     category = models.CharField(max_length=50, choices=CATEGORY_CHOICES, default='Random Thoughts')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    version = models.PositiveIntegerField(default=1)
+    sequence = models.PositiveBigIntegerField(default=0)
+    content_compressed = models.BinaryField(null=True, editable=False)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # PostgreSQL only: the full-text vector of compressed notes, whose
+    # content column holds just the head. See notes.search.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = LiveNoteManager()
+    all_objects = models.Manager()
 
     class Meta:
-        ordering = ['-updated_at']
+        ordering = ['-updated_at', '-id']
+        indexes = [
+            models.Index(
+                fields=['user', '-updated_at', '-id'], condition=Q(deleted_at__isnull=True),
+                name='notes_live_updated_idx',
+            ),
+            models.Index(
+                fields=['user', 'category', '-updated_at', '-id'], condition=Q(deleted_at__isnull=True),
+                name='notes_live_category_idx',
+            ),
+            models.Index(fields=['user', 'sequence', 'id'], name='notes_user_sequence_idx'),
+            models.Index(
+                fields=['user', '-deleted_at', '-id'], condition=Q(deleted_at__isnull=False),
+                name='notes_user_trash_idx',
+            ),
+            models.Index(
+                fields=['deleted_at'], condition=Q(deleted_at__isnull=False), name='notes_trash_expiry_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.title
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'content' in instance.__dict__:
+            compressed = instance.content_compressed
+            if compressed is not None:
+                instance.content = decompress(compressed)
+        return instance
+
+    def pack_content(self):
+        """Compress ``content`` if it is large enough and return what its column should hold"""
+        column, self.content_compressed = pack(self.content)
+        return column
+
+    def save(self, *args, **kwargs):
+        """Save the note, bump its version and keep the per-user bookkeeping in step"""
+        from .search import index_notes
+
+        update_fields = kwargs.get('update_fields')
+        with transaction.atomic():
+            self.sequence = ChangeSequence.objects.advance(self.user_id)
+            if self._state.adding:
+                super().save(*args, **kwargs)
+                CategoryCount.objects.adjust(self.user_id, self.category, 1)
+                NoteRevision.objects.record(self)
+                index_notes(self._state.db, [self])
+                event = 'created'
+            else:
+                previous = None
+                if update_fields is None or 'category' in update_fields:
+                    # Read the stored category under the row lock: the
+                    # instance may be stale if another request moved the note.
+                    previous = (
+                        Note.objects.select_for_update().filter(pk=self.pk)
+                        .values_list('category', flat=True)
+                        .first()
+                    )
+
+                revised = update_fields is None or {'title', 'content'} & set(update_fields)
+                was_compressed = {self.pk} if revised and self.content_compressed is not None else ()
+                self.version = F('version') + 1
+                if update_fields is not None:
+                    kwargs['update_fields'] = {*update_fields, 'version', 'sequence'}
+                    if 'content' in update_fields:
+                        kwargs['update_fields'].add('content_compressed')
+                super().save(*args, **kwargs)
+                self.refresh_from_db(fields=['version'])
+
+                if previous is not None and previous != self.category:
+                    CategoryCount.objects.adjust(self.user_id, previous, -1)
+                    CategoryCount.objects.adjust(self.user_id, self.category, 1)
+                if revised:
+                    NoteRevision.objects.record(self)
+                    index_notes(self._state.db, [self], was_compressed)
+                event = 'updated'
+            publish_on_commit(self.user_id, self.event(event))
+
+    def apply_delta(self, version, edits, title=None):
+        """
+        Apply text-range edits to the content written at ``version``.
+
+        The write is conditional on the stored version so concurrent editors
+        cannot silently overwrite each other; raises ``VersionConflict`` when
+        the note has moved on and ``ValueError`` for edits that do not fit.
+        """
+        from .search import index_full_text
+
+        if version != self.version:
+            raise VersionConflict(self.version)
+        was_compressed = self.content_compressed is not None
+        content = apply_text_edits(self.content, edits)
+        column, compressed = pack(content)
+
+        fields = {'content': content, 'updated_at': timezone.now()}
+        if title is not None:
+            fields['title'] = title
+        with transaction.atomic():
+            fields['sequence'] = ChangeSequence.objects.advance(self.user_id)
+            updated = (
+                Note.objects
+                .filter(pk=self.pk, version=version)
+                .update(
+                    version=F('version') + 1,
+                    **{**fields, 'content': column, 'content_compressed': compressed},
+                )
+            )
+            if not updated:
+                current = Note.objects.filter(pk=self.pk).values_list('version', flat=True).first()
+                raise VersionConflict(current)
+            NoteRevision.objects.record(
+                self, version=version + 1, title=fields.get('title', self.title), content=content,
+            )
+            if compressed is not None:
+                index_full_text(self._state.db, compressed=[(self.pk, fields.get('title', self.title), content)])
+            elif was_compressed:
+                index_full_text(self._state.db, inflated=[self.pk])
+            publish_on_commit(self.user_id, {
+                'type': 'updated', 'id': self.pk, 'version': version + 1, 'sequence': fields['sequence'],
+            })
+
+        for name, value in fields.items():
+            setattr(self, name, value)
+        self.content_compressed = compressed
+        self.version = version + 1
+
+    def delete(self, *args, **kwargs):
+        """Move the note to the trash, decrement its category counter and leave a tombstone"""
+        if self.deleted_at is not None:
+            return 0, {}
+        now = timezone.now()
+        with transaction.atomic():
+            sequence = ChangeSequence.objects.advance(self.user_id)
+            trashed = Note.objects.filter(pk=self.pk).update(deleted_at=now, sequence=sequence)
+            if not trashed:
+                return 0, {}
+            CategoryCount.objects.adjust(self.user_id, self.category, -1)
+            Tombstone.objects.create(user_id=self.user_id, note_id=self.pk, sequence=sequence)
+            publish_on_commit(self.user_id, {'type': 'deleted', 'id': self.pk, 'sequence': sequence})
+        self.deleted_at, self.sequence = now, sequence
+        return trashed, {self._meta.label: trashed}
+
+    def restore(self):
+        """Take the note out of the trash; returns whether it was there"""
+        if self.deleted_at is None:
+            return False
+        with transaction.atomic():
+            sequence = ChangeSequence.objects.advance(self.user_id)
+            restored = (
+                Note.all_objects
+                .filter(pk=self.pk, deleted_at__isnull=False)
+                .update(deleted_at=None, sequence=sequence)
+            )
+            if not restored:
+                return False
+            CategoryCount.objects.adjust(self.user_id, self.category, 1)
+            self.deleted_at, self.sequence = None, sequence
+            # Sync clients saw a tombstone, so to them the note is new again.
+            publish_on_commit(self.user_id, self.event('created'))
+        return True
+
+    def event(self, kind):
+        """The push notification describing this note after a write"""
+        return {'type': kind, 'id': self.pk, 'version': self.version, 'sequence': self.sequence}
+
+
+class NoteRevisionManager(models.Manager):
+    def record(self, note, version=None, title=None, content=None, now=None):
+        """
+        Record the note's current title and content as its newest revision.
+
+        Saves within ``NOTES_REVISION_WINDOW_SECONDS`` of the newest
+        revision's first save are folded into it. Revisions store the edits
+        from the previous revision, with a full snapshot every
+        ``NOTES_REVISION_SNAPSHOT_EVERY`` revisions so that rebuilding one
+        never replays more than that many diffs. The values default to the
+        note's own attributes.
+        """
+        version = note.version if version is None else version
+        title = note.title if title is None else title
+        content = note.content if content is None else content
+        now = now or timezone.now()
+
+        latest = self.filter(note_id=note.pk).order_by('-number').first()
+        if latest is None:
+            self.create(
+                note_id=note.pk, number=1, version=version, title=title, snapshot=content,
+                created_at=now, updated_at=now,
+            )
+            return
+
+        window = timedelta(seconds=settings.NOTES_REVISION_WINDOW_SECONDS)
+        if now - latest.created_at < window:
+            # Fold into the newest revision by diffing against the one before it.
+            if latest.snapshot is None:
+                base, _ = self.content_at(note.pk, latest.number - 1)
+                latest.edits = pack_edits(text_edits(base, content))
+            else:
+                latest.snapshot = content
+            latest.version, latest.title, latest.updated_at = version, title, now
+            latest.save(
+                update_fields=['version', 'title', 'snapshot', 'snapshot_compressed', 'edits', 'updated_at'],
+            )
+            return
+
+        base, snapshot_number = self.content_at(note.pk, latest.number)
+        if base == content and latest.title == title:
+            return
+        number = latest.number + 1
+        revision = self.model(
+            note_id=note.pk, number=number, version=version, title=title, created_at=now, updated_at=now,
+        )
+        if number - snapshot_number >= settings.NOTES_REVISION_SNAPSHOT_EVERY:
+            revision.snapshot = content
+        else:
+            revision.edits = pack_edits(text_edits(base, content))
+        revision.save()
+
+    def record_created(self, notes, batch_size=None):
+        """Record the first revision of notes inserted with ``bulk_create``"""
+        self.bulk_create(
+            [
+                self.model(
+                    note_id=note.pk, number=1, version=note.version, title=note.title, snapshot=note.content,
+                    created_at=note.created_at, updated_at=note.created_at,
+                )
+                for note in notes
+            ],
+            batch_size=batch_size,
+        )
+
+    def content_at(self, note_id, number):
+        """
+        Rebuild a revision's content from the nearest snapshot at or before it.
+
+        Returns ``(content, snapshot_number)``; raises ``NoteRevision.DoesNotExist``
+        when the note has no such revision.
+        """
+        revisions = self.filter(note_id=note_id, number__lte=number)
+        snapshot_number = (
+            revisions.filter(snapshot__isnull=False).order_by('-number').values_list('number', flat=True).first()
+        )
+        chain = list(
+            revisions.filter(number__gte=snapshot_number or 0)
+            .order_by('number')
+            .values_list('number', 'snapshot', 'snapshot_compressed', 'edits')
+        )
+        if snapshot_number is None or chain[-1][0] != number:
+            raise self.model.DoesNotExist(f'Note {note_id} has no revision {number}')
+        _, content, compressed, _ = chain[0]
+        if compressed is not None:
+            content = decompress(compressed)
+        for _, _, _, edits in chain[1:]:
+            content = apply_text_edits(content, unpack_edits(edits))
+        return content, snapshot_number
+
+
+def pack_edits(edits):
+    # Stored as [start, end, text] triples to keep diff rows small.
+    return [[edit['start'], edit['end'], edit['text']] for edit in edits]
+
+
+def unpack_edits(edits):
+    return [{'start': start, 'end': end, 'text': text} for start, end, text in edits]
+
+
+class NoteRevision(models.Model):
+    """One point in a note's history, stored as a diff or a full snapshot"""
+    note = models.ForeignKey(Note, on_delete=models.CASCADE, related_name='revisions')
+    number = models.PositiveIntegerField()
+    version = models.PositiveIntegerField()
+    title = models.CharField(max_length=200)
+    snapshot = NoteContentField(null=True)
+    snapshot_compressed = models.BinaryField(null=True, editable=False)
+    edits = models.JSONField(null=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    objects = NoteRevisionManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['note', 'number'], name='notes_revision_note_number_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.note_id}#{self.number}'
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'snapshot' in instance.__dict__:
+            compressed = instance.snapshot_compressed
+            if compressed is not None:
+                instance.snapshot = decompress(compressed)
+        return instance
+
+    def pack_content(self):
+        """Compress a large ``snapshot`` like note content and return what its column should hold"""
+        # compress_text rather than pack: the ratio metrics count note writes.
+        if self.snapshot is None:
+            self.snapshot_compressed = None
+            return None
+        column, self.snapshot_compressed = compress_text(self.snapshot)
+        return column
+
+
+class CategoryCountManager(models.Manager):
+    def adjust(self, user_id, category, delta):
+        """Atomically add ``delta`` to a user's counter for ``category``"""
+        counters = self.filter(user_id=user_id, category=category)
+        if counters.update(count=F('count') + delta):
+            return
+        try:
+            with transaction.atomic():
+                self.create(user_id=user_id, category=category, count=delta)
+        except IntegrityError:
+            counters.update(count=F('count') + delta)
+
+    def total(self, user_id, category=None):
+        """A user's number of notes, optionally in one category, read from the counters"""
+        return self._totals(user_id, category).aggregate(total=Sum('count'))['total'] or 0
+
+    async def atotal(self, user_id, category=None):
+        return (await self._totals(user_id, category).aaggregate(total=Sum('count')))['total'] or 0
+
+    def _totals(self, user_id, category):
+        counters = self.filter(user_id=user_id)
+        if category:
+            counters = counters.filter(category=category)
+        return counters
+
+    def rebuild(self, user_ids=None, dry_run=False):
+        """Recompute counters from the notes table and return the number of rows corrected"""
+        # Notes of deleted users wait for purge_notes and have no counters.
+        notes = Note.objects.filter(Exists(User.objects.filter(pk=OuterRef('user_id'))))
+        counters = self.all()
+        if user_ids is not None:
+            notes = notes.filter(user_id__in=user_ids)
+            counters = counters.filter(user_id__in=user_ids)
+
+        expected = {
+            (row['user_id'], row['category']): row['count']
+            for row in notes.values('user_id', 'category').annotate(count=Count('id'))
+        }
+
+        with transaction.atomic():
+            existing = {
+                (counter.user_id, counter.category): counter
+                for counter in counters.select_for_update()
+            }
+            to_create, to_update = [], []
+            for key, count in expected.items():
+                counter = existing.get(key)
+                if counter is None:
+                    to_create.append(self.model(user_id=key[0], category=key[1], count=count))
+                elif counter.count != count:
+                    counter.count = count
+                    to_update.append(counter)
+            for key, counter in existing.items():
+                if key not in expected and counter.count != 0:
+                    counter.count = 0
+                    to_update.append(counter)
+
+            if not dry_run:
+                self.bulk_create(to_create)
+                self.bulk_update(to_update, ['count'])
+        return len(to_create) + len(to_update)
+
+
+class CategoryCount(models.Model):
+    """Denormalized number of notes a user has in each category"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='category_counts')
+    category = models.CharField(max_length=50)
+    count = models.IntegerField(default=0)
+
+    objects = CategoryCountManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'category'], name='notes_categorycount_user_category_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}:{self.category}={self.count}'
+
+
+class ChangeSequenceManager(models.Manager):
+    def advance(self, user_id, count=1):
+        """Advance a user's change sequence by ``count`` and return the new value"""
+        # Every write goes through here, so it is where reads get pinned.
+        pin_to_primary(user_id)
+        now = timezone.now()
+        sequences = self.filter(user_id=user_id)
+        if not sequences.update(value=F('value') + count, changed_at=now):
+            try:
+                with transaction.atomic():
+                    self.create(user_id=user_id, value=count, changed_at=now)
+                return count
+            except IntegrityError:
+                sequences.update(value=F('value') + count, changed_at=now)
+        return sequences.values_list('value', flat=True).get()
+
+    def current(self, user_id):
+        """Return ``(value, changed_at)`` for a user, ``(0, None)`` before any change"""
+        return (
+            self.filter(user_id=user_id).values_list('value', 'changed_at').first()
+            or (0, None)
+        )
+
+
+class ChangeSequence(models.Model):
+    """Per-user counter advanced by every write to the user's notes"""
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name='note_change_sequence'
+    )
+    value = models.PositiveBigIntegerField(default=0)
+    changed_at = models.DateTimeField()
+
+    objects = ChangeSequenceManager()
+
+    def __str__(self):
+        return f'{self.user_id}@{self.value}'
+
+
+class Tombstone(models.Model):
+    """Marker left by a deleted note so incremental sync can report the deletion"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='note_tombstones')
+    note_id = models.BigIntegerField()
+    sequence = models.PositiveBigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'sequence', 'note_id'], name='notes_tombstone_sequence_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}:{self.note_id}@{self.sequence}'
@@ -0,0 +1,199 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from functools import partial
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class CountedPaginator(Paginator):
+    """A ``Paginator`` that trusts a count it is given instead of running ``COUNT(*)``"""
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count = count
+
+
+class NotePagination(PageNumberPagination):
+    """
+    Page-number pagination with an opt-in keyset (cursor) mode.
+
+    Sending ``?cursor=`` (empty for the first page) switches to keyset
+    pagination over ``(updated_at, id)``: no ``COUNT(*)`` and no ``OFFSET``,
+    and pages stay stable when autosave moves a note to the top of the list.
+
+    ``?page_size=`` is honoured up to ``NOTES_MAX_PAGE_SIZE``. ``?count=``
+    picks how page-number mode totals the collection: ``exact`` runs
+    ``COUNT(*)``, ``estimate`` asks the view's ``estimated_count()`` (the
+    notes views read the category counters) and ``none`` skips the total,
+    answering ``count: null`` and ``next`` from one extra row.
+    """
+    cursor_query_param = 'cursor'
+    cursor_template = 'rest_framework/pagination/previous_and_next.html'
+    invalid_cursor_message = 'Invalid cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    count_modes = ('exact', 'estimate', 'none')
+
+    @classmethod
+    def page_size_for(cls, query_params):
+        """The requested page size, capped at ``NOTES_MAX_PAGE_SIZE``, else the default"""
+        try:
+            size = int(query_params[cls.page_size_query_param])
+        except (KeyError, ValueError):
+            return cls.page_size
+        if size < 1:
+            return cls.page_size
+        return min(size, settings.NOTES_MAX_PAGE_SIZE)
+
+    @classmethod
+    def count_mode_for(cls, query_params):
+        mode = query_params.get(cls.count_query_param)
+        return mode if mode in cls.count_modes else settings.NOTES_PAGE_COUNT
+
+    def get_page_size(self, request):
+        return self.page_size_for(request.query_params)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        self.count_mode = self.count_mode_for(request.query_params)
+        if self.cursor_mode:
+            return self.paginate_by_cursor(queryset, request)
+        if self.count_mode == 'none':
+            return self.paginate_uncounted(queryset, request)
+        if self.count_mode == 'estimate' and hasattr(view, 'estimated_count'):
+            count = view.estimated_count()
+            self.django_paginator_class = partial(CountedPaginator, count=count)
+        return super().paginate_queryset(queryset, request, view)
+
+    def paginate_by_cursor(self, queryset, request):
+        self.request = request
+        self.template = self.cursor_template
+        self.page_size = self.get_page_size(request)
+        queryset = self.after(queryset, self.decode_cursor(request))
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def paginate_uncounted(self, queryset, request):
+        self.request = request
+        self.template = self.cursor_template
+        self.page_size = self.get_page_size(request)
+        number = request.query_params.get(self.page_query_param) or 1
+        try:
+            self.page_number = int(number)
+            if self.page_number < 1:
+                raise ValueError
+        except ValueError:
+            raise NotFound(self.invalid_page_message)
+
+        offset = (self.page_number - 1) * self.page_size
+        results = list(queryset[offset:offset + self.page_size + 1])
+        if not results and self.page_number > 1:
+            raise NotFound(self.invalid_page_message)
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    @property
+    def uncounted_mode(self):
+        return not self.cursor_mode and self.count_mode == 'none'
+
+    def get_paginated_response(self, data):
+        if self.uncounted_mode:
+            return Response({
+                'count': None,
+                'next': self.get_next_link(),
+                'previous': self.get_previous_link(),
+                'results': data,
+            })
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': None,
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if self.uncounted_mode:
+            return self.number_links(self.request.build_absolute_uri(), self.page_number, self.has_next)[0]
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        return self.cursor_link(self.request.build_absolute_uri(), self.page[-1])
+
+    def get_previous_link(self):
+        if self.uncounted_mode:
+            return self.number_links(self.request.build_absolute_uri(), self.page_number, self.has_next)[1]
+        if not self.cursor_mode:
+            return super().get_previous_link()
+        return None
+
+    def get_html_context(self):
+        if not self.cursor_mode and not self.uncounted_mode:
+            return super().get_html_context()
+        return {'previous_url': self.get_previous_link(), 'next_url': self.get_next_link()}
+
+    @staticmethod
+    def after(queryset, position):
+        """``queryset`` in keyset order, past ``position`` unless it is ``None``"""
+        queryset = queryset.order_by('-updated_at', '-id')
+        if position is None:
+            return queryset
+        updated_at, pk = position
+        return queryset.filter(Q(updated_at__lt=updated_at) | Q(updated_at=updated_at, id__lt=pk))
+
+    @classmethod
+    def cursor_link(cls, url, item):
+        """The link to the keyset page after the one ending with ``item``"""
+        url = remove_query_param(url, cls.page_query_param)
+        return replace_query_param(url, cls.cursor_query_param, cls.encode_cursor(*cls.position(item)))
+
+    @classmethod
+    def number_links(cls, url, number, has_next):
+        """``(next, previous)`` links around page ``number``"""
+        next_url = replace_query_param(url, cls.page_query_param, number + 1) if has_next else None
+        if number == 1:
+            return next_url, None
+        if number == 2:
+            return next_url, remove_query_param(url, cls.page_query_param)
+        return next_url, replace_query_param(url, cls.page_query_param, number - 1)
+
+    @staticmethod
+    def position(item):
+        """``(updated_at, id)`` of a model instance or a ``.values()`` row"""
+        if isinstance(item, dict):
+            return item['updated_at'], item['id']
+        return item.updated_at, item.id
+
+    @staticmethod
+    def encode_cursor(updated_at, pk):
+        raw = f'{updated_at.isoformat()}|{pk}'
+        return urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
+
+    @staticmethod
+    def parse_cursor(encoded):
+        """Return ``(updated_at, id)``; raises ``ValueError`` for a malformed cursor"""
+        try:
+            raw = urlsafe_b64decode(encoded.encode('ascii')).decode('ascii')
+            updated_at, pk = raw.rsplit('|', 1)
+            return datetime.fromisoformat(updated_at), int(pk)
+        except (TypeError, ValueError, UnicodeError) as exc:
+            raise ValueError(str(exc))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            return self.parse_cursor(encoded)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
@@ -0,0 +1,113 @@
+"""
+Read-replica routing for the notes read endpoints.
+
+Reads only go to ``NOTES_READ_REPLICAS`` inside ``replica_reads()``, which
+the list, retrieve, categories and search views enter; everything else,
+including every write and the reads a write makes, stays on ``default``.
+A user who has just written is pinned to the primary for
+``NOTES_REPLICA_PIN_SECONDS`` so they always read their own writes despite
+replication lag. The pin lives in the ``NOTES_CACHE_ALIAS`` cache, which
+must therefore be shared by every worker.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+
+_use_replicas = ContextVar('notes_use_replicas', default=False)
+
+# Backends that do not share entries between worker processes.
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.dummy.DummyCache',
+    'django.core.cache.backends.locmem.LocMemCache',
+}
+
+
+def notes_cache():
+    return caches[settings.NOTES_CACHE_ALIAS]
+
+
+def check_pin_cache():
+    """
+    Refuse read replicas when the pin cache is local to each process: a
+    write pinned in one worker would not stop another from reading the
+    user's stale data from a replica.
+    """
+    backend = settings.CACHES[settings.NOTES_CACHE_ALIAS]['BACKEND']
+    if settings.NOTES_READ_REPLICAS and backend in PROCESS_LOCAL_CACHES:
+        raise ImproperlyConfigured(
+            f'DB_REPLICAS needs a cache shared between workers; set NOTES_CACHE_BACKEND '
+            f'(the {settings.NOTES_CACHE_ALIAS!r} cache uses {backend})'
+        )
+
+
+def pin_key(user_id):
+    return f'primary-pin-{user_id}'
+
+
+def pin_to_primary(user_id):
+    """Send the user's reads to the primary for the next few seconds"""
+    if settings.NOTES_READ_REPLICAS:
+        notes_cache().set(pin_key(user_id), 1, settings.NOTES_REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user_id):
+    return notes_cache().get(pin_key(user_id)) is not None
+
+
+async def ais_pinned(user_id):
+    return await notes_cache().aget(pin_key(user_id)) is not None
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Route the ORM reads made inside the block to a replica when ``enabled``"""
+    token = _use_replicas.set(enabled and bool(settings.NOTES_READ_REPLICAS))
+    try:
+        yield
+    finally:
+        _use_replicas.reset(token)
+
+
+def replica_read(method):
+    """Serve a view method's reads from a replica unless the user is pinned"""
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        with replica_reads(bool(settings.NOTES_READ_REPLICAS) and not is_pinned(request.user.id)):
+            return method(self, request, *args, **kwargs)
+    return wrapper
+
+
+def areplica_read(handler):
+    """``replica_read`` for the async views"""
+    @wraps(handler)
+    async def wrapper(request, *args, **kwargs):
+        with replica_reads(bool(settings.NOTES_READ_REPLICAS) and not await ais_pinned(request.user.id)):
+            return await handler(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replicas.get():
+            replicas = settings.NOTES_READ_REPLICAS
+            if replicas:
+                return random.choice(replicas)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive the schema through replication.
+        if db in settings.NOTES_READ_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,248 @@
+"""
+Full-text search over the title and the full text of notes.
+
+SQLite indexes notes in an FTS5 table that uses ``notes_note`` as external
+content, so it holds the index and not a second copy of the text. Triggers
+on ``notes_note`` feed it the title and ``notes_inflate(content,
+content_compressed)``, the full text even of compressed notes; that SQL
+function is registered on every connection by ``install_sqlite_functions``,
+and anything else writing notes to the database has to provide it too.
+Snippets are cut from the ``content`` column, which is only the head of a
+compressed note, and for the same reason FTS5's ``rebuild`` and
+``integrity-check`` commands must not be used on it. The DDL lives in the migrations; one that makes SQLite
+rebuild ``notes_note`` drops the triggers and has to recreate those of the
+latest FTS migration.
+
+PostgreSQL indexes the title and content columns, or the ``search_vector``
+that ``index_full_text`` stores for compressed notes.
+"""
+import json
+import re
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.db import connections
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce
+
+from .compression import decompress
+from .models import Note
+
+FTS_TABLE = 'notes_note_fts'
+SEARCH_CONFIG = 'english'
+SNIPPET_WORDS = 16
+
+_fts_tables = {}
+
+
+def inflate(content, blob):
+    """``notes_inflate()`` for SQLite: the full text of a note row"""
+    return content if blob is None else decompress(blob)
+
+
+def install_sqlite_functions(sender, connection, **kwargs):
+    """``connection_created`` receiver registering the SQL functions the FTS triggers call"""
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function('notes_inflate', 2, inflate, deterministic=True)
+
+
+def index_full_text(using, compressed=(), inflated=()):
+    """
+    Index the full text of notes stored compressed on PostgreSQL; the SQLite
+    triggers already do.
+
+    ``compressed`` holds ``(pk, title, text)`` for notes whose title or
+    content was just written and that are stored compressed; ``inflated``
+    the pks of notes that were compressed before the write and are not any
+    more.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    from django.contrib.postgres.search import SearchVector
+
+    notes = Note.all_objects.using(using)
+    for pk, title, text in compressed:
+        notes.filter(pk=pk).update(
+            search_vector=SearchVector(Value(title), Value(text), config=SEARCH_CONFIG),
+        )
+    if inflated:
+        notes.filter(pk__in=inflated, search_vector__isnull=False).update(search_vector=None)
+
+
+def index_notes(using, notes, was_compressed=()):
+    """
+    ``index_full_text`` for saved notes holding their full text;
+    ``was_compressed`` holds the pks of those stored compressed before.
+    """
+    index_full_text(
+        using,
+        compressed=[(note.pk, note.title, note.content) for note in notes if note.content_compressed is not None],
+        inflated=[note.pk for note in notes if note.content_compressed is None and note.pk in was_compressed],
+    )
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def search_vector():
+    from django.contrib.postgres.search import SearchVector
+    return SearchVector('title', 'content', config=SEARCH_CONFIG)
+
+
+def search_document():
+    """
+    The stored vector of a compressed note, otherwise its title and content;
+    ``notes_note_document_idx`` indexes this expression.
+    """
+    return Coalesce(F('search_vector'), search_vector())
+
+
+def encode_cursor(rank, pk):
+    raw = json.dumps([rank, pk])
+    return urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
+
+
+def decode_cursor(encoded):
+    if not encoded:
+        return None
+    try:
+        rank, pk = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+        return float(rank), int(pk)
+    except (TypeError, ValueError, UnicodeError):
+        raise InvalidCursor('Invalid cursor')
+
+
+def search_notes(user_id, query, category=None, cursor=None, limit=10):
+    """
+    Return up to ``limit`` of the user's notes matching ``query``, best first.
+
+    Each result is a dict with the note's id, title, category, timestamps,
+    a plain-text ``snippet`` around the match and a ``rank`` where higher is
+    better. ``cursor`` is the ``(rank, id)`` of the last result already seen.
+    """
+    alias = Note.objects.db
+    connection = connections[alias]
+    if connection.vendor == 'postgresql':
+        return search_postgres(user_id, query, category, cursor, limit)
+    if connection.vendor == 'sqlite' and has_fts_table(alias):
+        return search_sqlite(alias, user_id, query, category, cursor, limit)
+    return search_fallback(user_id, query, category, cursor, limit)
+
+
+def search_postgres(user_id, query, category, cursor, limit):
+    from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+    queryset = (
+        Note.objects
+        .filter(user_id=user_id)
+        .annotate(search=search_document())
+        .filter(search=search_query)
+        .annotate(
+            rank=SearchRank(search_document(), search_query),
+            snippet=SearchHeadline(
+                'content', search_query, config=SEARCH_CONFIG,
+                start_sel='', stop_sel='', max_words=SNIPPET_WORDS, min_words=SNIPPET_WORDS // 2,
+            ),
+        )
+    )
+    if category:
+        queryset = queryset.filter(category=category)
+    if cursor is not None:
+        rank, pk = cursor
+        queryset = queryset.filter(Q(rank__lt=rank) | Q(rank=rank, id__gt=pk))
+    return list(
+        queryset
+        .order_by('-rank', 'id')
+        .values('id', 'title', 'category', 'created_at', 'updated_at', 'snippet', 'rank')[:limit]
+    )
+
+
+def search_sqlite(alias, user_id, query, category, cursor, limit):
+    terms = re.findall(r'\w+', query)
+    if not terms:
+        return []
+    # Quote every term so user input can't inject FTS5 syntax; the last one
+    # is a prefix match so results update while the user is still typing.
+    match = ' '.join(f'"{term}"' for term in terms) + '*'
+
+    where = ['n.user_id = %s', 'n.deleted_at IS NULL']
+    params = [user_id]
+    if category:
+        where.append('n.category = %s')
+        params.append(category)
+    page_filter = ''
+    page_params = []
+    if cursor is not None:
+        page_filter = 'WHERE rank < %s OR (rank = %s AND id > %s)'
+        page_params = [cursor[0], cursor[0], cursor[1]]
+
+    sql = f"""
+        SELECT id, title, category, created_at, updated_at, snippet, rank FROM (
+            SELECT n.id, n.title, n.category, n.created_at, n.updated_at,
+                   snippet({FTS_TABLE}, 1, '', '', '…', {SNIPPET_WORDS}) AS snippet,
+                   -bm25({FTS_TABLE}, 2.0, 1.0) AS rank
+            FROM {FTS_TABLE}
+            JOIN notes_note n ON n.id = {FTS_TABLE}.rowid
+            WHERE {FTS_TABLE} MATCH %s AND {' AND '.join(where)}
+        )
+        {page_filter}
+        ORDER BY rank DESC, id
+        LIMIT %s
+    """
+    connection = connections[alias]
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(sql, [match, *params, *page_params, limit])
+        columns = [col[0] for col in db_cursor.description]
+        rows = [dict(zip(columns, row)) for row in db_cursor.fetchall()]
+
+    column = Note._meta.get_field('updated_at').get_col(Note._meta.db_table)
+    converters = connection.ops.get_db_converters(column)
+    for row in rows:
+        for name in ('created_at', 'updated_at'):
+            for converter in converters:
+                row[name] = converter(row[name], column, connection)
+    return rows
+
+
+def search_fallback(user_id, query, category, cursor, limit):
+    terms = re.findall(r'\w+', query)
+    queryset = Note.objects.filter(user_id=user_id)
+    for term in terms:
+        # The content column only holds the head of compressed notes, so
+        # those are matched against their full text below.
+        queryset = queryset.filter(
+            Q(title__icontains=term) | Q(content__icontains=term) | Q(content_compressed__isnull=False)
+        )
+    if category:
+        queryset = queryset.filter(category=category)
+    if cursor is not None:
+        queryset = queryset.filter(id__gt=cursor[1])
+
+    rows = []
+    notes = queryset.order_by('id').values(
+        'id', 'title', 'category', 'created_at', 'updated_at', 'content', 'content_compressed',
+    )
+    for row in notes.iterator():
+        blob = row.pop('content_compressed')
+        if blob is not None:
+            text = f"{row['title']}\n{decompress(blob)}".lower()
+            if not all(term.lower() in text for term in terms):
+                continue
+        row['snippet'] = row.pop('content')[:120]
+        row['rank'] = 0.0
+        rows.append(row)
+        if len(rows) == limit:
+            break
+    return rows
+
+
+def has_fts_table(alias):
+    if alias not in _fts_tables:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE]
+            )
+            _fts_tables[alias] = cursor.fetchone() is not None
+    return _fts_tables[alias]
@@ -0,0 +1,53 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from heapq import merge
+
+from django.db.models import Q
+
+from .models import Note, Tombstone
+from .search import InvalidCursor
+
+
+def encode_cursor(sequence, pk):
+    raw = json.dumps([sequence, pk])
+    return urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
+
+
+def decode_cursor(encoded):
+    if not encoded:
+        return None
+    try:
+        sequence, pk = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+        return int(sequence), int(pk)
+    except (TypeError, ValueError, UnicodeError):
+        raise InvalidCursor('Invalid cursor')
+
+
+def changes_since(user_id, cursor=None, limit=100):
+    """
+    Return up to ``limit`` changes after ``cursor`` in ``(sequence, id)`` order.
+
+    Each change is ``(sequence, id, note)`` where ``note`` is ``None`` for a
+    deletion. Without a cursor only live notes are returned, since a fresh
+    client has nothing to delete.
+    """
+    sequence, pk = cursor or (0, 0)
+    notes = (
+        Note.objects
+        .filter(user_id=user_id)
+        .filter(Q(sequence__gt=sequence) | Q(sequence=sequence, id__gt=pk))
+        .order_by('sequence', 'id')[:limit]
+    )
+    upserts = ((note.sequence, note.id, note) for note in notes)
+    if cursor is None:
+        return list(upserts)
+
+    tombstones = (
+        Tombstone.objects
+        .filter(user_id=user_id)
+        .filter(Q(sequence__gt=sequence) | Q(sequence=sequence, note_id__gt=pk))
+        .order_by('sequence', 'note_id')
+        .values_list('sequence', 'note_id')[:limit]
+    )
+    deletes = ((sequence, note_id, None) for sequence, note_id in tombstones)
+    return list(merge(upserts, deletes, key=lambda change: change[:2]))[:limit]
@@ -1,11 +1,48 @@
+import asyncio
+import gzip
+import json
+import threading
+from decimal import Decimal
+from io import StringIO
+
 import pytest
+from asgiref.sync import async_to_sync, sync_to_async
 from django.contrib.auth.models import User
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connection, connections
+from django.db.models import Count, Sum
+from django.test import AsyncClient, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 from rest_framework_simplejwt.tokens import RefreshToken
-from .models import Note
-from .serializers import NoteSerializer, UserSerializer
+from . import cache as notes_cache
+from . import benchmarks, compression, metrics, routers, search, throttling, views
+from .authentication import NoteRefreshToken, StatelessJWTAuthentication, active_states
+from .models import Note, CategoryCount, ChangeSequence, NoteRevision
+from .renderers import FastJSONRenderer
+from .serializers import (
+    NOTE_LIST_FIELDS, NoteListSerializer, NoteSerializer, UserSerializer, note_list_rows,
+)
+from .views import NoteViewSet, with_preview
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Keep cached responses from leaking between tests"""
+    yield
+    for cache in caches.all():
+        cache.clear()
+    active_states.clear()
 
 
 @pytest.fixture
@@ -454,3 +491,2213 @@ class TestNoteViewSet:
         url = reverse('note-categories')
         response = api_client.get(url)
         assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+# ============================================================================
+# CURSOR PAGINATION TESTS
+# ============================================================================
+
+@pytest.fixture
+def many_notes(user):
+    """Create enough notes to span several cursor pages"""
+    categories = ['Random Thoughts', 'School']
+    return [
+        Note.objects.create(
+            user=user,
+            title=f'Paged Note {i}',
+            content=f'Content {i}',
+            category=categories[i % 2]
+        )
+        for i in range(25)
+    ]
+
+
+@pytest.mark.django_db
+class TestNoteCursorPagination:
+    """Test cases for the opt-in keyset pagination on the note list"""
+
+    def collect_pages(self, client, params):
+        ids = []
+        url = reverse('note-list')
+        response = client.get(url, params)
+        while True:
+            assert response.status_code == status.HTTP_200_OK
+            ids.extend(note['id'] for note in response.data['results'])
+            if not response.data['next']:
+                return ids
+            response = client.get(response.data['next'])
+
+    def test_first_page_has_no_count(self, authenticated_client, many_notes):
+        """Test cursor mode skips the total count"""
+        url = reverse('note-list')
+        response = authenticated_client.get(url, {'cursor': ''})
+        assert response.status_code == status.HTTP_200_OK
+        assert 'count' not in response.data
+        assert response.data['previous'] is None
+        assert len(response.data['results']) == 10
+        assert 'cursor=' in response.data['next']
+
+    def test_walks_all_notes_in_order(self, authenticated_client, many_notes):
+        """Test following next links returns every note exactly once"""
+        ids = self.collect_pages(authenticated_client, {'cursor': ''})
+        expected = list(
+            Note.objects.filter(user=many_notes[0].user).values_list('id', flat=True)
+        )
+        assert ids == expected
+
+    def test_no_count_query(self, authenticated_client, many_notes):
+        """Test cursor pages never run COUNT(*)"""
+        url = reverse('note-list')
+        with CaptureQueriesContext(connection) as ctx:
+            authenticated_client.get(url, {'cursor': ''})
+        assert not any('COUNT(' in q['sql'].upper() for q in ctx.captured_queries)
+
+    def test_stable_when_note_is_bumped(self, authenticated_client, many_notes):
+        """Test a note saved mid-walk does not shift or duplicate later pages"""
+        url = reverse('note-list')
+        first = authenticated_client.get(url, {'cursor': ''})
+        seen = [note['id'] for note in first.data['results']]
+
+        bumped = Note.objects.get(id=first.data['results'][-1]['id'])
+        bumped.title = 'Bumped'
+        bumped.save()
+
+        response = authenticated_client.get(first.data['next'])
+        while True:
+            seen.extend(note['id'] for note in response.data['results'])
+            if not response.data['next']:
+                break
+            response = authenticated_client.get(response.data['next'])
+        assert len(seen) == len(set(seen)) == len(many_notes)
+
+    def test_category_filter(self, authenticated_client, many_notes):
+        """Test cursor mode honours the category filter"""
+        ids = self.collect_pages(authenticated_client, {'cursor': '', 'category': 'School'})
+        expected = [note.id for note in many_notes if note.category == 'School']
+        assert sorted(ids) == sorted(expected)
+
+    def test_invalid_cursor(self, authenticated_client, many_notes):
+        """Test a malformed cursor is rejected"""
+        url = reverse('note-list')
+        response = authenticated_client.get(url, {'cursor': 'not-a-cursor'})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_page_number_mode_unchanged(self, authenticated_client, many_notes):
+        """Test the default page-number mode still reports a count"""
+        url = reverse('note-list')
+        response = authenticated_client.get(url)
+        assert response.data['count'] == len(many_notes)
+
+
+# ============================================================================
+# INDEX TESTS
+# ============================================================================
+
+def explain(queryset):
+    """Explain ``queryset`` with sequential scans discouraged on PostgreSQL"""
+    if connection.vendor != 'postgresql':
+        return queryset.explain()
+    # Tiny test tables would otherwise always win a sequential scan.
+    with connection.cursor() as cursor:
+        cursor.execute('SET enable_seqscan = off')
+    try:
+        return queryset.explain()
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute('RESET enable_seqscan')
+
+
+@pytest.mark.django_db
+class TestNoteIndexes:
+    """Test the list and categories queries are served by the composite indexes"""
+
+    def test_list_uses_user_updated_index(self, user, many_notes):
+        """Test the note list query uses the (user, -updated_at) index"""
+        plan = explain(Note.objects.filter(user=user))
+        assert 'notes_live_updated_idx' in plan
+
+    def test_category_list_uses_user_category_index(self, user, many_notes):
+        """Test the filtered note list query uses the (user, category, -updated_at) index"""
+        plan = explain(Note.objects.filter(user=user, category='School'))
+        assert 'notes_live_category_idx' in plan
+
+    def test_trash_uses_trash_index(self, user, many_notes):
+        """Test the trash listing is served by the partial trash index"""
+        plan = explain(
+            Note.all_objects.filter(user=user, deleted_at__isnull=False).order_by('-deleted_at', '-id')
+        )
+        assert 'notes_user_trash_idx' in plan
+
+    def test_categories_uses_user_category_index(self, user, many_notes):
+        """Test the per-category count query uses the (user, category) index"""
+        queryset = (
+            Note.objects
+            .filter(user=user)
+            .values('category')
+            .annotate(count=Count('id'))
+        )
+        plan = explain(queryset)
+        assert 'notes_live_category_idx' in plan
+
+
+# ============================================================================
+# CATEGORY COUNTER TESTS
+# ============================================================================
+
+@pytest.mark.django_db
+class TestCategoryCounters:
+    """Test cases for the denormalized per-user category counters"""
+
+    def counts(self, user):
+        return dict(
+            CategoryCount.objects.filter(user=user).values_list('category', 'count')
+        )
+
+    def test_create_increments(self, authenticated_client, user):
+        """Test creating notes through the API increments the counter"""
+        url = reverse('note-list')
+        authenticated_client.post(url, {'title': 'A', 'category': 'School'}, format='json')
+        authenticated_client.post(url, {'title': 'B', 'category': 'School'}, format='json')
+        assert self.counts(user)['School'] == 2
+
+    def test_category_change_moves_count(self, authenticated_client, user, note):
+        """Test changing a note's category moves it between counters"""
+        url = reverse('note-detail', kwargs={'pk': note.id})
+        authenticated_client.patch(url, {'category': 'Personal'}, format='json')
+        counts = self.counts(user)
+        assert counts['Random Thoughts'] == 0
+        assert counts['Personal'] == 1
+
+    def test_stale_instances_move_count_once(self, user):
+        """Test two edits from stale copies of a note only move it once"""
+        note = Note.objects.create(user=user, title='Stale', category='School')
+        first, second = Note.objects.get(pk=note.pk), Note.objects.get(pk=note.pk)
+        first.category = second.category = 'Personal'
+        first.save()
+        second.save()
+        assert self.counts(user) == {'School': 0, 'Personal': 1}
+
+        second.category = 'School'
+        second.save()
+        assert self.counts(user) == {'School': 1, 'Personal': 0}
+
+    def test_update_without_category_change(self, authenticated_client, user, note):
+        """Test editing other fields leaves the counters alone"""
+        url = reverse('note-detail', kwargs={'pk': note.id})
+        authenticated_client.patch(url, {'title': 'Renamed'}, format='json')
+        assert self.counts(user) == {'Random Thoughts': 1}
+
+    def test_delete_decrements(self, authenticated_client, user, note):
+        """Test deleting a note decrements its counter"""
+        url = reverse('note-detail', kwargs={'pk': note.id})
+        authenticated_client.delete(url)
+        assert self.counts(user)['Random Thoughts'] == 0
+
+    def test_categories_does_not_scan_notes(self, authenticated_client, multiple_notes):
+        """Test the categories endpoint reads only the counter table"""
+        url = reverse('note-categories')
+        with CaptureQueriesContext(connection) as ctx:
+            response = authenticated_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert not any('notes_note' in q['sql'] for q in ctx.captured_queries)
+
+    def test_rebuild_command_fixes_drift(self, user, multiple_notes):
+        """Test the rebuild command reconciles counters with the notes table"""
+        CategoryCount.objects.filter(user=user, category='School').update(count=42)
+        Note.objects.filter(category='Personal').delete()
+
+        out = StringIO()
+        call_command('rebuild_category_counts', stdout=out)
+        assert '2 category counter(s) rebuilt' in out.getvalue()
+        counts = self.counts(user)
+        assert counts['School'] == 1
+        assert counts['Personal'] == 0
+        assert counts['Random Thoughts'] == 1
+
+    def test_rebuild_dry_run(self, user, multiple_notes):
+        """Test the dry run reports drift without writing"""
+        CategoryCount.objects.filter(user=user, category='School').update(count=42)
+        out = StringIO()
+        call_command('rebuild_category_counts', '--dry-run', stdout=out)
+        assert '1 category counter(s) out of date' in out.getvalue()
+        assert self.counts(user)['School'] == 42
+
+
+# ============================================================================
+# DELTA PATCH TESTS
+# ============================================================================
+
+@pytest.mark.django_db
+class TestNoteDelta:
+    """Test cases for versioned delta autosave"""
+
+    def test_regular_update_bumps_version(self, authenticated_client, note):
+        """Test full updates advance the version"""
+        url = reverse('note-detail', kwargs={'pk': note.id})
+        response = authenticated_client.patch(url, {'title': 'New'}, format='json')
+        assert response.data['version'] == 2
+        note.refresh_from_db()
+        assert note.version == 2
+
+    def test_apply_edits(self, authenticated_client, note):
+        """Test edits are applied in order and only the new version is returned"""
+        url = reverse('note-delta', kwargs={'pk': note.id})
+        data = {
+            'version': 1,
+            'edits': [
+                {'start': 0, 'end': 4, 'text': 'That'},
+                {'start': 27, 'end': 27, 'text': '!'},
+            ],
+        }
+        response = authenticated_client.patch(url, data, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        assert set(response.data) == {'id', 'version', 'updated_at'}
+        assert response.data['version'] == 2
+        note.refresh_from_db()
+        assert note.content == 'That is a test note content!'
+        assert note.version == 2
+
+    def test_stale_version_conflict(self, authenticated_client, note):
+        """Test edits against an old version are rejected with 409"""
+        url = reverse('note-delta', kwargs={'pk': note.id})
+        authenticated_client.patch(
+            url, {'version': 1, 'edits': [{'start': 0, 'end': 0, 'text': 'A'}]}, format='json'
+        )
+        response = authenticated_client.patch(
+            url, {'version': 1, 'edits': [{'start': 0, 'end': 0, 'text': 'B'}]}, format='json'
+        )
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert response.data['version'] == 2
+        note.refresh_from_db()
+        assert note.content.startswith('AThis')
+
+    def test_out_of_range_edit(self, authenticated_client, note):
+        """Test edits past the end of the content are rejected"""
+        url = reverse('note-delta', kwargs={'pk': note.id})
+        data = {'version': 1, 'edits': [{'start': 500, 'end': 501, 'text': 'x'}]}
+        response = authenticated_client.patch(url, data, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        note.refresh_from_db()
+        assert note.version == 1
+
+    def test_offsets_are_utf16(self, user):
+        """Test offsets count UTF-16 code units like JavaScript strings"""
+        note = Note.objects.create(user=user, title='Emoji', content='a😀b')
+        note.apply_delta(1, [{'start': 3, 'end': 4, 'text': 'c'}])
+        assert note.content == 'a😀c'
+        with pytest.raises(ValueError):
+            note.apply_delta(2, [{'start': 2, 'end': 2, 'text': 'x'}])
+
+    def test_delta_other_user(self, authenticated_client, another_user):
+        """Test delta edits cannot target another user's note"""
+        other_note = Note.objects.create(user=another_user, title='Other', content='Content')
+        url = reverse('note-delta', kwargs={'pk': other_note.id})
+        data = {'version': 1, 'edits': []}
+        response = authenticated_client.patch(url, data, format='json')
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+# ============================================================================
+# SEARCH TESTS
+# ============================================================================
+
+@pytest.fixture
+def searchable_notes(user, another_user):
+    """Create notes with known words for search tests"""
+    return [
+        Note.objects.create(user=user, title='Chemistry homework',
+                            content='Balance the equations before Friday', category='School'),
+        Note.objects.create(user=user, title='Groceries',
+                            content='Buy coffee, milk and chemistry set batteries', category='Personal'),
+        Note.objects.create(user=user, title='Holiday plans',
+                            content='Visit the mountains in spring', category='Personal'),
+        Note.objects.create(user=another_user, title='Chemistry secrets',
+                            content='Not yours to find', category='School'),
+    ]
+
+
+@pytest.mark.django_db
+class TestNoteSearch:
+    """Test cases for the note full-text search endpoint"""
+
+    def test_search_ranks_matches(self, authenticated_client, searchable_notes):
+        """Test matching notes are returned best first with snippets, not content"""
+        url = reverse('note-search')
+        response = authenticated_client.get(url, {'q': 'chemistry'})
+        assert response.status_code == status.HTTP_200_OK
+        results = response.data['results']
+        assert [r['id'] for r in results] == [searchable_notes[0].id, searchable_notes[1].id]
+        assert 'content' not in results[0]
+        assert 'snippet' in results[0]
+        assert results[0]['rank'] >= results[1]['rank']
+
+    def test_search_user_isolation(self, authenticated_client, searchable_notes):
+        """Test search never returns another user's notes"""
+        url = reverse('note-search')
+        response = authenticated_client.get(url, {'q': 'secrets'})
+        assert response.data['results'] == []
+
+    def test_search_category_filter(self, authenticated_client, searchable_notes):
+        """Test search honours the category filter"""
+        url = reverse('note-search')
+        response = authenticated_client.get(url, {'q': 'chemistry', 'category': 'Personal'})
+        assert [r['id'] for r in response.data['results']] == [searchable_notes[1].id]
+
+    def test_search_follows_updates_and_deletes(self, authenticated_client, searchable_notes):
+        """Test the index follows edits and deletions"""
+        url = reverse('note-search')
+        holiday = searchable_notes[2]
+        holiday.content = 'Chemistry conference in spring'
+        holiday.save()
+        searchable_notes[0].delete()
+        response = authenticated_client.get(url, {'q': 'chemistry'})
+        ids = {r['id'] for r in response.data['results']}
+        assert ids == {searchable_notes[1].id, holiday.id}
+
+    def test_search_cursor_pages(self, authenticated_client, user):
+        """Test search results page by cursor without repeats"""
+        for i in range(15):
+            Note.objects.create(user=user, title=f'Meeting {i}', content='meeting notes ' * (i + 1))
+        url = reverse('note-search')
+        first = authenticated_client.get(url, {'q': 'meeting'})
+        assert len(first.data['results']) == 10
+        second = authenticated_client.get(first.data['next'])
+        assert len(second.data['results']) == 5
+        assert second.data['next'] is None
+        ids = [r['id'] for r in first.data['results'] + second.data['results']]
+        assert len(set(ids)) == 15
+
+    def test_search_prefix_and_punctuation(self, authenticated_client, searchable_notes):
+        """Test partial last words match and FTS syntax in the query is harmless"""
+        url = reverse('note-search')
+        response = authenticated_client.get(url, {'q': 'mountai" OR *'})
+        assert response.status_code == status.HTTP_200_OK
+
+        response = authenticated_client.get(url, {'q': 'mounta'})
+        assert [r['id'] for r in response.data['results']] == [searchable_notes[2].id]
+
+    def test_search_requires_query(self, authenticated_client):
+        """Test an empty query is rejected"""
+        url = reverse('note-search')
+        response = authenticated_client.get(url, {'q': '  '})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+# ============================================================================
+# LIST PREVIEW TESTS
+# ============================================================================
+
+@pytest.mark.django_db
+class TestNoteListPreview:
+    """Test cases for the lightweight note list representation"""
+
+    def test_list_returns_preview(self, authenticated_client, note):
+        """Test list items carry a preview instead of the full content"""
+        url = reverse('note-list')
+        response = authenticated_client.get(url)
+        item = response.data['results'][0]
+        assert 'content' not in item
+        assert item['preview'] == note.content
+
+    def test_long_content_is_truncated(self, authenticated_client, user, settings):
+        """Test previews are cut at the configured budget"""
+        settings.NOTES_PREVIEW_CHARS = 50
+        Note.objects.create(user=user, title='Long', content='x' * 5000)
+        url = reverse('note-list')
+        response = authenticated_client.get(url)
+        assert response.data['results'][0]['preview'] == 'x' * 50 + '…'
+
+    def test_list_query_reads_only_prefix(self, authenticated_client, note):
+        """Test the list query never selects the full content column"""
+        url = reverse('note-list')
+        with CaptureQueriesContext(connection) as ctx:
+            authenticated_client.get(url)
+        note_queries = [q['sql'] for q in ctx.captured_queries if 'FROM "notes_note"' in q['sql']]
+        assert note_queries
+        for sql in note_queries:
+            assert '"notes_note"."content"' not in sql.replace('SUBSTR("notes_note"."content"', '')
+
+    def test_retrieve_returns_full_content(self, authenticated_client, user):
+        """Test retrieve still returns the whole body"""
+        long_note = Note.objects.create(user=user, title='Long', content='y' * 5000)
+        url = reverse('note-detail', kwargs={'pk': long_note.id})
+        response = authenticated_client.get(url)
+        assert response.data['content'] == 'y' * 5000
+
+
+# ============================================================================
+# CONDITIONAL GET TESTS
+# ============================================================================
+
+@pytest.mark.django_db
+class TestConditionalRequests:
+    """Test cases for ETag/Last-Modified validation on read endpoints"""
+
+    def test_list_not_modified(self, authenticated_client, multiple_notes):
+        """Test a matching ETag on the list skips the notes table entirely"""
+        url = reverse('note-list')
+        response = authenticated_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response['ETag']
+        assert response['Last-Modified']
+        assert 'no-cache' in response['Cache-Control']
+
+        with CaptureQueriesContext(connection) as ctx:
+            cached = authenticated_client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        assert cached.status_code == status.HTTP_304_NOT_MODIFIED
+        assert not any('notes_note' in q['sql'] for q in ctx.captured_queries)
+
+    def test_list_etag_changes_after_write(self, authenticated_client, multiple_notes):
+        """Test creating a note invalidates the list validator"""
+        url = reverse('note-list')
+        etag = authenticated_client.get(url)['ETag']
+        authenticated_client.post(url, {'title': 'Fresh'}, format='json')
+        response = authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response['ETag'] != etag
+
+    def test_list_etag_is_per_user(self, api_client, user, another_user):
+        """Test two users never share a list validator"""
+        url = reverse('note-list')
+        etags = []
+        for owner in (user, another_user):
+            api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(owner).access_token}')
+            etags.append(api_client.get(url)['ETag'])
+        assert etags[0] != etags[1]
+
+    def test_retrieve_not_modified(self, authenticated_client, note):
+        """Test a matching ETag on a note returns 304 until the note changes"""
+        url = reverse('note-detail', kwargs={'pk': note.id})
+        etag = authenticated_client.get(url)['ETag']
+        response = authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        authenticated_client.patch(url, {'title': 'Changed'}, format='json')
+        response = authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['title'] == 'Changed'
+
+    def test_retrieve_if_modified_since(self, authenticated_client, note):
+        """Test Last-Modified can be used on its own"""
+        url = reverse('note-detail', kwargs={'pk': note.id})
+        last_modified = authenticated_client.get(url)['Last-Modified']
+        response = authenticated_client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_retrieve_missing_note(self, authenticated_client):
+        """Test validators don't mask a 404"""
+        url = reverse('note-detail', kwargs={'pk': 999999})
+        response = authenticated_client.get(url, HTTP_IF_NONE_MATCH='"anything"')
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_categories_not_modified(self, authenticated_client, multiple_notes):
+        """Test the categories endpoint revalidates against the change stamp"""
+        url = reverse('note-categories')
+        etag = authenticated_client.get(url)['ETag']
+        response = authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        multiple_notes[0].delete()
+        response = authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+
+
+# ============================================================================
+# RESPONSE CACHE TESTS
+# ============================================================================
+
+@pytest.mark.django_db
+class TestResponseCache:
+    """Test cases for the per-user cache of list pages and category summaries"""
+
+    def test_list_served_from_cache(self, authenticated_client, multiple_notes):
+        """Test a repeated list request skips the notes table"""
+        url = reverse('note-list')
+        first = authenticated_client.get(url)
+        assert first['X-Cache'] == 'MISS'
+
+        with CaptureQueriesContext(connection) as ctx:
+            second = authenticated_client.get(url)
+        assert second['X-Cache'] == 'HIT'
+        assert second.data == first.data
+        assert not any('notes_note' in q['sql'] for q in ctx.captured_queries)
+
+    def test_keyed_by_category_and_page(self, authenticated_client, multiple_notes):
+        """Test different filters never share an entry"""
+        url = reverse('note-list')
+        authenticated_client.get(url)
+        response = authenticated_client.get(url, {'category': 'School'})
+        assert response['X-Cache'] == 'MISS'
+        assert [note['category'] for note in response.data['results']] == ['School']
+
+    def test_keyed_by_user(self, api_client, user, another_user, note):
+        """Test one user's cached page is never served to another"""
+        url = reverse('note-list')
+        counts = []
+        for owner in (user, another_user):
+            api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(owner).access_token}')
+            response = api_client.get(url)
+            assert response['X-Cache'] == 'MISS'
+            counts.append(response.data['count'])
+        assert counts == [1, 0]
+
+    def test_writes_invalidate(self, authenticated_client, note):
+        """Test create, update and delete each drop the cached list and categories"""
+        list_url = reverse('note-list')
+        categories_url = reverse('note-categories')
+        detail_url = reverse('note-detail', kwargs={'pk': note.id})
+        writes = [
+            lambda: authenticated_client.post(list_url, {'title': 'New', 'category': 'School'}, format='json'),
+            lambda: authenticated_client.patch(detail_url, {'category': 'Personal'}, format='json'),
+            lambda: authenticated_client.delete(detail_url),
+        ]
+        for write in writes:
+            authenticated_client.get(list_url)
+            authenticated_client.get(categories_url)
+            write()
+            assert authenticated_client.get(list_url)['X-Cache'] == 'MISS'
+            response = authenticated_client.get(categories_url)
+            assert response['X-Cache'] == 'MISS'
+            counts = {category['name']: category['count'] for category in response.data}
+            assert sum(counts.values()) == Note.objects.filter(user=note.user).count()
+
+    def test_hit_and_miss_counters(self, authenticated_client, note, settings, tmp_path):
+        """Test the stats reflect hits and misses and can be reset"""
+        with pytest.raises(CommandError):
+            call_command('notes_cache_stats', stdout=StringIO())
+        settings.CACHES = {
+            **settings.CACHES,
+            settings.NOTES_METRICS_CACHE_ALIAS: {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': str(tmp_path),
+            },
+        }
+        url = reverse('note-list')
+        for _ in range(3):
+            authenticated_client.get(url)
+        assert notes_cache.stats() == {'hits': 2, 'misses': 1}
+
+        out = StringIO()
+        call_command('notes_cache_stats', '--reset', stdout=out)
+        assert '66.7% hit rate' in out.getvalue()
+        assert notes_cache.stats() == {'hits': 0, 'misses': 0}
+
+
+# ============================================================================
+# BULK OPERATION TESTS
+# ============================================================================
+
+@pytest.mark.django_db
+class TestBulkOperations:
+    """Test cases for the bulk create/update/recategorize/delete endpoint"""
+
+    def counts(self, user):
+        return {
+            category: count
+            for category, count in CategoryCount.objects.filter(user=user).values_list('category', 'count')
+            if count
+        }
+
+    def expected_counts(self, user):
+        return dict(
+            Note.objects.filter(user=user).values('category').annotate(count=Count('id')).values_list('category', 'count')
+        )
+
+    def test_mixed_operations(self, authenticated_client, user, multiple_notes):
+        """Test every operation type is applied and reported per item"""
+        first, second, third = multiple_notes
+        url = reverse('note-bulk')
+        response = authenticated_client.post(url, {'operations': [
+            {'op': 'create', 'title': 'Bulk', 'content': 'Body', 'category': 'Drama'},
+            {'op': 'update', 'id': first.id, 'title': 'Renamed'},
+            {'op': 'recategorize', 'id': second.id, 'category': 'Personal'},
+            {'op': 'delete', 'id': third.id},
+        ]}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        results = response.data['results']
+        assert [result['op'] for result in results] == ['create', 'update', 'recategorize', 'delete']
+
+        created = Note.objects.get(id=results[0]['id'])
+        assert (created.title, created.user, created.version) == ('Bulk', user, 1)
+        first.refresh_from_db()
+        assert (first.title, first.version) == ('Renamed', results[1]['version'])
+        assert first.updated_at > first.created_at
+        assert Note.objects.get(id=second.id).category == 'Personal'
+        assert not Note.objects.filter(id=third.id).exists()
+        assert self.counts(user) == self.expected_counts(user)
+
+    def test_invalid_batch_writes_nothing(self, authenticated_client, user, note, another_user):
+        """Test one bad operation rolls back the whole batch with per-item errors"""
+        foreign = Note.objects.create(user=another_user, title='Theirs')
+        url = reverse('note-bulk')
+        response = authenticated_client.post(url, {'operations': [
+            {'op': 'create', 'title': 'Valid'},
+            {'op': 'create', 'category': 'Nope'},
+            {'op': 'delete', 'id': foreign.id},
+            {'op': 'update', 'id': note.id, 'title': 'ok'},
+            {'op': 'delete', 'id': note.id},
+        ]}, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        results = response.data['results']
+        assert 'errors' not in results[0]
+        assert {'title', 'category'} <= set(results[1]['errors'])
+        assert 'id' in results[2]['errors']
+        assert 'id' in results[4]['errors']
+        assert Note.objects.filter(user=user).count() == 1
+        assert Note.objects.filter(id=foreign.id).exists()
+        assert ChangeSequence.objects.current(user.id)[0] == note.sequence
+
+    def test_locks_sequence_before_notes(self, authenticated_client, note):
+        """Test the sequence row is taken before the note rows, as Note.save does"""
+        url = reverse('note-bulk')
+        with CaptureQueriesContext(connection) as ctx:
+            response = authenticated_client.post(
+                url, {'operations': [{'op': 'update', 'id': note.id, 'title': 'Locked'}]}, format='json'
+            )
+        assert response.status_code == status.HTTP_200_OK
+        statements = [query['sql'] for query in ctx.captured_queries]
+        advance = next(i for i, sql in enumerate(statements) if sql.startswith('UPDATE "notes_changesequence"'))
+        lock = next(i for i, sql in enumerate(statements) if sql.startswith('SELECT') and 'FROM "notes_note"' in sql)
+        assert advance < lock
+
+    def test_rejects_malformed_operations(self, authenticated_client):
+        """Test unknown ops and missing ids fail envelope validation"""
+        url = reverse('note-bulk')
+        response = authenticated_client.post(url, {'operations': [
+            {'op': 'explode'}, {'op': 'update', 'title': 'x'}, {'op': 'recategorize', 'id': 1},
+        ]}, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        response = authenticated_client.post(url, {'operations': []}, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_operation_limit(self, authenticated_client, settings):
+        """Test batches larger than the configured maximum are refused"""
+        settings.NOTES_BULK_MAX_OPERATIONS = 2
+        url = reverse('note-bulk')
+        response = authenticated_client.post(
+            url, {'operations': [{'op': 'create', 'title': str(i)} for i in range(3)]}, format='json'
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_queries_are_batched(self, authenticated_client, user):
+        """Test a large import costs a few batched queries, not one per note"""
+        url = reverse('note-bulk')
+        operations = [{'op': 'create', 'title': f'Import {i}', 'category': 'School'} for i in range(1200)]
+        with CaptureQueriesContext(connection) as ctx:
+            response = authenticated_client.post(url, {'operations': operations}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        assert len(ctx.captured_queries) < 40
+        assert Note.objects.filter(user=user).count() == 1200
+        assert self.counts(user) == {'School': 1200}
+
+    def test_invalidates_list_cache(self, authenticated_client, note):
+        """Test bulk writes advance the change stamp used by caches and ETags"""
+        list_url = reverse('note-list')
+        etag = authenticated_client.get(list_url)['ETag']
+        authenticated_client.post(reverse('note-bulk'), {'operations': [
+            {'op': 'delete', 'id': note.id},
+        ]}, format='json')
+        response = authenticated_client.get(list_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['count'] == 0
+
+
+# ============================================================================
+# EXPORT TESTS
+# ============================================================================
+
+@pytest.mark.django_db
+class TestNoteExport:
+    """Test cases for the streaming NDJSON export"""
+
+    def read(self, response):
+        body = b''.join(response.streaming_content)
+        if response.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        return [json.loads(line) for line in body.decode('utf-8').splitlines()]
+
+    def test_exports_all_notes(self, authenticated_client, multiple_notes, another_user):
+        """Test every note of the user is streamed, one JSON document per line"""
+        Note.objects.create(user=another_user, title='Theirs')
+        url = reverse('note-export')
+        response = authenticated_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.streaming
+        assert response['Content-Type'] == 'application/x-ndjson'
+        rows = self.read(response)
+        assert [row['id'] for row in rows] == sorted(note.id for note in multiple_notes)
+        assert rows[0]['content'] == multiple_notes[0].content
+
+    def test_gzip_when_accepted(self, authenticated_client, many_notes):
+        """Test the stream is compressed on the fly for gzip-capable clients"""
+        url = reverse('note-export')
+        response = authenticated_client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        assert response['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response['Vary']
+        assert len(self.read(response)) == len(many_notes)
+
+    def test_category_and_since_filters(self, authenticated_client, multiple_notes):
+        """Test incremental exports by category and modification time"""
+        url = reverse('note-export')
+        rows = self.read(authenticated_client.get(url, {'category': 'School'}))
+        assert [row['category'] for row in rows] == ['School']
+
+        cutoff = multiple_notes[-1].updated_at
+        rows = self.read(authenticated_client.get(url, {'since': cutoff.isoformat()}))
+        assert [row['id'] for row in rows] == [multiple_notes[-1].id]
+
+    def test_streams_under_asgi(self, user, many_notes, monkeypatch):
+        """Test the ASGI export hands out chunks before reading every note"""
+        monkeypatch.setattr('notes.export.FLUSH_BYTES', 1)
+        produced = []
+        lines = views.ndjson_lines
+
+        def counted(*args):
+            for line in lines(*args):
+                produced.append(line)
+                yield line
+
+        monkeypatch.setattr(views, 'ndjson_lines', counted)
+        token = str(RefreshToken.for_user(user).access_token)
+
+        async def export(**headers):
+            response = await AsyncClient().get(
+                reverse('note-export'), headers={'Authorization': f'Bearer {token}', **headers}
+            )
+            stream = response.streaming_content
+            first = await anext(stream)
+            seen = len(produced)
+            body = first + b''.join([chunk async for chunk in stream])
+            return response, seen, body
+
+        response, seen, body = async_to_sync(export)()
+        assert response.is_async
+        assert seen < len(many_notes)
+        assert len(body.splitlines()) == len(many_notes)
+
+        produced.clear()
+        response, seen, body = async_to_sync(export)(**{'Accept-Encoding': 'gzip'})
+        assert seen < len(many_notes)
+        assert len(gzip.decompress(body).splitlines()) == len(many_notes)
+
+    def test_invalid_since(self, authenticated_client):
+        """Test a malformed since is rejected"""
+        url = reverse('note-export')
+        response = authenticated_client.get(url, {'since': 'yesterday'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+# ============================================================================
+# IMPORT TESTS
+# ============================================================================
+
+@pytest.mark.django_db
+class TestNoteImport:
+    """Test cases for the batched NDJSON/JSON import"""
+
+    def upload(self, client, body, name='notes.ndjson'):
+        url = reverse('note-import-file')
+        return client.post(url, {'file': SimpleUploadedFile(name, body.encode('utf-8'))}, format='multipart')
+
+    def test_import_ndjson(self, authenticated_client, user):
+        """Test NDJSON rows are inserted and counted"""
+        body = '\n'.join(json.dumps({'title': f'N{i}', 'category': 'School'}) for i in range(5))
+        response = self.upload(authenticated_client, body)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['created'] == 5
+        assert response.data['failed'] == 0
+        assert 'rows_per_second' in response.data
+        assert Note.objects.filter(user=user).count() == 5
+        assert CategoryCount.objects.get(user=user, category='School').count == 5
+
+    def test_import_json_array(self, authenticated_client, user):
+        """Test a JSON array is read element by element"""
+        body = json.dumps([{'title': 'A', 'content': 'x' * 70000}, {'title': 'B'}])
+        response = self.upload(authenticated_client, body, name='notes.json')
+        assert response.data['created'] == 2
+        assert Note.objects.get(user=user, title='A').content == 'x' * 70000
+
+    def test_bad_rows_are_reported(self, authenticated_client, user):
+        """Test invalid rows land in the error report without aborting the run"""
+        body = '\n'.join([
+            json.dumps({'title': 'Good'}),
+            '{not json',
+            json.dumps({'title': 'Bad', 'category': 'Nope'}),
+            json.dumps(['not', 'an', 'object']),
+            json.dumps({'title': 'Also good'}),
+        ])
+        response = self.upload(authenticated_client, body)
+        assert response.data['created'] == 2
+        assert [error['row'] for error in response.data['errors']] == [2, 3, 4]
+        assert 'category' in response.data['errors'][1]['errors']
+
+    def test_requires_file(self, authenticated_client):
+        """Test the endpoint refuses a request without a file"""
+        response = authenticated_client.post(reverse('note-import-file'), {}, format='multipart')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_import_command_batches(self, user, tmp_path):
+        """Test the management command inserts in batches and reports throughput"""
+        path = tmp_path / 'notes.ndjson'
+        path.write_text('\n'.join(json.dumps({'title': f'C{i}'}) for i in range(7)))
+        out = StringIO()
+        with CaptureQueriesContext(connection) as ctx:
+            call_command('import_notes', user.email, str(path), '--batch-size', '3', stdout=out)
+        assert Note.objects.filter(user=user).count() == 7
+        assert len([q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "notes_note"')]) == 3
+        assert '7 note(s) imported' in out.getvalue()
+        assert 'rows/sec' in out.getvalue()
+
+
+# ============================================================================
+# INCREMENTAL SYNC TESTS
+# ============================================================================
+
+@pytest.mark.django_db
+class TestIncrementalSync:
+    """Test cases for the changes-since-cursor endpoint"""
+
+    def sync(self, client, cursor=None):
+        url = reverse('note-changes')
+        params = {'since': cursor} if cursor else {}
+        response = client.get(url, params)
+        assert response.status_code == status.HTTP_200_OK
+        return response.data
+
+    def test_initial_sync_returns_live_notes(self, authenticated_client, multiple_notes):
+        """Test a client without a cursor gets every note in write order"""
+        multiple_notes[0].delete()
+        data = self.sync(authenticated_client)
+        assert [change['type'] for change in data['changes']] == ['upsert', 'upsert']
+        assert [change['id'] for change in data['changes']] == [note.id for note in multiple_notes[1:]]
+        assert data['changes'][0]['note']['content'] == multiple_notes[1].content
+        assert not data['has_more']
+
+    def test_reports_updates_and_tombstones(self, authenticated_client, multiple_notes):
+        """Test only changes after the cursor come back, deletions as tombstones"""
+        cursor = self.sync(authenticated_client)['cursor']
+        first, second, _ = multiple_notes
+        authenticated_client.patch(reverse('note-detail', kwargs={'pk': first.id}), {'title': 'Edited'}, format='json')
+        authenticated_client.delete(reverse('note-detail', kwargs={'pk': second.id}))
+
+        data = self.sync(authenticated_client, cursor)
+        assert data['changes'] == [
+            {'type': 'upsert', 'id': first.id, 'note': data['changes'][0]['note']},
+            {'type': 'delete', 'id': second.id},
+        ]
+        assert data['changes'][0]['note']['title'] == 'Edited'
+        assert self.sync(authenticated_client, data['cursor'])['changes'] == []
+
+    def test_empty_account_cursor_catches_first_note(self, authenticated_client, user):
+        """Test the cursor handed to an empty client still sees the first write"""
+        cursor = self.sync(authenticated_client)['cursor']
+        note = Note.objects.create(user=user, title='First')
+        assert [change['id'] for change in self.sync(authenticated_client, cursor)['changes']] == [note.id]
+
+    def test_pages_through_bulk_changes(self, authenticated_client, user):
+        """Test changes sharing one sequence value page without loss"""
+        authenticated_client.post(reverse('note-bulk'), {'operations': [
+            {'op': 'create', 'title': f'Bulk {i}'} for i in range(25)
+        ]}, format='json')
+        seen, cursor = [], None
+        while True:
+            data = self.sync(authenticated_client, cursor)
+            seen.extend(change['id'] for change in data['changes'])
+            cursor = data['cursor']
+            if not data['has_more']:
+                break
+        assert sorted(seen) == sorted(Note.objects.filter(user=user).values_list('id', flat=True))
+        assert len(seen) == len(set(seen))
+
+    def test_bulk_delete_leaves_tombstones(self, authenticated_client, multiple_notes):
+        """Test bulk deletes are reported like single deletes"""
+        cursor = self.sync(authenticated_client)['cursor']
+        authenticated_client.post(reverse('note-bulk'), {'operations': [
+            {'op': 'delete', 'id': note.id} for note in multiple_notes
+        ]}, format='json')
+        changes = self.sync(authenticated_client, cursor)['changes']
+        assert {change['id'] for change in changes if change['type'] == 'delete'} == {
+            note.id for note in multiple_notes
+        }
+
+    def test_idle_poll_is_not_modified(self, authenticated_client, note):
+        """Test an unchanged account answers polls with 304"""
+        url = reverse('note-changes')
+        cursor = self.sync(authenticated_client)['cursor']
+        response = authenticated_client.get(url, {'since': cursor})
+        cached = authenticated_client.get(url, {'since': cursor}, HTTP_IF_NONE_MATCH=response['ETag'])
+        assert cached.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_invalid_cursor(self, authenticated_client):
+        """Test a malformed cursor is rejected"""
+        response = authenticated_client.get(reverse('note-changes'), {'since': 'garbage'})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+# ============================================================================
+# SERVER-PUSH TESTS
+# ============================================================================
+
+@pytest.mark.django_db
+class TestNoteEvents:
+    """Test cases for the server-sent note events stream"""
+
+    @pytest.fixture(autouse=True)
+    def async_urls(self, settings):
+        settings.ROOT_URLCONF = 'notes.async_urls'
+
+    def open_stream(self, token):
+        async def scenario(steps):
+            response = await AsyncClient().get(reverse('note-events'), {'token': token})
+            if not response.streaming:
+                return response, []
+            stream = response.streaming_content
+            frames = [await anext(stream)]
+            for step in steps:
+                await sync_to_async(step)()
+                frames.append(await asyncio.wait_for(anext(stream), 2))
+            await stream.aclose()
+            return response, frames
+        return scenario
+
+    def test_pushes_note_writes(self, user, django_capture_on_commit_callbacks):
+        """Test create, update and delete each reach the user's stream"""
+        token = str(RefreshToken.for_user(user).access_token)
+        note = Note(user=user, title='Pushed')
+
+        def write(action):
+            def step():
+                with django_capture_on_commit_callbacks(execute=True):
+                    action()
+            return step
+
+        def rename():
+            note.title = 'Renamed'
+            note.save()
+
+        response, frames = async_to_sync(self.open_stream(token))([
+            write(note.save), write(rename), write(note.delete),
+        ])
+        assert response['Content-Type'] == 'text/event-stream'
+        assert frames[0] == b': connected\n\n'
+        events = [json.loads(frame.decode().split('data: ', 1)[1]) for frame in frames[1:]]
+        assert [event['type'] for event in events] == ['created', 'updated', 'deleted']
+        assert events[1]['version'] == 2
+        assert [event['sequence'] for event in events] == sorted(event['sequence'] for event in events)
+
+    def test_other_users_writes_are_not_pushed(self, user, another_user, django_capture_on_commit_callbacks):
+        """Test a stream only carries its own user's events"""
+        token = str(RefreshToken.for_user(user).access_token)
+
+        def writes():
+            with django_capture_on_commit_callbacks(execute=True):
+                Note.objects.create(user=another_user, title='Theirs')
+            with django_capture_on_commit_callbacks(execute=True):
+                Note.objects.create(user=user, title='Mine')
+
+        _, frames = async_to_sync(self.open_stream(token))([writes])
+        assert b'"created"' in frames[1]
+        assert json.loads(frames[1].decode().split('data: ', 1)[1])['id'] == Note.objects.get(title='Mine').id
+
+    def test_rejects_bad_token(self):
+        """Test the stream requires a valid access token"""
+        response, _ = async_to_sync(self.open_stream('not-a-token'))([])
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_not_served_by_wsgi_urls(self, settings, authenticated_client):
+        """Test the WSGI URLconf does not route the stream to a worker"""
+        settings.ROOT_URLCONF = 'notes.urls'
+        response = authenticated_client.get('/api/notes/events/')
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+# ============================================================================
+# ASYNC VIEW TESTS
+# ============================================================================
+
+@pytest.mark.django_db
+class TestAsyncViews:
+    """Test the ASGI-native endpoints answer exactly like the DRF views"""
+
+    def both(self, request):
+        sync_response = request()
+        with override_settings(ROOT_URLCONF='notes.async_urls'):
+            async_response = request()
+        return sync_response, async_response
+
+    def payload(self, response):
+        data = json.loads(response.content)
+        if isinstance(data, dict):
+            data.pop('version', None)
+        return data
+
+    def test_list_pages_match(self, authenticated_client, many_notes):
+        """Test page-number, cursor and filtered pages are identical"""
+        url = reverse('note-list')
+        for params in ({}, {'page': 2}, {'page': 'last'}, {'cursor': ''}, {'category': 'School'}):
+            sync_response, async_response = self.both(lambda: authenticated_client.get(url, params))
+            assert async_response.status_code == status.HTTP_200_OK
+            assert json.loads(async_response.content) == json.loads(sync_response.content)
+            assert async_response['ETag'] == sync_response['ETag']
+
+        for params in ({'page': 99}, {'page': 'x'}, {'cursor': 'not-a-cursor'}):
+            sync_response, async_response = self.both(lambda: authenticated_client.get(url, params))
+            assert async_response.status_code == status.HTTP_404_NOT_FOUND
+            assert async_response.json() == sync_response.json()
+
+    def test_list_revalidates_and_caches(self, authenticated_client, multiple_notes):
+        """Test the async list honours ETags and the response cache"""
+        url = reverse('note-list')
+        with override_settings(ROOT_URLCONF='notes.async_urls'):
+            first = authenticated_client.get(url)
+            second = authenticated_client.get(url)
+            not_modified = authenticated_client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        assert (first['X-Cache'], second['X-Cache']) == ('MISS', 'HIT')
+        assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_retrieve_matches(self, authenticated_client, note, another_user):
+        """Test retrieve returns the full note, 304s and hides other users' notes"""
+        url = reverse('note-detail', kwargs={'pk': note.id})
+        sync_response, async_response = self.both(lambda: authenticated_client.get(url))
+        assert json.loads(async_response.content) == json.loads(sync_response.content)
+
+        foreign = Note.objects.create(user=another_user, title='Theirs')
+        with override_settings(ROOT_URLCONF='notes.async_urls'):
+            cached = authenticated_client.get(url, HTTP_IF_NONE_MATCH=async_response['ETag'])
+            missing = authenticated_client.get(reverse('note-detail', kwargs={'pk': foreign.id}))
+        assert cached.status_code == status.HTTP_304_NOT_MODIFIED
+        assert missing.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_partial_update(self, authenticated_client, user, note):
+        """Test a JSON PATCH saves through the model's bookkeeping"""
+        url = reverse('note-detail', kwargs={'pk': note.id})
+        with override_settings(ROOT_URLCONF='notes.async_urls'):
+            response = authenticated_client.patch(url, {'category': 'School'}, format='json')
+            invalid = authenticated_client.patch(url, {'category': 'Nope'}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()['category'] == 'School'
+        assert response.json()['version'] == note.version + 1
+        assert invalid.status_code == status.HTTP_400_BAD_REQUEST
+        assert CategoryCount.objects.get(user=user, category='School').count == 1
+
+    def test_categories_match(self, authenticated_client, multiple_notes):
+        """Test the categories payload is identical"""
+        url = reverse('note-categories')
+        sync_response, async_response = self.both(lambda: authenticated_client.get(url))
+        assert json.loads(async_response.content) == json.loads(sync_response.content)
+
+    def test_login(self, api_client, user):
+        """Test login issues tokens and rejects bad credentials"""
+        url = reverse('auth-login')
+        with override_settings(ROOT_URLCONF='notes.async_urls'):
+            response = api_client.post(url, {'email': user.email, 'password': 'testpass123'}, format='json')
+            rejected = api_client.post(url, {'email': user.email, 'password': 'wrong'}, format='json')
+            missing = api_client.post(url, {'email': user.email}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()['user']['id'] == user.id
+        assert response.json()['tokens']['access']
+        assert rejected.status_code == status.HTTP_401_UNAUTHORIZED
+        assert missing.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_requires_authentication(self, api_client):
+        """Test the async views reject anonymous requests"""
+        with override_settings(ROOT_URLCONF='notes.async_urls'):
+            response = api_client.get(reverse('note-list'))
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_other_methods_fall_back_to_drf(self, authenticated_client, user):
+        """Test create still goes through the DRF view"""
+        with override_settings(ROOT_URLCONF='notes.async_urls'):
+            response = authenticated_client.post(reverse('note-list'), {'title': 'Created'}, format='json')
+        assert response.status_code == status.HTTP_201_CREATED
+        assert Note.objects.filter(user=user, title='Created').exists()
+
+
+# ============================================================================
+# LOGIN COST TESTS
+# ============================================================================
+
+@pytest.mark.django_db
+class TestLoginCost:
+    """Test cases for the single-lookup login, tunable hashing and throttles"""
+
+    def login(self, client, email, password='testpass123', **extra):
+        return client.post(reverse('auth-login'), {'email': email, 'password': password}, format='json', **extra)
+
+    def test_single_user_query(self, api_client, user):
+        """Test login loads the user once, by email"""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.login(api_client, user.email)
+        assert response.status_code == status.HTTP_200_OK
+        assert len([q for q in ctx.captured_queries if 'FROM "auth_user"' in q['sql']]) == 1
+
+    def test_email_lookup_uses_index(self, user):
+        """Test the email lookup is served by an index"""
+        plan = explain(User.objects.filter(email=user.email))
+        assert 'notes_auth_user_email_idx' in plan
+
+    def test_rehash_on_login(self, api_client, user, settings):
+        """Test a changed work factor is applied transparently on the next login"""
+        settings.NOTES_PBKDF2_ITERATIONS = 1000
+        assert self.login(api_client, user.email).status_code == status.HTTP_200_OK
+        user.refresh_from_db()
+        assert user.password.split('$')[1] == '1000'
+        assert self.login(api_client, user.email).status_code == status.HTTP_200_OK
+
+    def test_account_throttle_skips_hashing(self, api_client, user, settings, monkeypatch):
+        """Test excess attempts on one account are refused before any hashing"""
+        settings.REST_FRAMEWORK = {
+            **settings.REST_FRAMEWORK,
+            'DEFAULT_THROTTLE_RATES': {'login': '100/min', 'login_account': '2/min'},
+        }
+        for _ in range(2):
+            assert self.login(api_client, user.email, 'wrong').status_code == status.HTTP_401_UNAUTHORIZED
+
+        checks = []
+        monkeypatch.setattr(User, 'check_password', lambda self, raw: checks.append(raw))
+        response = self.login(api_client, user.email.upper(), REMOTE_ADDR='10.0.0.9')
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert response['Retry-After']
+        assert checks == []
+        assert self.login(api_client, 'someone@example.com', 'x').status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_ip_throttle(self, api_client, user, settings):
+        """Test one address cannot spray many accounts"""
+        settings.REST_FRAMEWORK = {
+            **settings.REST_FRAMEWORK,
+            'DEFAULT_THROTTLE_RATES': {'login': '2/min', 'login_account': '100/min'},
+        }
+        for i in range(2):
+            self.login(api_client, f'user{i}@example.com', 'x')
+        response = self.login(api_client, user.email)
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        response = self.login(api_client, user.email, REMOTE_ADDR='10.0.0.9')
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_throttles_count_in_shared_cache(self, api_client, user):
+        """Test login attempts are counted in the cache shared between workers"""
+        self.login(api_client, user.email, 'wrong')
+        assert caches[settings.NOTES_CACHE_ALIAS].get('throttle_login_127.0.0.1') is not None
+        assert caches['default'].get('throttle_login_127.0.0.1') is None
+
+    def test_throttle_cache_must_be_shared(self, settings):
+        """Test several workers are refused while the throttle cache is local to each"""
+        settings.NOTES_SERVER_WORKERS = 4
+        with pytest.raises(ImproperlyConfigured):
+            throttling.check_throttle_cache()
+        settings.CACHES = {
+            **settings.CACHES,
+            settings.NOTES_CACHE_ALIAS: {'BACKEND': 'django.core.cache.backends.redis.RedisCache'},
+        }
+        throttling.check_throttle_cache()
+
+    def test_async_login_is_throttled(self, api_client, user, settings):
+        """Test the ASGI login applies the same throttles"""
+        settings.REST_FRAMEWORK = {
+            **settings.REST_FRAMEWORK,
+            'DEFAULT_THROTTLE_RATES': {'login': '100/min', 'login_account': '1/min'},
+        }
+        with override_settings(ROOT_URLCONF='notes.async_urls'):
+            assert self.login(api_client, user.email).status_code == status.HTTP_200_OK
+            assert self.login(api_client, user.email).status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+    def test_async_login_hashes_off_the_loop(self, api_client, user, settings, monkeypatch):
+        """Test the ASGI login never verifies or hashes a password on the event loop"""
+        from django.contrib.auth import hashers
+        from notes import backends
+
+        def on_loop():
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                return False
+            return True
+
+        calls = []
+        real_verify, real_hash = hashers.verify_password, hashers.make_password
+        monkeypatch.setattr(backends, 'verify_password', lambda *a, **k: calls.append(on_loop()) or real_verify(*a, **k))
+        monkeypatch.setattr(
+            'django.contrib.auth.base_user.make_password', lambda *a, **k: calls.append(on_loop()) or real_hash(*a, **k),
+        )
+        settings.NOTES_PBKDF2_ITERATIONS = 1000
+        with override_settings(ROOT_URLCONF='notes.async_urls'):
+            assert self.login(api_client, user.email).status_code == status.HTTP_200_OK
+            assert self.login(api_client, 'someone@example.com', 'x').status_code == status.HTTP_401_UNAUTHORIZED
+        user.refresh_from_db()
+        assert user.password.split('$')[1] == '1000'
+        assert len(calls) == 3
+        assert not any(calls)
+
+
+# ============================================================================
+# STATELESS AUTHENTICATION TESTS
+# ============================================================================
+
+@pytest.mark.django_db
+class TestStatelessAuth:
+    """Test cases for authenticating from token claims without loading the user"""
+
+    @pytest.fixture
+    def stateless_client(self, api_client, user, settings, monkeypatch):
+        settings.NOTES_STATELESS_AUTH = True
+        monkeypatch.setattr(NoteViewSet, 'authentication_classes', [StatelessJWTAuthentication])
+        token = NoteRefreshToken.for_user(user).access_token
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return api_client
+
+    def user_queries(self, client, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        return len([q for q in ctx.captured_queries if 'FROM "auth_user"' in q['sql']])
+
+    def test_default_loads_user(self, authenticated_client, note):
+        """Test the default authentication loads the user on every request"""
+        url = reverse('note-detail', kwargs={'pk': note.id})
+        assert self.user_queries(authenticated_client, url) == 1
+        assert self.user_queries(authenticated_client, url) == 1
+
+    def test_stateless_skips_user_query(self, stateless_client, note):
+        """Test only the first request checks the account, later ones skip auth_user"""
+        url = reverse('note-detail', kwargs={'pk': note.id})
+        assert self.user_queries(stateless_client, url) == 1
+        assert self.user_queries(stateless_client, url) == 0
+
+    def test_claims_user(self, stateless_client, user):
+        """Test the token user owns what it creates and sees only its notes"""
+        response = stateless_client.post(reverse('note-list'), {'title': 'Stateless'}, format='json')
+        assert response.status_code == status.HTTP_201_CREATED
+        assert Note.objects.get(pk=response.data['id']).user_id == user.id
+        assert stateless_client.get(reverse('note-list')).data['count'] == 1
+
+    def test_deactivation_applies_immediately(self, stateless_client, user):
+        """Test saving an inactive user drops the cached state in this process"""
+        url = reverse('note-list')
+        assert stateless_client.get(url).status_code == status.HTTP_200_OK
+        user.is_active = False
+        user.save()
+        assert stateless_client.get(url).status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_state_expires(self, stateless_client, user, settings):
+        """Test changes made elsewhere are picked up once the entry expires"""
+        url = reverse('note-list')
+        assert stateless_client.get(url).status_code == status.HTTP_200_OK
+        User.objects.filter(pk=user.pk).update(is_active=False)
+        assert stateless_client.get(url).status_code == status.HTTP_200_OK
+
+        settings.NOTES_AUTH_STATE_TTL = 0
+        active_states.set(user.id, True)
+        assert stateless_client.get(url).status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_deleted_user(self, stateless_client, user):
+        """Test a token outliving its user is refused"""
+        user.delete()
+        assert stateless_client.get(reverse('note-list')).status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_async_views(self, stateless_client, note):
+        """Test the ASGI views share the fast path"""
+        url = reverse('note-list')
+        with override_settings(ROOT_URLCONF='notes.async_urls'):
+            assert self.user_queries(stateless_client, url) == 1
+            assert self.user_queries(stateless_client, url) == 0
+
+
+# ============================================================================
+# REQUEST METRICS TESTS
+# ============================================================================
+
+@pytest.mark.django_db
+class TestRequestMetrics:
+    """Test cases for sampled per-route request metrics"""
+
+    @pytest.fixture
+    def sampled(self, settings):
+        settings.NOTES_METRICS_SAMPLE_RATE = 1.0
+        settings.NOTES_METRICS_TOKEN = 'scrape-secret'
+
+    def test_off_by_default(self, authenticated_client, note):
+        """Test unsampled requests record nothing and add no header"""
+        response = authenticated_client.get(reverse('note-list'))
+        assert 'Server-Timing' not in response
+        assert metrics.stats() == {}
+
+    def test_records_route_stats(self, sampled, authenticated_client, multiple_notes):
+        """Test each route and method gets its own counters"""
+        url = reverse('note-list')
+        response = authenticated_client.get(url)
+        authenticated_client.get(url)
+        authenticated_client.get(reverse('note-categories'))
+
+        assert response['Server-Timing'].startswith('app;dur=')
+        assert 'db;dur=' in response['Server-Timing']
+        assert 'serialize;dur=' in response['Server-Timing']
+
+        series = metrics.stats()
+        listing = series[('note-list', 'GET')]
+        assert listing['requests'] == 2
+        assert sum(listing['buckets']) == 2
+        assert listing['queries'] > 0
+        assert listing['db_us'] > 0
+        assert listing['serialize_us'] > 0
+        assert series[('note-categories', 'GET')]['requests'] == 1
+
+    def test_async_requests(self, sampled, user, note):
+        """Test the async handler path is measured too"""
+        token = RefreshToken.for_user(user).access_token
+
+        async def fetch():
+            return await AsyncClient().get(reverse('note-list'), headers={'Authorization': f'Bearer {token}'})
+
+        with override_settings(ROOT_URLCONF='notes.async_urls'):
+            response = async_to_sync(fetch)()
+        assert response.status_code == status.HTTP_200_OK
+        assert 'db;dur=' in response['Server-Timing']
+        assert metrics.stats()[('note-list', 'GET')]['queries'] > 0
+
+    def test_prometheus_endpoint(self, sampled, authenticated_client, note, settings):
+        """Test the scrape endpoint requires the token and renders a histogram"""
+        authenticated_client.get(reverse('note-list'))
+        url = reverse('metrics')
+        api_client = APIClient()
+        assert api_client.get(url).status_code == status.HTTP_403_FORBIDDEN
+        assert api_client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code == status.HTTP_403_FORBIDDEN
+
+        response = api_client.get(url, HTTP_AUTHORIZATION='Bearer scrape-secret')
+        assert response.status_code == status.HTTP_200_OK
+        body = response.content.decode()
+        assert '# TYPE notes_http_request_duration_seconds histogram' in body
+        assert 'notes_http_request_duration_seconds_count{route="note-list",method="GET"} 1' in body
+        assert 'notes_http_request_duration_seconds_bucket{route="note-list",method="GET",le="+Inf"} 1' in body
+        assert 'notes_db_queries_total{route="note-list",method="GET"}' in body
+
+        settings.NOTES_METRICS_TOKEN = ''
+        assert api_client.get(url).status_code == status.HTTP_404_NOT_FOUND
+
+    def test_concurrent_registration(self, monkeypatch):
+        """Test two series registered at the same moment both stay listed"""
+        cache = metrics.metrics_cache()
+        set_value = cache.set
+
+        def racing_set(*args, **kwargs):
+            # Another worker registers its series between our read and write.
+            monkeypatch.setattr(cache, 'set', set_value)
+            metrics.register_series(cache, 'note-categories|GET')
+            set_value(*args, **kwargs)
+
+        monkeypatch.setattr(cache, 'set', racing_set)
+        metrics.register_series(cache, 'note-list|GET')
+        metrics.register_series(cache, 'note-list|GET')
+        assert sorted(metrics.known_series(cache)) == ['note-categories|GET', 'note-list|GET']
+        metrics.reset_stats()
+        assert metrics.known_series(cache) == []
+
+    def test_report_command(self, sampled, authenticated_client, note):
+        """Test the management command reports and resets the counters"""
+        authenticated_client.get(reverse('note-detail', kwargs={'pk': note.id}))
+        out = StringIO()
+        call_command('notes_metrics', '--reset', stdout=out)
+        assert 'note-detail' in out.getvalue()
+        assert metrics.stats() == {}
+
+
+# ============================================================================
+# BENCHMARK HARNESS TESTS
+# ============================================================================
+
+@pytest.mark.django_db
+class TestBenchmarks:
+    """Test cases for the seeded datasets and the benchmark command"""
+
+    def test_seed_is_reproducible(self):
+        """Test the same seed yields the same notes and consistent counters"""
+        contents = []
+        for _ in range(2):
+            users = benchmarks.seed_dataset(2, 5, [10, 300], seed=7)
+            contents.append([
+                (note.title, note.content, note.category)
+                for note in Note.objects.filter(user__in=users).order_by('id')
+            ])
+            assert CategoryCount.objects.filter(user__in=users).aggregate(total=Sum('count'))['total'] == 10
+            benchmarks.drop_dataset(users)
+        assert contents[0] == contents[1]
+        assert sorted({len(content) for _, content, _ in contents[0]}) == [10, 300]
+
+    def test_summarize(self):
+        """Test percentiles are reported in milliseconds"""
+        summary = benchmarks.summarize([i / 1000 for i in range(1, 101)], elapsed=2.0, errors=1)
+        assert summary == {
+            'requests': 100, 'errors': 1, 'rps': 50.0,
+            'p50_ms': 51.0, 'p95_ms': 96.0, 'p99_ms': 100.0,
+        }
+
+    def test_command_writes_results(self, tmp_path):
+        """Test a small run produces the JSON report and cleans up after itself"""
+        output = tmp_path / 'results.json'
+        caches[settings.NOTES_CACHE_ALIAS].set('unrelated', 1)
+        call_command(
+            'bench_notes', '--users', '2', '--notes', '4', '--requests', '3', '--concurrency', '1',
+            '--rounds', '2', '--scenario', 'list', '--scenario', 'patch', '--output', str(output),
+            stdout=StringIO(),
+        )
+        results = json.loads(output.read_text())
+        assert results['environment']['database'] == connection.vendor
+        assert set(results['scenarios']) == {'list', 'patch'}
+        assert results['scenarios']['patch']['errors'] == 0
+        assert results['scenarios']['list']['requests'] == 3
+        assert 'list_page_100_rows' in results['micro']
+        assert not User.objects.filter(username__startswith='bench-').exists()
+        # The run bypasses the response cache instead of clearing it.
+        assert results['load']['response_cache'] is False
+        assert caches[settings.NOTES_CACHE_ALIAS].get('unrelated') == 1
+
+
+# ============================================================================
+# FAST LIST SERIALIZATION TESTS
+# ============================================================================
+
+@pytest.mark.django_db
+class TestFastListSerialization:
+    """Test the .values() list path renders exactly what NoteListSerializer does"""
+
+    @pytest.fixture
+    def tricky_notes(self, user):
+        contents = [
+            'plain',
+            'x' * 500,
+            'é😀 "quoted" \\ back\tslash \x01 line\u2028para\u2029 </script>',
+            '',
+        ]
+        return [
+            Note.objects.create(user=user, title=f'Títle {i} \u2028', content=content, category='Drama')
+            for i, content in enumerate(contents)
+        ]
+
+    def render_both(self, user):
+        queryset = with_preview(Note.objects.filter(user=user))
+        fast = FastJSONRenderer().render(note_list_rows(queryset.values(*NOTE_LIST_FIELDS)))
+        drf = JSONRenderer().render(NoteListSerializer(queryset, many=True).data)
+        return fast, drf
+
+    def test_byte_identical(self, user, tricky_notes):
+        """Test rows and the fast renderer match the serializer and DRF's renderer"""
+        fast, drf = self.render_both(user)
+        assert fast == drf
+        assert b'\\u2028' in fast
+
+    def test_byte_identical_in_other_timezone(self, user, tricky_notes):
+        """Test timestamps are converted to the active timezone like DateTimeField"""
+        with timezone.override('America/Sao_Paulo'):
+            fast, drf = self.render_both(user)
+        assert fast == drf
+        assert b'-03:00' in fast
+
+    def test_list_endpoint_matches(self, authenticated_client, user, tricky_notes):
+        """Test the list endpoint serves the same page the serializer would"""
+        response = authenticated_client.get(reverse('note-list'), {'cursor': ''})
+        queryset = with_preview(Note.objects.filter(user=user))
+        expected = JSONRenderer().render(NoteListSerializer(queryset, many=True).data)
+        assert response.content == JSONRenderer().render({'next': None, 'previous': None, 'results': json.loads(expected)})
+
+    def test_renderer_falls_back(self):
+        """Test values orjson would encode differently go through DRF's encoder"""
+        data = {'when': timezone.now(), 'amount': Decimal('1.50'), 1: 'int key', 'lazy': gettext_lazy('Lazy')}
+        assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
+        indented = FastJSONRenderer().render({'a': 1}, 'application/json; indent=2')
+        assert indented == JSONRenderer().render({'a': 1}, 'application/json; indent=2')
+
+    def test_renderer_floats(self):
+        """Test the float output that keeps the fast renderer off other views"""
+        pytest.importorskip('orjson')
+        assert FastJSONRenderer().render({'v': 0.1}) == JSONRenderer().render({'v': 0.1})
+        assert FastJSONRenderer().render({'v': 1e16}) == b'{"v":1e16}'
+        assert FastJSONRenderer().render({'v': float('nan')}) == b'{"v":null}'
+        with pytest.raises(ValueError):
+            JSONRenderer().render({'v': float('nan')})
+
+    def test_renderer_scoped_to_note_reads(self, authenticated_client, user, tricky_notes):
+        """Test only the note list and detail use the fast renderer"""
+        assert isinstance(authenticated_client.get(reverse('note-list')).accepted_renderer, FastJSONRenderer)
+        detail = authenticated_client.get(reverse('note-detail', args=[tricky_notes[0].pk]))
+        assert isinstance(detail.accepted_renderer, FastJSONRenderer)
+        categories = authenticated_client.get(reverse('note-categories'))
+        assert type(categories.accepted_renderer) is JSONRenderer
+
+
+# ============================================================================
+# PAGE SIZE AND COUNT TESTS
+# ============================================================================
+
+@pytest.mark.django_db
+class TestPageSizeAndCount:
+    """Test cases for ?page_size= and the ?count= modes of the note list"""
+
+    def note_count_queries(self, client, params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(reverse('note-list'), params)
+        assert response.status_code == status.HTTP_200_OK
+        counts = [q for q in ctx.captured_queries if 'COUNT(' in q['sql'].upper() and 'notes_note' in q['sql']]
+        return response, len(counts)
+
+    def test_page_size(self, authenticated_client, many_notes, settings):
+        """Test the requested size is honoured and capped by the server"""
+        url = reverse('note-list')
+        assert len(authenticated_client.get(url, {'page_size': 20}).data['results']) == 20
+        settings.NOTES_MAX_PAGE_SIZE = 7
+        response = authenticated_client.get(url, {'page_size': 50})
+        assert len(response.data['results']) == 7
+        assert 'page=2' in response.data['next']
+        assert len(authenticated_client.get(url, {'page_size': 'x'}).data['results']) == 10
+        assert len(authenticated_client.get(url, {'page_size': 0}).data['results']) == 10
+
+    def test_page_size_with_cursor(self, authenticated_client, many_notes):
+        """Test keyset pages use the requested size"""
+        response = authenticated_client.get(reverse('note-list'), {'cursor': '', 'page_size': 25})
+        assert len(response.data['results']) == 25
+        assert response.data['next'] is None
+
+    def test_count_none(self, authenticated_client, many_notes):
+        """Test skipping the total still links pages without COUNT(*)"""
+        response, counts = self.note_count_queries(authenticated_client, {'count': 'none'})
+        assert counts == 0
+        assert response.data['count'] is None
+        assert len(response.data['results']) == 10
+        assert 'page=2' in response.data['next']
+        assert response.data['previous'] is None
+
+        response, _ = self.note_count_queries(authenticated_client, {'count': 'none', 'page': 3})
+        assert len(response.data['results']) == 5
+        assert response.data['next'] is None
+        assert 'page=2' in response.data['previous']
+
+        url = reverse('note-list')
+        assert authenticated_client.get(url, {'count': 'none', 'page': 4}).status_code == status.HTTP_404_NOT_FOUND
+        assert authenticated_client.get(url, {'count': 'none', 'page': 'last'}).status_code == status.HTTP_404_NOT_FOUND
+
+    def test_count_estimate(self, authenticated_client, many_notes):
+        """Test the estimate comes from the category counters"""
+        response, counts = self.note_count_queries(authenticated_client, {'count': 'estimate'})
+        assert counts == 0
+        assert response.data['count'] == 25
+        response, _ = self.note_count_queries(authenticated_client, {'count': 'estimate', 'category': 'School'})
+        assert response.data['count'] == 12
+        assert response.data['next'] is not None
+
+    def test_default_mode_setting(self, authenticated_client, many_notes, settings):
+        """Test the default mode is configurable and an unknown mode falls back to it"""
+        _, counts = self.note_count_queries(authenticated_client, {})
+        assert counts == 1
+        settings.NOTES_PAGE_COUNT = 'none'
+        response, counts = self.note_count_queries(authenticated_client, {'count': 'bogus'})
+        assert counts == 0
+        assert response.data['count'] is None
+
+    def test_async_pages_match(self, authenticated_client, many_notes):
+        """Test the async list answers every mode like the DRF view"""
+        url = reverse('note-list')
+        for params in (
+            {'page_size': 7, 'page': 2},
+            {'count': 'none', 'page': 3},
+            {'count': 'none', 'page_size': 5},
+            {'count': 'estimate', 'category': 'School'},
+            {'count': 'estimate', 'page': 'last'},
+            {'cursor': '', 'page_size': 4},
+        ):
+            sync_response = authenticated_client.get(url, params)
+            with override_settings(ROOT_URLCONF='notes.async_urls'):
+                async_response = authenticated_client.get(url, params)
+            assert async_response.status_code == status.HTTP_200_OK
+            assert json.loads(async_response.content) == json.loads(sync_response.content)
+
+        with override_settings(ROOT_URLCONF='notes.async_urls'):
+            response = authenticated_client.get(url, {'count': 'none', 'page': 9})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_search_page_size(self, authenticated_client, many_notes):
+        """Test search pages follow ?page_size= too"""
+        response = authenticated_client.get(reverse('note-search'), {'q': 'paged', 'page_size': 3})
+        assert len(response.data['results']) == 3
+
+
+# ============================================================================
+# SQLITE PRODUCTION PROFILE TESTS
+# ============================================================================
+
+@pytest.mark.skipif(connection.vendor != 'sqlite', reason='SQLite-specific profile')
+class TestSQLiteProductionProfile:
+    """Test the opt-in SQLite profile under concurrent autosaves"""
+
+    @pytest.fixture
+    def profile_alias(self, django_db_setup, tmp_path, settings, django_db_blocker):
+        # A file database of its own: the test database is in memory and
+        # wrapped in a transaction, so it cannot show cross-thread locking.
+        alias = 'sqlite_profile'
+        connections.settings[alias] = connections.configure_settings({
+            **settings.DATABASES,
+            alias: {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': str(tmp_path / 'profile.sqlite3'),
+                'OPTIONS': settings.SQLITE_PRODUCTION_OPTIONS,
+                'CONN_MAX_AGE': 600,
+                'CONN_HEALTH_CHECKS': True,
+            },
+        })[alias]
+        with django_db_blocker.unblock():
+            call_command('migrate', database=alias, verbosity=0)
+            yield alias
+            connections[alias].close()
+        del connections[alias]
+        del connections.settings[alias]
+
+    def test_pragmas(self, profile_alias):
+        """Test the pragmas are applied on connect"""
+        with connections[profile_alias].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            assert cursor.fetchone()[0] == 'wal'
+            cursor.execute('PRAGMA synchronous')
+            assert cursor.fetchone()[0] == 1
+            cursor.execute('PRAGMA busy_timeout')
+            assert cursor.fetchone()[0] > 0
+        assert connections[profile_alias].transaction_mode == 'IMMEDIATE'
+
+    def test_concurrent_autosaves(self, profile_alias):
+        """Test concurrent PATCH autosaves on the profile neither fail nor lose updates"""
+        threads, rounds = 16, 25
+        owner = User.objects.db_manager(profile_alias).create_user('autosave', 'autosave@example.com', 'pw')
+        notes = Note.objects.using(profile_alias).bulk_create([Note(user=owner, title=f'Note {i}') for i in range(2)])
+        token = f'Bearer {RefreshToken.for_user(owner).access_token}'
+        failures = []
+
+        def autosave(worker, note_id):
+            client = Client()
+            url = reverse('note-detail', kwargs={'pk': note_id})
+            try:
+                for i in range(rounds):
+                    response = client.patch(
+                        url, {'content': f'{worker}-{i} ' + 'x' * 2000},
+                        content_type='application/json', HTTP_AUTHORIZATION=token,
+                    )
+                    if response.status_code != status.HTTP_200_OK:
+                        failures.append(response.status_code)
+            except OperationalError as exc:
+                failures.append(exc)
+            finally:
+                connections.close_all()
+
+        # Connections opened by the worker threads go to the profile database.
+        primary = connections.settings[DEFAULT_DB_ALIAS]
+        connections.settings[DEFAULT_DB_ALIAS] = connections.settings[profile_alias]
+        try:
+            workers = [
+                threading.Thread(target=autosave, args=(i, notes[i % 2].id)) for i in range(threads)
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        finally:
+            connections.settings[DEFAULT_DB_ALIAS] = primary
+
+        assert failures == []
+        versions = Note.objects.using(profile_alias).values_list('version', flat=True)
+        assert sum(versions) == len(notes) + threads * rounds
+        assert NoteRevision.objects.using(profile_alias).count() >= len(notes)
+
+
+# ============================================================================
+# READ REPLICA TESTS
+# ============================================================================
+
+REPLICA_ALIAS = 'replica_test'
+
+
+@pytest.fixture(scope='class')
+def replica_database(django_db_setup, tmp_path_factory, django_db_blocker):
+    # Registered before the test case is set up so it can list the alias
+    # in its databases; the replica's schema comes from migrate, not routing.
+    connections.settings[REPLICA_ALIAS] = connections.configure_settings({
+        **connections.settings,
+        REPLICA_ALIAS: {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': str(tmp_path_factory.mktemp('replica') / 'replica.sqlite3'),
+        },
+    })[REPLICA_ALIAS]
+    with django_db_blocker.unblock():
+        call_command('migrate', database=REPLICA_ALIAS, verbosity=0)
+        yield REPLICA_ALIAS
+        connections[REPLICA_ALIAS].close()
+    del connections[REPLICA_ALIAS]
+    del connections.settings[REPLICA_ALIAS]
+
+
+@pytest.mark.usefixtures('replica_database')
+@pytest.mark.django_db(databases=['default', REPLICA_ALIAS])
+class TestReadReplicas:
+    """Test read routing with a second SQLite file standing in for a replica"""
+
+    @pytest.fixture
+    def replica(self, user, settings):
+        # The replica lags: it only has the user and a stale copy of one note.
+        User.objects.using(REPLICA_ALIAS).create(id=user.id, username=user.username, email=user.email)
+        Note.objects.using(REPLICA_ALIAS).bulk_create([
+            Note(user_id=user.id, title='Replica copy', content='replicated body', category='School'),
+        ])
+        CategoryCount.objects.using(REPLICA_ALIAS).create(user_id=user.id, category='School', count=1)
+        settings.NOTES_READ_REPLICAS = [REPLICA_ALIAS]
+        return REPLICA_ALIAS
+
+    def titles(self, response):
+        return [note['title'] for note in json.loads(response.content)['results']]
+
+    def test_reads_use_replica(self, authenticated_client, note, replica):
+        """Test list, retrieve, categories and search read from the replica"""
+        assert self.titles(authenticated_client.get(reverse('note-list'))) == ['Replica copy']
+        response = authenticated_client.get(reverse('note-categories'))
+        assert {c['name']: c['count'] for c in response.data}['School'] == 1
+        response = authenticated_client.get(reverse('note-search'), {'q': 'replicated'})
+        assert [r['title'] for r in response.data['results']] == ['Replica copy']
+        replica_note = Note.objects.using(replica).get()
+        response = authenticated_client.get(reverse('note-detail', kwargs={'pk': replica_note.id}))
+        assert response.data['title'] == 'Replica copy'
+
+    def test_reads_own_writes(self, authenticated_client, note, replica):
+        """Test a write pins the user's reads to the primary for a while"""
+        url = reverse('note-list')
+        response = authenticated_client.patch(
+            reverse('note-detail', kwargs={'pk': note.id}), {'title': 'Edited'}, format='json'
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert self.titles(authenticated_client.get(url)) == ['Edited']
+
+        caches[settings.NOTES_CACHE_ALIAS].delete(f'primary-pin-{note.user_id}')
+        assert self.titles(authenticated_client.get(url)) == ['Replica copy']
+
+    def test_async_reads_use_replica(self, authenticated_client, note, replica):
+        """Test the async views route the same way"""
+        with override_settings(ROOT_URLCONF='notes.async_urls'):
+            response = authenticated_client.get(reverse('note-list'))
+        assert self.titles(response) == ['Replica copy']
+
+    def test_no_replicas(self, authenticated_client, note):
+        """Test reads stay on the primary when no replica is configured"""
+        assert self.titles(authenticated_client.get(reverse('note-list'))) == ['Test Note']
+
+    def test_pin_cache_must_be_shared(self, settings):
+        """Test replicas are refused while the pin cache is local to each worker"""
+        settings.NOTES_READ_REPLICAS = [REPLICA_ALIAS]
+        with pytest.raises(ImproperlyConfigured):
+            routers.check_pin_cache()
+        settings.CACHES = {
+            **settings.CACHES,
+            settings.NOTES_CACHE_ALIAS: {'BACKEND': 'django.core.cache.backends.redis.RedisCache'},
+        }
+        routers.check_pin_cache()
+
+
+# ============================================================================
+# CONTENT COMPRESSION TESTS
+# ============================================================================
+
+@pytest.mark.django_db
+class TestContentCompression:
+    """Test opt-in compressed storage of large note content"""
+
+    LARGE = 'needle ' + ' '.join(['lorem ipsum dolor sit amet'] * 200)
+
+    @pytest.fixture
+    def compressed(self, settings):
+        settings.NOTES_CONTENT_COMPRESSION = 'zlib'
+        settings.NOTES_COMPRESS_MIN_CHARS = 1000
+        settings.NOTES_COMPRESSED_HEAD_CHARS = 300
+        metrics.reset_stats()
+
+    def stored(self, note_id):
+        return Note.objects.filter(pk=note_id).values_list('content', 'content_compressed').get()
+
+    def test_off_by_default(self, user):
+        """Test content is stored as is unless compression is configured"""
+        note = Note.objects.create(user=user, title='Big', content=self.LARGE)
+        assert self.stored(note.id) == (self.LARGE, None)
+
+    def test_round_trip(self, authenticated_client, compressed):
+        """Test large content is compressed on save and read back whole"""
+        response = authenticated_client.post(
+            reverse('note-list'), {'title': 'Big', 'content': self.LARGE, 'category': 'School'}, format='json'
+        )
+        column, blob = self.stored(response.data['id'])
+        assert column == self.LARGE[:300]
+        assert bytes(blob)[:1] == compression.ZLIB
+        assert len(blob) < len(self.LARGE) // 10
+        assert Note.objects.get(pk=response.data['id']).content == self.LARGE
+        detail = authenticated_client.get(reverse('note-detail', kwargs={'pk': response.data['id']}))
+        assert detail.data['content'] == self.LARGE
+
+    def test_small_content_is_not_compressed(self, user, compressed):
+        """Test content under the threshold is left alone"""
+        note = Note.objects.create(user=user, title='Small', content='short')
+        assert self.stored(note.id) == ('short', None)
+
+    def test_list_preview_reads_head(self, authenticated_client, user, compressed):
+        """Test list previews come from the stored head without loading the blob"""
+        Note.objects.create(user=user, title='Big', content=self.LARGE)
+        with CaptureQueriesContext(connection) as queries:
+            response = authenticated_client.get(reverse('note-list'))
+        assert response.data['results'][0]['preview'] == self.LARGE[:settings.NOTES_PREVIEW_CHARS] + '…'
+        assert not any('content_compressed' in query['sql'] for query in queries)
+
+    def test_updates_recompress(self, authenticated_client, user, compressed):
+        """Test partial updates, deltas and bulk updates keep the two columns in step"""
+        note = Note.objects.create(user=user, title='Small', content='short')
+        url = reverse('note-detail', kwargs={'pk': note.id})
+        authenticated_client.patch(url, {'content': self.LARGE}, format='json')
+        assert self.stored(note.id)[1] is not None
+
+        response = authenticated_client.patch(
+            reverse('note-delta', kwargs={'pk': note.id}),
+            {'version': 2, 'edits': [{'start': 0, 'end': 6, 'text': 'pin'}]}, format='json',
+        )
+        assert response.status_code == status.HTTP_200_OK
+        note.refresh_from_db()
+        assert note.content == 'pin' + self.LARGE[6:]
+        assert self.stored(note.id)[0] == note.content[:300]
+
+        authenticated_client.post(reverse('note-bulk'), {'operations': [
+            {'op': 'update', 'id': note.id, 'content': 'short again'},
+        ]}, format='json')
+        assert self.stored(note.id) == ('short again', None)
+
+    def test_export_and_search(self, authenticated_client, user, compressed):
+        """Test exports carry the full text and search matches past the stored head"""
+        note = Note.objects.create(user=user, title='Big', content=self.LARGE + ' haystack')
+        response = authenticated_client.get(reverse('note-export'))
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        assert rows[0]['content'] == self.LARGE + ' haystack'
+        for query in ('needle', 'haystack', 'big haystack'):
+            response = authenticated_client.get(reverse('note-search'), {'q': query})
+            assert [result['id'] for result in response.data['results']] == [note.id]
+        assert [row['id'] for row in search.search_fallback(user.id, 'haystack', None, None, 10)] == [note.id]
+
+    def test_search_index_keeps_no_copy(self, user, compressed):
+        """Test the SQLite index stores tokens only, not a second copy of the text"""
+        if connection.vendor != 'sqlite' or not search.has_fts_table(connection.alias):
+            pytest.skip('SQLite FTS5 only')
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE name LIKE 'notes_note_fts%'")
+            tables = {name for name, in cursor.fetchall()}
+        assert search.FTS_TABLE in tables
+        assert f'{search.FTS_TABLE}_content' not in tables
+
+    def test_search_follows_compressed_writes(self, authenticated_client, user, compressed):
+        """Test every write path keeps the full text of compressed notes searchable"""
+        def found(query):
+            response = authenticated_client.get(reverse('note-search'), {'q': query})
+            return [result['title'] for result in response.data['results']]
+
+        note = Note.objects.create(user=user, title='Big', content=self.LARGE + ' first')
+        note.title = 'Renamed'
+        note.save(update_fields=['title'])
+        assert found('first') == ['Renamed']
+
+        response = authenticated_client.patch(
+            reverse('note-delta', kwargs={'pk': note.id}),
+            {'version': 2, 'edits': [{'start': len(self.LARGE) + 1, 'end': len(self.LARGE) + 6, 'text': 'second'}]},
+            format='json',
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert (found('first'), found('second')) == ([], ['Renamed'])
+
+        other = Note.objects.create(user=user, title='Other', content='small')
+        authenticated_client.post(reverse('note-bulk'), {'operations': [
+            {'op': 'create', 'title': 'Created', 'content': self.LARGE + ' third'},
+            {'op': 'update', 'id': other.id, 'title': 'Other renamed'},
+            {'op': 'recategorize', 'id': note.id, 'category': 'Drama'},
+        ]}, format='json')
+        assert (found('second'), found('third')) == (['Renamed'], ['Created'])
+
+        authenticated_client.post(reverse('note-bulk'), {'operations': [
+            {'op': 'update', 'id': note.id, 'content': 'small fourth'},
+        ]}, format='json')
+        assert (found('second'), found('fourth')) == ([], ['Renamed'])
+
+    def test_ratio_metrics(self, user, compressed):
+        """Test compressed writes are counted with their raw and stored sizes"""
+        note = Note.objects.create(user=user, title='Big', content=self.LARGE)
+        counters = metrics.compression_stats()
+        assert counters == {
+            'notes': 1,
+            'original_bytes': len(self.LARGE),
+            'stored_bytes': len(self.stored(note.id)[1]),
+        }
+        assert 'notes_content_compression_bytes_total{kind="original"}' in metrics.prometheus_text({}, counters)
+
+    def test_command_converts_existing_rows(self, user, settings):
+        """Test the batch command compresses old rows and can undo it"""
+        notes = [Note.objects.create(user=user, title=f'Big {i}', content=self.LARGE) for i in range(3)]
+        settings.NOTES_CONTENT_COMPRESSION = 'zlib'
+        settings.NOTES_COMPRESS_MIN_CHARS = 1000
+        out = StringIO()
+        call_command('compress_notes', batch_size=2, stdout=out)
+        assert '3 note(s) compressed' in out.getvalue()
+        assert all(self.stored(note.id)[1] is not None for note in notes)
+        assert Note.objects.get(pk=notes[0].id).content == self.LARGE
+
+        call_command('compress_notes', inflate=True, stdout=StringIO())
+        assert all(self.stored(note.id) == (self.LARGE, None) for note in notes)
+
+    def test_command_covers_trash(self, authenticated_client, user, settings):
+        """Test trashed notes are compressed too and stay searchable once restored"""
+        note = Note.objects.create(user=user, title='Big', content=self.LARGE + ' haystack')
+        note.delete()
+        settings.NOTES_CONTENT_COMPRESSION = 'zlib'
+        settings.NOTES_COMPRESS_MIN_CHARS = 1000
+        settings.NOTES_COMPRESSED_HEAD_CHARS = 300
+        call_command('compress_notes', stdout=StringIO())
+        assert Note.all_objects.filter(pk=note.id, content_compressed__isnull=False).exists()
+
+        Note.all_objects.get(pk=note.id).restore()
+        response = authenticated_client.get(reverse('note-search'), {'q': 'haystack'})
+        assert [result['id'] for result in response.data['results']] == [note.id]
+
+    def test_unknown_marker(self):
+        """Test blobs from an unknown codec are refused rather than misread"""
+        with pytest.raises(ValueError):
+            compression.decompress(b'?payload')
+
+
+# ============================================================================
+# REVISION HISTORY TESTS
+# ============================================================================
+
+@pytest.mark.django_db
+class TestNoteRevisions:
+    """Test revision history stored as diffs with periodic snapshots"""
+
+    @pytest.fixture
+    def no_window(self, settings):
+        settings.NOTES_REVISION_WINDOW_SECONDS = 0
+
+    def edit(self, client, note, **data):
+        url = reverse('note-detail', kwargs={'pk': note.id})
+        response = client.patch(url, data, format='json')
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_create_records_snapshot(self, note):
+        """Test a new note starts its history with a full snapshot"""
+        revision = note.revisions.get()
+        assert (revision.number, revision.version, revision.snapshot) == (1, 1, note.content)
+
+    def test_autosaves_coalesce(self, authenticated_client, note):
+        """Test saves inside the window fold into one revision"""
+        for text in ('a', 'ab', 'abc'):
+            self.edit(authenticated_client, note, content=text)
+        revision = note.revisions.get()
+        assert (revision.snapshot, revision.version) == ('abc', 4)
+
+    def test_diffs_follow_edit_size(self, authenticated_client, user, no_window):
+        """Test edits to a large note store only the changed text"""
+        lines = ['lorem ipsum dolor sit amet'] * 2000
+        note = Note.objects.create(user=user, title='Big', content='\n'.join(lines))
+        lines[0] = 'LOREM ipsum dolor sit amet'
+        self.edit(authenticated_client, note, content='\n'.join(lines))
+        assert note.revisions.get(number=2).edits == [[0, 5, 'LOREM']]
+
+        lines[1], lines[-1] = 'first', 'last'
+        self.edit(authenticated_client, note, content='\n'.join(lines))
+        revision = note.revisions.get(number=3)
+        assert revision.snapshot is None
+        assert len(json.dumps(revision.edits)) < 100
+        assert NoteRevision.objects.content_at(note.id, 3)[0] == '\n'.join(lines)
+
+    def test_snapshots_bound_rebuilds(self, authenticated_client, note, settings, no_window):
+        """Test snapshots are taken periodically and every revision rebuilds exactly"""
+        settings.NOTES_REVISION_SNAPSHOT_EVERY = 3
+        contents = [note.content]
+        for i in range(6):
+            contents.append(f'{contents[-1]} edit {i}')
+            self.edit(authenticated_client, note, content=contents[-1])
+        snapshots = note.revisions.filter(snapshot__isnull=False).values_list('number', flat=True)
+        assert sorted(snapshots) == [1, 4, 7]
+        for number, content in enumerate(contents, start=1):
+            assert NoteRevision.objects.content_at(note.id, number) == (content, 1 + (number - 1) // 3 * 3)
+
+    def test_delta_bulk_and_category_changes(self, authenticated_client, note, no_window):
+        """Test delta and bulk edits are recorded and category-only changes are not"""
+        response = authenticated_client.patch(
+            reverse('note-delta', kwargs={'pk': note.id}),
+            {'version': 1, 'edits': [{'start': 0, 'end': 4, 'text': 'That'}]}, format='json',
+        )
+        assert response.status_code == status.HTTP_200_OK
+        authenticated_client.post(reverse('note-bulk'), {'operations': [
+            {'op': 'update', 'id': note.id, 'title': 'Bulk title'},
+        ]}, format='json')
+        self.edit(authenticated_client, note, category='Drama')
+        assert list(note.revisions.order_by('number').values_list('number', 'version', 'title')) == [
+            (1, 1, 'Test Note'), (2, 2, 'Test Note'), (3, 3, 'Bulk title'),
+        ]
+        assert NoteRevision.objects.content_at(note.id, 3)[0] == 'That is a test note content'
+
+    def test_bulk_creates_record_snapshots(self, authenticated_client, user):
+        """Test notes created by bulk operations and imports start their history too"""
+        authenticated_client.post(reverse('note-bulk'), {'operations': [
+            {'op': 'create', 'title': 'Bulk', 'content': 'Body'},
+        ]}, format='json')
+        authenticated_client.post(reverse('note-import-file'), {
+            'file': SimpleUploadedFile('notes.ndjson', json.dumps({'title': 'Imported', 'content': 'Text'}).encode()),
+        }, format='multipart')
+        revisions = NoteRevision.objects.filter(note__user=user).order_by('note_id')
+        assert list(revisions.values_list('number', 'version', 'title', 'snapshot')) == [
+            (1, 1, 'Bulk', 'Body'), (1, 1, 'Imported', 'Text'),
+        ]
+
+    def test_large_snapshots_are_compressed(self, authenticated_client, user, settings, no_window):
+        """Test snapshots of large notes are stored like compressed note content"""
+        settings.NOTES_CONTENT_COMPRESSION = 'zlib'
+        settings.NOTES_COMPRESS_MIN_CHARS = 1000
+        settings.NOTES_COMPRESSED_HEAD_CHARS = 300
+        settings.NOTES_REVISION_SNAPSHOT_EVERY = 2
+        large = ' '.join(['lorem ipsum dolor sit amet'] * 200)
+        note = Note.objects.create(user=user, title='Big', content=large)
+        self.edit(authenticated_client, note, content=large + ' two')
+        self.edit(authenticated_client, note, content=large + ' three')
+        authenticated_client.post(reverse('note-bulk'), {'operations': [
+            {'op': 'create', 'title': 'Bulk', 'content': large},
+        ]}, format='json')
+
+        snapshots = NoteRevision.objects.filter(snapshot__isnull=False).order_by('id')
+        stored = list(snapshots.values_list('snapshot', 'snapshot_compressed'))
+        assert len(stored) == 3
+        for column, blob in stored:
+            assert column == large[:300]
+            assert len(blob) < len(large) // 10
+        assert snapshots.first().snapshot == large
+        assert NoteRevision.objects.content_at(note.id, 3) == (large + ' three', 3)
+        response = authenticated_client.get(reverse('note-revision', kwargs={'pk': note.id, 'number': 2}))
+        assert response.data['content'] == large + ' two'
+
+    def test_revisions_endpoint(self, authenticated_client, note, no_window):
+        """Test revisions are listed newest first by keyset and served with content"""
+        for text in ('one', 'two', 'three'):
+            self.edit(authenticated_client, note, content=text)
+        url = reverse('note-revisions', kwargs={'pk': note.id})
+        response = authenticated_client.get(url, {'page_size': 2})
+        assert [revision['number'] for revision in response.data['results']] == [4, 3]
+        assert 'content' not in response.data['results'][0]
+        response = authenticated_client.get(response.data['next'])
+        assert [revision['number'] for revision in response.data['results']] == [2, 1]
+        assert response.data['next'] is None
+
+        response = authenticated_client.get(reverse('note-revision', kwargs={'pk': note.id, 'number': 3}))
+        assert (response.data['number'], response.data['content']) == (3, 'two')
+        response = authenticated_client.get(reverse('note-revision', kwargs={'pk': note.id, 'number': 9}))
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert authenticated_client.get(url, {'before': 'x'}).status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_revisions_are_private(self, authenticated_client, another_user):
+        """Test another user's history is not reachable"""
+        theirs = Note.objects.create(user=another_user, title='Theirs', content='secret')
+        response = authenticated_client.get(reverse('note-revisions', kwargs={'pk': theirs.id}))
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+# ============================================================================
+# TRASH TESTS
+# ============================================================================
+
+@pytest.mark.django_db
+class TestTrash:
+    """Test soft delete, the trash endpoints and the purge job"""
+
+    def counts(self, user):
+        return dict(CategoryCount.objects.filter(user=user).values_list('category', 'count'))
+
+    def test_delete_moves_to_trash(self, authenticated_client, user, note):
+        """Test deleting hides the note everywhere but keeps its row"""
+        response = authenticated_client.delete(reverse('note-detail', kwargs={'pk': note.id}))
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert Note.all_objects.get(pk=note.id).deleted_at is not None
+        assert authenticated_client.get(reverse('note-list')).data['count'] == 0
+        response = authenticated_client.get(reverse('note-detail', kwargs={'pk': note.id}))
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        response = authenticated_client.get(reverse('note-search'), {'q': 'test'})
+        assert response.data['results'] == []
+        assert self.counts(user)['Random Thoughts'] == 0
+        assert authenticated_client.delete(
+            reverse('note-detail', kwargs={'pk': note.id})
+        ).status_code == status.HTTP_404_NOT_FOUND
+
+    def test_trash_listing(self, authenticated_client, multiple_notes, another_user):
+        """Test the trash lists deleted notes newest first, by cursor, per user"""
+        for note in multiple_notes:
+            note.delete()
+        Note.objects.create(user=another_user, title='Theirs').delete()
+        url = reverse('note-trash')
+        response = authenticated_client.get(url, {'page_size': 2})
+        assert [item['id'] for item in response.data['results']] == [multiple_notes[2].id, multiple_notes[1].id]
+        assert response.data['results'][0]['deleted_at']
+        assert response.data['results'][0]['preview'] == multiple_notes[2].content
+        response = authenticated_client.get(response.data['next'])
+        assert [item['id'] for item in response.data['results']] == [multiple_notes[0].id]
+        assert response.data['next'] is None
+        assert authenticated_client.get(url, {'cursor': 'garbage'}).status_code == status.HTTP_404_NOT_FOUND
+
+    def test_restore(self, authenticated_client, user, note):
+        """Test restoring brings the note, its counter and a sync upsert back"""
+        cursor = authenticated_client.get(reverse('note-changes')).data['cursor']
+        note.delete()
+        url = reverse('note-restore', kwargs={'note_id': note.id})
+        response = authenticated_client.post(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['title'] == note.title
+        assert [item['id'] for item in authenticated_client.get(reverse('note-list')).data['results']] == [note.id]
+        assert self.counts(user)['Random Thoughts'] == 1
+        changes = authenticated_client.get(reverse('note-changes'), {'since': cursor}).data['changes']
+        assert [change['type'] for change in changes] == ['delete', 'upsert']
+        assert authenticated_client.post(url).status_code == status.HTTP_404_NOT_FOUND
+
+    def test_restore_other_user(self, authenticated_client, another_user):
+        """Test another user's trash is out of reach"""
+        theirs = Note.objects.create(user=another_user, title='Theirs')
+        theirs.delete()
+        url = reverse('note-restore', kwargs={'note_id': theirs.id})
+        assert authenticated_client.post(url).status_code == status.HTTP_404_NOT_FOUND
+        assert Note.all_objects.get(pk=theirs.id).deleted_at is not None
+
+    def test_bulk_delete_trashes(self, authenticated_client, multiple_notes):
+        """Test bulk deletes move notes to the trash too"""
+        authenticated_client.post(reverse('note-bulk'), {'operations': [
+            {'op': 'delete', 'id': multiple_notes[0].id},
+        ]}, format='json')
+        assert Note.all_objects.get(pk=multiple_notes[0].id).deleted_at is not None
+
+    def test_purge_expired(self, user, multiple_notes):
+        """Test the purge job removes old trash with its revisions and keeps the rest"""
+        old, recent, live = multiple_notes
+        old.delete()
+        recent.delete()
+        Note.all_objects.filter(pk=old.id).update(deleted_at=timezone.now() - timezone.timedelta(days=31))
+        out = StringIO()
+        call_command('purge_notes', batch_size=1, stdout=out)
+        assert '1 expired and 0 orphaned note(s) purged' in out.getvalue()
+        assert set(Note.all_objects.values_list('id', flat=True)) == {recent.id, live.id}
+        assert not NoteRevision.objects.filter(note_id=old.id).exists()
+
+        call_command('purge_notes', days=0, stdout=StringIO())
+        assert list(Note.all_objects.values_list('id', flat=True)) == [live.id]
+
+    def test_deleted_users_notes(self, user, multiple_notes, another_user):
+        """Test deleting a user leaves their notes for the purge job"""
+        theirs = Note.objects.create(user=another_user, title='Theirs')
+        user_id = user.id
+        user.delete()
+        assert Note.all_objects.filter(user_id=user_id).count() == 3
+        out = StringIO()
+        call_command('purge_notes', batch_size=2, stdout=out)
+        assert '0 expired and 3 orphaned note(s) purged' in out.getvalue()
+        assert list(Note.all_objects.values_list('id', flat=True)) == [theirs.id]
+
+    def test_rebuild_skips_deleted_users(self, user, note, another_user):
+        """Test rebuilding counters ignores notes whose user is gone"""
+        Note.objects.create(user=another_user, title='Theirs', category='School')
+        user.delete()
+        CategoryCount.objects.all().delete()
+        call_command('rebuild_category_counts', stdout=StringIO())
+        assert list(CategoryCount.objects.values_list('user_id', 'category', 'count')) == [
+            (another_user.id, 'School', 1),
+        ]
@@ -0,0 +1,74 @@
+from hashlib import sha1
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+from .routers import PROCESS_LOCAL_CACHES, notes_cache
+
+
+class LoginThrottle(SimpleRateThrottle):
+    """
+    Base for login throttles; rates are read per request so settings overrides
+    apply. Attempts are counted in the ``NOTES_CACHE_ALIAS`` cache, which the
+    replica pins already need shared between workers.
+    """
+
+    @property
+    def cache(self):
+        return notes_cache()
+
+    def get_rate(self):
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+
+class LoginIPThrottle(LoginThrottle):
+    """Login attempts per client address"""
+    scope = 'login'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class LoginAccountThrottle(LoginThrottle):
+    """Login attempts per account, whichever address they come from"""
+    scope = 'login_account'
+
+    def get_cache_key(self, request, view):
+        email = request.data.get('email') if hasattr(request.data, 'get') else None
+        if not isinstance(email, str) or not email.strip():
+            return None
+        ident = sha1(email.strip().lower().encode('utf-8')).hexdigest()
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+LOGIN_THROTTLES = [LoginIPThrottle, LoginAccountThrottle]
+
+
+def login_wait(request, view=None):
+    """
+    Run the login throttles as DRF's ``check_throttles`` does and return the
+    seconds to wait, or ``None`` when the attempt is allowed.
+    """
+    waits = []
+    for throttle_class in LOGIN_THROTTLES:
+        throttle = throttle_class()
+        if not throttle.allow_request(request, view):
+            waits.append(throttle.wait())
+    if not waits:
+        return None
+    return max((wait for wait in waits if wait is not None), default=None) or 0
+
+
+def check_throttle_cache():
+    """
+    Refuse several workers when the throttle cache is local to each process:
+    every worker would count attempts on its own, multiplying the budget.
+    """
+    backend = settings.CACHES[settings.NOTES_CACHE_ALIAS]['BACKEND']
+    if settings.NOTES_SERVER_WORKERS > 1 and backend in PROCESS_LOCAL_CACHES:
+        raise ImproperlyConfigured(
+            f'WEB_CONCURRENCY above 1 needs a cache shared between workers for the login throttles; '
+            f'set NOTES_CACHE_BACKEND (the {settings.NOTES_CACHE_ALIAS!r} cache uses {backend})'
+        )
@@ -0,0 +1,37 @@
+"""
+Permanent deletion of notes, kept out of request handling.
+
+Deleting a note only sets ``deleted_at``; ``Note.objects`` hides it and the
+trash endpoints can bring it back. Deleting a user leaves their notes in
+place. ``manage.py purge_notes`` removes both kinds later, ``batch_size``
+rows per transaction so no single statement holds long locks.
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from .models import Note
+
+
+def delete_in_batches(queryset, batch_size):
+    """Delete ``queryset`` a batch at a time and return the number of notes removed"""
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            pks = list(queryset.order_by().values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                return deleted
+            # Re-apply the filter so a note restored meanwhile is kept.
+            _, per_model = queryset.filter(pk__in=pks).delete()
+            deleted += per_model.get(Note._meta.label, 0)
+
+
+def purge_expired(before, batch_size):
+    """Delete notes that went to the trash before ``before``"""
+    return delete_in_batches(Note.all_objects.filter(deleted_at__lt=before), batch_size)
+
+
+def purge_orphans(batch_size):
+    """Delete the notes of users that no longer exist"""
+    orphans = Note.all_objects.filter(~Exists(User.objects.filter(pk=OuterRef('user_id'))))
+    return delete_in_batches(orphans, batch_size)
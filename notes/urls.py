@@ -1,5 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from .metrics import metrics_view
 from .views import NoteViewSet, AuthViewSet
 
 router = DefaultRouter()
@@ -7,6 +8,7 @@ router.register(r'notes', NoteViewSet, basename='note')
 router.register(r'auth', AuthViewSet, basename='auth')
 
 urlpatterns = [
+    path('api/metrics/', metrics_view, name='metrics'),
     path('api/', include(router.urls)),
 ]
 
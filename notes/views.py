@@ -1,18 +1,89 @@
+from io import TextIOWrapper
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.utils.urls import replace_query_param
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
-from django.db.models import Count
-from rest_framework_simplejwt.tokens import RefreshToken
-from .models import Note
-from .serializers import NoteSerializer, UserSerializer
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Q
+from django.db.models.functions import Substr
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from .authentication import NoteRefreshToken
+from .bulk import BulkValidationError, apply_operations
+from .cache import cached_response
+from .conditional import (
+    conditional, list_etag, categories_etag, changes_etag, changed_at, change_state,
+    note_etag, note_updated_at,
+)
+from .export import buffered, gzipped, ndjson_lines, streamed
+from .importer import import_notes, read_rows
+from .models import Note, CategoryCount, NoteRevision, VersionConflict
+from .pagination import NotePagination
+from .renderers import FastJSONRenderer
+from .routers import replica_read
+from .search import InvalidCursor, decode_cursor, encode_cursor, search_notes
+from .serializers import (
+    NoteSerializer, NoteListSerializer, NoteDeltaSerializer, NoteVersionSerializer,
+    NoteRevisionSerializer, NoteSearchResultSerializer, BulkRequestSerializer, UserSerializer,
+    NOTE_LIST_FIELDS, format_datetimes, note_list_rows,
+)
+from .throttling import LOGIN_THROTTLES
+from . import sync
+
+
+CATEGORY_COLORS = {
+    'Random Thoughts': '#ef9c66',
+    'School': '#fcdc94',
+    'Personal': '#78aba8',
+    'Drama': '#C8CFA0',
+}
+
+
+def with_preview(queryset):
+    """Only read a preview-sized prefix of the content for note cards"""
+    return (
+        queryset
+        .only('id', 'user_id', 'title', 'category', 'created_at', 'updated_at', 'version')
+        .annotate(preview=Substr('content', 1, settings.NOTES_PREVIEW_CHARS + 1))
+    )
+
+
+def auth_payload(user):
+    """The user and token pair answered by register and login"""
+    refresh = NoteRefreshToken.for_user(user)
+    return {
+        'user': {
+            'id': user.id,
+            'email': user.email,
+        },
+        'tokens': {
+            'refresh': str(refresh),
+            'access': str(refresh.access_token),
+        }
+    }
+
+
+def category_summary(counts):
+    """The categories payload for a ``{category: count}`` mapping"""
+    return [
+        {'name': name, 'count': counts.get(name, 0), 'color': color}
+        for name, color in CATEGORY_COLORS.items()
+    ]
 
 
 class NoteViewSet(viewsets.ModelViewSet):
     serializer_class = NoteSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = NotePagination
 
     def get_queryset(self):
         queryset = Note.objects.filter(user=self.request.user)
@@ -20,40 +91,288 @@ class NoteViewSet(viewsets.ModelViewSet):
         category = self.request.query_params.get('category', None)
         if category:
             queryset = queryset.filter(category=category)
+
+        if self.action == 'list':
+            queryset = with_preview(queryset)
+        elif self.action in ('revisions', 'revision'):
+            queryset = queryset.only('id', 'user_id')
         
         return queryset
 
+    def estimated_count(self):
+        """The list total from the category counters, for ``?count=estimate``"""
+        return CategoryCount.objects.total(
+            self.request.user.id, self.request.query_params.get('category')
+        )
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return NoteListSerializer
+        return super().get_serializer_class()
+
+    def get_renderers(self):
+        # orjson for the hot read paths only; see FastJSONRenderer on floats.
+        if self.action in ('list', 'retrieve'):
+            return [FastJSONRenderer(), *super().get_renderers()]
+        return super().get_renderers()
+
+    @replica_read
+    @conditional(list_etag, changed_at)
+    @cached_response('notes')
+    def list(self, request, *args, **kwargs):
+        # Note cards skip model instances and ModelSerializer; see note_list_rows.
+        queryset = self.filter_queryset(self.get_queryset()).values(*NOTE_LIST_FIELDS)
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(note_list_rows(page))
+
+    @replica_read
+    @conditional(note_etag, note_updated_at)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(detail=True, methods=['patch'], url_path='delta')
+    def delta(self, request, pk=None):
+        """Apply text-range edits against a known version and return the new version"""
+        note = self.get_object()
+        serializer = NoteDeltaSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            note.apply_delta(
+                serializer.validated_data['version'],
+                serializer.validated_data['edits'],
+                title=serializer.validated_data.get('title'),
+            )
+        except VersionConflict as exc:
+            return Response(
+                {'error': 'Note has changed since this version', 'version': exc.current_version},
+                status=status.HTTP_409_CONFLICT
+            )
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(NoteVersionSerializer(note).data)
+
+    @action(detail=True, methods=['get'], url_path='revisions')
+    def revisions(self, request, pk=None):
+        """The note's revisions, newest first, paginated by ``before``"""
+        note = self.get_object()
+        revisions = note.revisions.order_by('-number').defer('snapshot', 'snapshot_compressed', 'edits')
+        before = request.query_params.get('before')
+        if before is not None:
+            try:
+                revisions = revisions.filter(number__lt=int(before))
+            except ValueError:
+                return Response(
+                    {'error': 'before must be a revision number'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        limit = self.paginator.get_page_size(request)
+        page = list(revisions[:limit + 1])
+        next_url = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_url = replace_query_param(request.build_absolute_uri(), 'before', page[-1].number)
+        return Response({
+            'next': next_url,
+            'previous': None,
+            'results': NoteRevisionSerializer(page, many=True).data,
+        })
+
+    @action(detail=True, methods=['get'], url_path=r'revisions/(?P<number>[0-9]+)')
+    def revision(self, request, pk=None, number=None):
+        """One revision with its content rebuilt from the nearest snapshot"""
+        note = self.get_object()
+        revision = note.revisions.defer('snapshot', 'snapshot_compressed', 'edits').filter(number=number).first()
+        if revision is None:
+            raise NotFound('No such revision')
+        content, _ = NoteRevision.objects.content_at(note.pk, revision.number)
+        return Response({**NoteRevisionSerializer(revision).data, 'content': content})
+
+    @action(detail=False, methods=['get'], url_path='trash')
+    def trash(self, request):
+        """The user's deleted notes, most recently deleted first, paginated by ``cursor``"""
+        queryset = with_preview(
+            Note.all_objects.filter(user=request.user, deleted_at__isnull=False)
+        ).order_by('-deleted_at', '-id')
+        encoded = request.query_params.get('cursor')
+        if encoded:
+            try:
+                deleted_at, pk = NotePagination.parse_cursor(encoded)
+            except ValueError:
+                raise NotFound(NotePagination.invalid_cursor_message)
+            queryset = queryset.filter(Q(deleted_at__lt=deleted_at) | Q(deleted_at=deleted_at, id__lt=pk))
+
+        limit = self.paginator.get_page_size(request)
+        rows = list(queryset.values(*NOTE_LIST_FIELDS, 'deleted_at')[:limit + 1])
+        page = rows[:limit]
+        results = note_list_rows(page)
+        for result, deleted_at in zip(results, format_datetimes([row['deleted_at'] for row in page])):
+            result['deleted_at'] = deleted_at
+
+        next_url = None
+        if len(rows) > limit:
+            next_url = replace_query_param(
+                request.build_absolute_uri(),
+                'cursor',
+                NotePagination.encode_cursor(page[-1]['deleted_at'], page[-1]['id'])
+            )
+        return Response({'next': next_url, 'previous': None, 'results': results})
+
+    @action(detail=False, methods=['post'], url_path=r'trash/(?P<note_id>[0-9]+)/restore')
+    def restore(self, request, note_id=None):
+        """Take a note out of the trash"""
+        note = Note.all_objects.filter(user=request.user, pk=note_id, deleted_at__isnull=False).first()
+        if note is None or not note.restore():
+            raise NotFound('No such note in the trash')
+        return Response(NoteSerializer(note).data)
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        """Create, update, recategorize and delete many notes in one transaction"""
+        serializer = BulkRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            results = apply_operations(request.user, serializer.validated_data['operations'])
+        except BulkValidationError as exc:
+            return Response({'results': exc.results}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'results': results})
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        """Stream all of the user's notes as NDJSON, gzipped when the client accepts it"""
+        queryset = Note.objects.filter(user=request.user)
+        category = request.query_params.get('category')
+        if category:
+            queryset = queryset.filter(category=category)
+
+        since = request.query_params.get('since')
+        if since:
+            try:
+                since = parse_datetime(since)
+            except ValueError:
+                since = None
+            if since is None:
+                return Response(
+                    {'error': 'since must be an ISO 8601 datetime'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+            queryset = queryset.filter(updated_at__gte=since)
+
+        chunks = buffered(ndjson_lines(queryset, settings.NOTES_EXPORT_CHUNK_SIZE))
+        compress = 'gzip' in request.headers.get('Accept-Encoding', '')
+        if compress:
+            chunks = gzipped(chunks)
+        if isinstance(request._request, ASGIRequest):
+            chunks = streamed(chunks)
+        response = StreamingHttpResponse(chunks, content_type='application/x-ndjson')
+        if compress:
+            response['Content-Encoding'] = 'gzip'
+        response['Content-Disposition'] = 'attachment; filename="notes.ndjson"'
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_file(self, request):
+        """Import notes from an uploaded JSON array or NDJSON file in batches"""
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response(
+                {'error': 'A file upload is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        stream = TextIOWrapper(upload.file, encoding='utf-8-sig', errors='replace')
+        report = import_notes(request.user, read_rows(stream), settings.NOTES_IMPORT_BATCH_SIZE)
+        return Response(report.as_dict())
+
+    @action(detail=False, methods=['get'], url_path='search')
+    @replica_read
+    def search(self, request):
+        """Full-text search over the user's notes, best matches first"""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {'error': 'Query parameter q is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            cursor = decode_cursor(request.query_params.get('cursor'))
+        except InvalidCursor as exc:
+            raise NotFound(str(exc))
+
+        limit = self.paginator.get_page_size(request)
+        results = search_notes(
+            request.user.id,
+            query,
+            category=request.query_params.get('category'),
+            cursor=cursor,
+            limit=limit + 1,
+        )
+
+        next_url = None
+        if len(results) > limit:
+            results = results[:limit]
+            next_url = replace_query_param(
+                request.build_absolute_uri(),
+                'cursor',
+                encode_cursor(results[-1]['rank'], results[-1]['id'])
+            )
+        return Response({
+            'next': next_url,
+            'previous': None,
+            'results': NoteSearchResultSerializer(results, many=True).data,
+        })
+
+    @action(detail=False, methods=['get'], url_path='changes')
+    @conditional(changes_etag, changed_at)
+    def changes(self, request):
+        """Notes created, updated or deleted after the ``since`` cursor, oldest first"""
+        try:
+            cursor = sync.decode_cursor(request.query_params.get('since'))
+        except InvalidCursor as exc:
+            raise NotFound(str(exc))
+
+        limit = self.paginator.get_page_size(request)
+        changes = sync.changes_since(request.user.id, cursor, limit + 1)
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+
+        if changes:
+            position = changes[-1][:2]
+        elif cursor is None:
+            position = (change_state(request)[0], 0)
+        else:
+            position = cursor
+        return Response({
+            'cursor': sync.encode_cursor(*position),
+            'has_more': has_more,
+            'changes': [
+                {'type': 'upsert', 'id': pk, 'note': NoteSerializer(note).data}
+                if note is not None else {'type': 'delete', 'id': pk}
+                for _, pk, note in changes
+            ],
+        })
+
     @action(detail=False, methods=['get'], url_path='categories')
+    @replica_read
+    @conditional(categories_etag, changed_at)
+    @cached_response('categories')
     def categories(self, request):
         """Get list of categories with note counts for the authenticated user"""
-        category_colors = {
-            'Random Thoughts': '#ef9c66',
-            'School': '#fcdc94',
-            'Personal': '#78aba8',
-            'Drama': '#C8CFA0',
-        }
-        
-        categories_with_counts = (
-            Note.objects
+        count_dict = dict(
+            CategoryCount.objects
             .filter(user=request.user)
-            .values('category')
-            .annotate(count=Count('id'))
+            .values_list('category', 'count')
         )
-        
-        count_dict = {cat['category']: cat['count'] for cat in categories_with_counts}
-        
-        category_data = []
-        for category_name, color in category_colors.items():
-            category_data.append({
-                'name': category_name,
-                'count': count_dict.get(category_name, 0),
-                'color': color,
-            })
-        
-        return Response(category_data)
+        return Response(category_summary(count_dict))
 
 
 class AuthViewSet(viewsets.ViewSet):
@@ -68,20 +387,10 @@ class AuthViewSet(viewsets.ViewSet):
                 email=serializer.validated_data['email'],
                 password=serializer.validated_data['password']
             )
-            refresh = RefreshToken.for_user(user)
-            return Response({
-                'user': {
-                    'id': user.id,
-                    'email': user.email,
-                },
-                'tokens': {
-                    'refresh': str(refresh),
-                    'access': str(refresh.access_token),
-                }
-            }, status=status.HTTP_201_CREATED)
+            return Response(auth_payload(user), status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    @action(detail=False, methods=['post'], url_path='login')
+    @action(detail=False, methods=['post'], url_path='login', throttle_classes=LOGIN_THROTTLES)
     def login(self, request):
         email = request.data.get('email')
         password = request.data.get('password')
@@ -92,28 +401,11 @@ class AuthViewSet(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        try:
-            user = User.objects.get(email=email)
-        except User.DoesNotExist:
-            return Response(
-                {'error': 'Invalid credentials'},
-                status=status.HTTP_401_UNAUTHORIZED
-            )
-
-        user = authenticate(username=user.username, password=password)
+        user = authenticate(request, email=email, password=password)
         if user is not None:
-            refresh = RefreshToken.for_user(user)
-            return Response({
-                'user': {
-                    'id': user.id,
-                    'email': user.email,
-                },
-                'tokens': {
-                    'refresh': str(refresh),
-                    'access': str(refresh.access_token),
-                }
-            })
+            return Response(auth_payload(user))
         return Response(
             {'error': 'Invalid credentials'},
             status=status.HTTP_401_UNAUTHORIZED
         )
+